@@ -5,7 +5,7 @@ import io
 import csv
 import tempfile
 from datetime import datetime, timedelta
-import sqlite3
+from elo.database.connection import obter_conexao
 from elo.services.generate_json import gerar_arquivo_carga
 from elo.database.load_database import carregar_base_de_dados
 from elo.database.load_acolhedores import carregar_acolhedores
@@ -16,6 +16,7 @@ from elo.services.carregar_respostas import carregar_respostas_para_base
 from elo.services.upload_drive import upload_arquivo_db
 from elo.services.download_drive import download_arquivo_db
 from elo.services.send_allocation import send_allocation_email
+from elo.services.outbox import iniciar_drenagem_em_segundo_plano, resumo_outbox
 
 
 # --- Função Utilitária para Capturar Logs ---
@@ -114,11 +115,8 @@ def run():
                     
                     try:
                         # Query GPS data from DB
-                        conn = sqlite3.connect(os.path.join(os.getenv("PASTA_BASE"), os.getenv("NOME_BANCO_DADOS")))
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT id_gps, nome_lider_gps FROM gps")
-                        gps_data = cursor.fetchall()
-                        conn.close()
+                        conn = obter_conexao(somente_leitura=True)
+                        gps_data = conn.execute("SELECT id_gps, nome_lider_gps FROM gps").fetchall()
 
                         if not gps_data:
                             st.error("Erro: A tabela de GPs está vazia. Carregue os GPs primeiro.")
@@ -152,12 +150,17 @@ def run():
             # Assuming acolhedores_carga.csv is saved in PASTA_CSV
             pasta_csv = os.getenv("PASTA_CSV")
             caminho_acolhedores_carga_csv = os.path.join(pasta_csv, "acolhedores_carga.csv")
+            atualizar_acolhedores = st.checkbox(
+                "Atualizar nome, apelido e GP de acolhedores já cadastrados", key="atualizar_acolhedores"
+            )
 
             if st.button("Carregar acolhedores_carga.csv na Base"):
                 if os.path.exists(caminho_acolhedores_carga_csv):
                     with st.spinner("Carregando acolhedores no banco de dados..."):
                         sucesso, logs = executar_e_capturar_output(
-                            carregar_acolhedores, caminho_acolhedores_carga_csv
+                            carregar_acolhedores,
+                            caminho_acolhedores_carga_csv,
+                            atualizar_existentes=atualizar_acolhedores,
                         )
                         if sucesso:
                             st.success("Acolhedores carregados com sucesso no banco de dados!")
@@ -202,14 +205,25 @@ def run():
         # 2.1 Disparar E-mails
         with st.expander("Disparar E-mails de Acolhimento", expanded=True):
             if st.button("Disparar E-mails Agora"):
-                with st.spinner("Verificando e enviando e-mails..."):
+                with st.spinner("Verificando visitantes e colocando os e-mails na fila..."):
                     sucesso, logs = executar_e_capturar_output(enviar_notificacoes_personalizadas)
                     if sucesso:
-                        st.success("E-mails enviados com sucesso!")
+                        # O envio continua em um processo separado; o painel não fica esperando o SMTP.
+                        iniciar_drenagem_em_segundo_plano()
+                        st.success("E-mails colocados na fila! O envio continua em segundo plano.")
                     else:
-                        st.error("Falha no envio dos e-mails.")
+                        st.error("Falha ao preparar os e-mails.")
                     with st.expander("Ver Logs do Disparo"):
                         st.text_area("", logs, height=150)
+            try:
+                resumo = resumo_outbox(obter_conexao())
+                st.caption(
+                    f"Fila de envio: {resumo.get('pendente', 0) + resumo.get('enviando', 0)} aguardando, "
+                    f"{resumo.get('enviado', 0)} enviado(s), {resumo.get('falha', 0)} com falha."
+                )
+            except Exception:
+                # Sem banco configurado ainda: o painel continua utilizável.
+                pass
 
         # 2.2 Processar Respostas
         with st.expander("Processar Respostas de E-mail e Gerar JSON", expanded=True):
@@ -250,6 +264,13 @@ def run():
                 start_date_alloc = st.date_input("Data de Início", value=datetime.now() - timedelta(days=30))
             with col2:
                 end_date_alloc = st.date_input("Data de Fim", value=datetime.now())
+            formato_alloc = st.radio(
+                "Formato do relatório",
+                ["Imagem (JPEG)", "Tabela no corpo do e-mail"],
+                index=0,
+                horizontal=True,
+            )
+            anexar_csv_alloc = st.checkbox("Anexar também as contagens em CSV")
 
             if st.button("Enviar Relatório de Alocação"):
                 if start_date_alloc and end_date_alloc:
@@ -257,10 +278,13 @@ def run():
                         sucesso, logs = executar_e_capturar_output(
                             send_allocation_email, 
                             start_date=start_date_alloc.strftime('%Y-%m-%d'), 
-                            end_date=end_date_alloc.strftime('%Y-%m-%d')
+                            end_date=end_date_alloc.strftime('%Y-%m-%d'),
+                            formato="html" if formato_alloc == "Tabela no corpo do e-mail" else "imagem",
+                            anexar_csv=anexar_csv_alloc,
                         )
                         if sucesso:
-                            st.success("Relatório de alocação enviado com sucesso!")
+                            iniciar_drenagem_em_segundo_plano()
+                            st.success("Relatório de alocação colocado na fila de envio!")
                         else:
                             st.error("Falha no envio do relatório de alocação.")
                         with st.expander("Ver Logs do Envio"):
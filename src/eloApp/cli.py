@@ -9,6 +9,7 @@ from .elo.services.generate_json import gerar_arquivo_carga
 from .elo.database.load_database import carregar_base_de_dados
 from .elo.database.load_acolhedores import carregar_acolhedores
 from .elo.services.send_emails import enviar_notificacoes_personalizadas
+from .elo.services.outbox import OUTBOX_LOTE, drenar_outbox
 
 
 def main():
@@ -43,6 +44,16 @@ def main():
     parser_acolhedores.add_argument(
         "arquivo_csv", help="Caminho para o arquivo acolhedores.csv"
     )
+    parser_acolhedores.add_argument(
+        "--atualizar",
+        action="store_true",
+        help="Atualiza nome, apelido e GP de acolhedores já cadastrados (mesmo e-mail).",
+    )
+    parser_acolhedores.add_argument(
+        "--forcar",
+        action="store_true",
+        help="Processa o arquivo inteiro, mesmo que já tenha sido carregado.",
+    )
 
     # --- Comando 3: Carregar Acolhimento ---
     parser_acolhimento = subparsers.add_parser(
@@ -54,6 +65,11 @@ def main():
         required=True,
         help="Data do arquivo de carga no formato ddmmyy (ex: 260625)",
     )
+    parser_acolhimento.add_argument(
+        "--forcar",
+        action="store_true",
+        help="Recarrega o arquivo inteiro, mesmo que já tenha sido carregado.",
+    )
 
     # --- Comando 4: Disparar E-mails ---
     parser_emails = subparsers.add_parser(
@@ -61,7 +77,31 @@ def main():
         help="Verifica por visitantes pendentes e dispara os e-mails para os acolhedores.",
     )
 
-    # --- Comando 5: Rodar Dashboard ---
+    # --- Comando 5: Drenar a Outbox ---
+    parser_outbox = subparsers.add_parser(
+        "drenar_outbox",
+        help="Envia os e-mails que estão na fila (outbox), refazendo os que falharam temporariamente.",
+    )
+    parser_outbox.add_argument(
+        "--lote",
+        type=int,
+        default=OUTBOX_LOTE,
+        help="Quantidade de mensagens reservadas por vez.",
+    )
+
+    # --- Comando 6: Observar Respostas ---
+    parser_observar = subparsers.add_parser(
+        "watch_replies",
+        help="Fica conectado à caixa de e-mail (IMAP IDLE) e processa cada resposta assim que ela chega.",
+    )
+    parser_observar.add_argument(
+        "--renovar",
+        type=float,
+        default=None,
+        help="Intervalo, em segundos, de renovação do IDLE e verificação da caixa (padrão: 600).",
+    )
+
+    # --- Comando 7: Rodar Dashboard ---
     parser_dashboard = subparsers.add_parser(
         "run_dashboard",
         help="Verifica o ambiente e inicia o painel de controle (Streamlit).",
@@ -76,14 +116,30 @@ def main():
         gerar_arquivo_carga(args.arquivo_txt)
 
     elif args.comando == "carregar_acolhedores":
-        carregar_acolhedores(args.arquivo_csv)
+        carregar_acolhedores(args.arquivo_csv, atualizar_existentes=args.atualizar, forcar=args.forcar)
 
     elif args.comando == "carregar_acolhimento":
-        carregar_base_de_dados(args.data)
+        carregar_base_de_dados(args.data, forcar=args.forcar)
 
     elif args.comando == "disparar_emails":
         print("Iniciando o disparo de e-mails...")
         enviar_notificacoes_personalizadas()
+        drenar_outbox()
+
+    elif args.comando == "drenar_outbox":
+        drenar_outbox(tamanho_lote=args.lote)
+
+    elif args.comando == "watch_replies":
+        # Importado só aqui: carrega o cliente do Gemini, que os demais comandos não usam.
+        from .elo.services.observar_respostas import observar_respostas
+
+        try:
+            if args.renovar:
+                observar_respostas(renovar_segundos=args.renovar)
+            else:
+                observar_respostas()
+        except KeyboardInterrupt:
+            print("\nObservador de respostas interrompido.")
 
     elif args.comando == "run_dashboard":
         print("Verificando o ambiente antes de iniciar o dashboard...")
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from dotenv import load_dotenv
+from .migrations import aplicar_migracoes
+from .utils import normalizar_string
+
+load_dotenv()
+
+# Pragmas aplicados em toda conexão de escrita.
+# WAL permite que o dashboard leia enquanto o disparo de e-mails escreve, e
+# synchronous=NORMAL é seguro em WAL (só perde a última transação em queda de energia).
+PRAGMAS_ESCRITA = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # ~16 MB de cache de páginas
+    "mmap_size": 134217728,  # 128 MB mapeados em memória
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+    "foreign_keys": "ON",
+}
+
+# Conexões somente leitura não podem alterar o journal_mode, o resto é o mesmo.
+PRAGMAS_LEITURA = {
+    chave: valor for chave, valor in PRAGMAS_ESCRITA.items() if chave not in ("journal_mode", "synchronous")
+}
+
+# Conexões abertas, indexadas por (pid, thread) e depois pelo modo ("escrita"/"leitura").
+_conexoes = {}
+_lock = threading.Lock()
+# Indica se as migrações pendentes já foram aplicadas ao banco por este processo.
+_esquema_atualizado = False
+
+
+@lru_cache(maxsize=1)
+def caminho_banco_dados() -> str:
+    """Resolve (uma única vez por processo) o caminho do banco a partir de PASTA_BASE e NOME_BANCO_DADOS."""
+    pasta_base = os.getenv("PASTA_BASE")
+    nome_db = os.getenv("NOME_BANCO_DADOS")
+    if not pasta_base:
+        raise RuntimeError("Variável de ambiente PASTA_BASE não está configurada.")
+    if not nome_db:
+        raise RuntimeError("Variável de ambiente NOME_BANCO_DADOS não está configurada.")
+    return os.path.join(pasta_base, nome_db)
+
+
+def _aplicar_pragmas(conn: sqlite3.Connection, pragmas: dict):
+    for chave, valor in pragmas.items():
+        conn.execute(f"PRAGMA {chave} = {valor};")
+    # Disponibiliza normalizar_string no SQL (usada pelas migrações e por consultas ad hoc).
+    conn.create_function("normalizar", 1, normalizar_string, deterministic=True)
+
+
+def _abrir_conexao(somente_leitura: bool) -> sqlite3.Connection:
+    caminho = caminho_banco_dados()
+    # check_same_thread=False apenas para permitir que fechar_conexoes() feche conexões
+    # de outras threads; cada conexão continua sendo usada somente pela thread dona.
+    if somente_leitura:
+        conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True, check_same_thread=False)
+        _aplicar_pragmas(conn, PRAGMAS_LEITURA)
+    else:
+        conn = sqlite3.connect(caminho, check_same_thread=False)
+        _aplicar_pragmas(conn, PRAGMAS_ESCRITA)
+    return conn
+
+
+def _descartar_threads_encerradas():
+    """Fecha conexões de threads que já terminaram (o Streamlit cria uma thread por execução)."""
+    pid = os.getpid()
+    vivas = {(pid, t.ident) for t in threading.enumerate()}
+    for chave in [chave for chave in _conexoes if chave not in vivas]:
+        por_modo = _conexoes.pop(chave)
+        # Conexões herdadas de um fork pertencem ao processo pai: apenas as esquecemos.
+        if chave[0] == pid:
+            for conn in por_modo.values():
+                conn.close()
+
+
+def obter_conexao(somente_leitura: bool = False) -> sqlite3.Connection:
+    """
+    Retorna a conexão reutilizável da thread atual (uma de escrita e uma de leitura por thread).
+    As conexões não devem ser fechadas por quem as usa; use fechar_conexoes() para liberá-las.
+    """
+    global _esquema_atualizado
+    modo = "leitura" if somente_leitura else "escrita"
+    # A chave inclui o pid: após um fork, as conexões herdadas do processo pai não são reutilizadas.
+    chave = (os.getpid(), threading.get_ident())
+    with _lock:
+        conn = _conexoes.get(chave, {}).get(modo)
+        if conn is None:
+            _descartar_threads_encerradas()
+            por_modo = _conexoes.setdefault(chave, {})
+            if not _esquema_atualizado:
+                # As migrações precisam de uma conexão de escrita mesmo que a primeira pedida seja
+                # somente leitura: senão, num banco novo ou antigo, as consultas não achariam as
+                # tabelas e colunas atuais.
+                if "escrita" not in por_modo:
+                    por_modo["escrita"] = _abrir_conexao(False)
+                aplicar_migracoes(por_modo["escrita"])
+                _esquema_atualizado = True
+            if modo not in por_modo:
+                por_modo[modo] = _abrir_conexao(somente_leitura)
+            conn = por_modo[modo]
+    return conn
+
+
+def checkpoint():
+    """Transfere o conteúdo do arquivo WAL para o arquivo principal do banco (ex: antes do upload)."""
+    obter_conexao().execute("PRAGMA wal_checkpoint(TRUNCATE);")
+
+
+def fechar_conexoes():
+    """Fecha todas as conexões abertas pelo processo (ex: antes de substituir o arquivo do banco)."""
+    global _esquema_atualizado
+    with _lock:
+        for por_modo in _conexoes.values():
+            for conn in por_modo.values():
+                conn.close()
+        _conexoes.clear()
+        # O próximo arquivo aberto (ex: baixado do Drive) pode estar em uma versão anterior.
+        _esquema_atualizado = False
+
+
+def _travar(arquivo) -> bool:
+    """Tenta, sem esperar, a trava exclusiva do arquivo; o sistema a solta quando o processo termina."""
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+@contextmanager
+def trabalhador_do_banco(nome: str):
+    """
+    Registra o processo atual, enquanto durar o bloco, como um trabalhador (`nome`) que mantém
+    conexões com o banco, para que trabalhadores_ativos() o encontre a partir de outro processo.
+    O registro é um arquivo <banco>.<nome>.<pid>.lock travado pelo processo.
+    """
+    caminho = f"{caminho_banco_dados()}.{nome}.{os.getpid()}.lock"
+    arquivo = open(caminho, "w")
+    try:
+        _travar(arquivo)
+        yield
+    finally:
+        arquivo.close()
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def trabalhadores_ativos() -> list:
+    """
+    Nomes ("outbox (pid 123)") dos processos registrados por trabalhador_do_banco() que ainda
+    estão rodando. Registros de processos que morreram sem limpar o arquivo são removidos.
+    """
+    caminho = caminho_banco_dados()
+    pasta, prefixo = os.path.dirname(caminho) or ".", os.path.basename(caminho) + "."
+    ativos = []
+    for nome_arquivo in sorted(os.listdir(pasta)):
+        if not (nome_arquivo.startswith(prefixo) and nome_arquivo.endswith(".lock")):
+            continue
+        caminho_trava = os.path.join(pasta, nome_arquivo)
+        with open(caminho_trava, "a") as arquivo:
+            livre = _travar(arquivo)
+        if livre:
+            try:
+                os.remove(caminho_trava)
+            except OSError:
+                pass
+            continue
+        nome, _, pid = nome_arquivo[len(prefixo) : -len(".lock")].rpartition(".")
+        ativos.append(f"{nome} (pid {pid})")
+    return ativos
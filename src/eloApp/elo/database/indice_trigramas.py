@@ -0,0 +1,88 @@
+from collections import defaultdict
+from .utils import normalizar_string
+
+# Um nome não encontrado exatamente (acolhedor, líder de GP) é resolvido automaticamente pelo mais
+# parecido apenas se a semelhança for alta e o segundo colocado ficar bem atrás.
+SIMILARIDADE_AUTOMATICA = 0.8
+MARGEM_SEGUNDO_CANDIDATO = 0.15
+SIMILARIDADE_SUGESTAO = 0.4
+
+
+def trigramas(texto: str) -> set:
+    """Retorna o conjunto de trigramas do texto normalizado (com bordas, para valorizar início e fim)."""
+    normalizado = normalizar_string(texto)
+    if not normalizado:
+        return set()
+    preenchido = f"  {normalizado} "
+    return {preenchido[i : i + 3] for i in range(len(preenchido) - 2)}
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido trigrama -> entradas, montado uma vez por carga, para encontrar nomes
+    parecidos (ex: nomes de acolhedor vindos do Gemini) sem comparar cada par de nomes.
+    """
+
+    def __init__(self, entradas=()):
+        self._chaves = []
+        self._valores = []
+        self._tamanhos = []
+        self._postagens = defaultdict(list)
+        for chave, valor in entradas:
+            self.adicionar(chave, valor)
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def adicionar(self, chave: str, valor):
+        """Indexa `chave` (ex: nome ou apelido) associada a `valor` (ex: id_acolhedor)."""
+        grams = trigramas(chave)
+        if not grams:
+            return
+        posicao = len(self._chaves)
+        self._chaves.append(normalizar_string(chave))
+        self._valores.append(valor)
+        self._tamanhos.append(len(grams))
+        for gram in grams:
+            self._postagens[gram].append(posicao)
+
+    def buscar(self, termo: str, limite: int = 3, similaridade_minima: float = 0.4) -> list:
+        """
+        Retorna até `limite` tuplas (valor, chave, similaridade) ordenadas da mais parecida
+        para a menos parecida. A similaridade é o coeficiente de Dice entre os trigramas.
+        Um mesmo valor aparece uma única vez, com a melhor de suas chaves.
+        """
+        grams = trigramas(termo)
+        if not grams:
+            return []
+
+        compartilhados = defaultdict(int)
+        for gram in grams:
+            for posicao in self._postagens.get(gram, ()):
+                compartilhados[posicao] += 1
+
+        melhores = {}
+        for posicao, comuns in compartilhados.items():
+            similaridade = 2 * comuns / (len(grams) + self._tamanhos[posicao])
+            if similaridade < similaridade_minima:
+                continue
+            valor = self._valores[posicao]
+            if valor not in melhores or similaridade > melhores[valor][2]:
+                melhores[valor] = (valor, self._chaves[posicao], similaridade)
+
+        return sorted(melhores.values(), key=lambda candidato: candidato[2], reverse=True)[:limite]
+
+
+def resolver_por_semelhanca(indice: IndiceTrigramas, nome: str):
+    """
+    Procura a entrada mais parecida com `nome` no índice de trigramas.
+    Retorna (valor ou None, candidatos), onde candidatos são as sugestões encontradas.
+    """
+    candidatos = indice.buscar(nome, limite=3, similaridade_minima=SIMILARIDADE_SUGESTAO)
+    if not candidatos:
+        return None, candidatos
+    melhor = candidatos[0]
+    segundo = candidatos[1][2] if len(candidatos) > 1 else 0.0
+    if melhor[2] >= SIMILARIDADE_AUTOMATICA and melhor[2] - segundo >= MARGEM_SEGUNDO_CANDIDATO:
+        return melhor[0], candidatos
+    return None, candidatos
@@ -1,8 +1,10 @@
 import os
 import dotenv
-import sqlite3
 import csv
+import time
 import argparse
+from .connection import obter_conexao
+from .manifesto import hash_registro, preparar_ingestao, registrar_ingestao
 from .utils import normalizar_string
 
 dotenv.load_dotenv()
@@ -16,67 +18,156 @@ def verificar_variaveis_ambiente():
             return False
     return True
 
-def carregar_acolhedores(caminho_acolhedores_carga_csv):
+# Quantidade de linhas do CSV gravadas por transação/executemany.
+TAMANHO_LOTE = 200
+
+SQL_INSERIR = """
+    INSERT OR IGNORE INTO acolhedores (acolhedor_nome, acolhedor_apelido, acolhedor_email, id_gps)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Só altera a linha quando algum campo realmente mudou, para que reimportar
+# o mesmo cadastro não gere escritas.
+SQL_UPSERT = """
+    INSERT INTO acolhedores (acolhedor_nome, acolhedor_apelido, acolhedor_email, id_gps)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(acolhedor_email) DO UPDATE SET
+        acolhedor_nome = excluded.acolhedor_nome,
+        acolhedor_apelido = excluded.acolhedor_apelido,
+        id_gps = excluded.id_gps
+    WHERE acolhedor_nome IS NOT excluded.acolhedor_nome
+       OR acolhedor_apelido IS NOT excluded.acolhedor_apelido
+       OR id_gps IS NOT excluded.id_gps
+"""
+
+
+def _gravar_lote(conn, lote, numero_lote, atualizar_existentes, logs):
+    """
+    Grava um lote em uma única transação e contabiliza inserções, atualizações e ignorados.
+    As contagens vêm do estado das linhas antes da gravação (uma consulta pelos e-mails do lote),
+    e não do rowcount, que não distingue inserção de atualização nem e-mails repetidos no lote.
+    """
+    inicio = time.perf_counter()
+    emails = list({email for _, _, email, _ in lote})
+    with conn:
+        atuais = {
+            email: (nome, apelido, id_gps)
+            for nome, apelido, email, id_gps in conn.execute(
+                "SELECT acolhedor_nome, acolhedor_apelido, acolhedor_email, id_gps FROM acolhedores "
+                f"WHERE acolhedor_email IN ({','.join('?' for _ in emails)})",
+                emails,
+            )
+        }
+        conn.executemany(SQL_UPSERT if atualizar_existentes else SQL_INSERIR, lote)
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+
+    novos = atualizados = 0
+    for nome, apelido, email, id_gps in lote:
+        valores = (nome, apelido, id_gps)
+        if email not in atuais:
+            novos += 1
+            atuais[email] = valores
+        elif atualizar_existentes and atuais[email] != valores:
+            atualizados += 1
+            atuais[email] = valores
+    logs["sucesso"] += novos
+    logs["atualizado"] += atualizados
+    logs["ja_existe"] += len(lote) - novos - atualizados
+    print(f"LOG: Lote {numero_lote} ({len(lote)} linhas) gravado em {duracao_ms:.1f} ms.")
+
+
+def carregar_acolhedores(caminho_acolhedores_carga_csv, atualizar_existentes: bool = False, forcar: bool = False):
+    """
+    Carrega os acolhedores do CSV em lotes. Com atualizar_existentes=True, acolhedores
+    já cadastrados (mesmo e-mail) têm nome, apelido e GP atualizados.
+    Linhas já carregadas de uma execução anterior do mesmo arquivo são puladas (ver manifesto);
+    forcar=True processa o arquivo inteiro. Retorna as contagens do relatório de carga.
+    """
     if not verificar_variaveis_ambiente():
         return
 
-    pasta_base = os.getenv("PASTA_BASE")
-    nome_db = os.getenv("NOME_BANCO_DADOS")
-    caminho_banco = os.path.join(pasta_base, nome_db)
     conn = None
+    logs = None
 
     if not os.path.exists(caminho_acolhedores_carga_csv):
         print(f"Erro: Arquivo de carga de acolhedores não encontrado: {caminho_acolhedores_carga_csv}")
         return
 
     try:
-        conn = sqlite3.connect(caminho_banco)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
+        conn = obter_conexao()
+
+        tipo_carga = "acolhedores_atualizacao" if atualizar_existentes else "acolhedores"
+        hash_atual, ja_processados = preparar_ingestao(conn, caminho_acolhedores_carga_csv, tipo_carga, forcar)
+        if ja_processados is None:
+            print(f"LOG: Arquivo '{caminho_acolhedores_carga_csv}' já foi carregado e não mudou desde então. Nada a fazer.")
+            return
 
         print(f"Iniciando carga do arquivo: {caminho_acolhedores_carga_csv}")
-        logs = {"sucesso": 0, "ja_existe": 0, "erro_gps": 0, "erro_linha": 0}
+        logs = {"sucesso": 0, "atualizado": 0, "ja_existe": 0, "erro_gps": 0, "erro_linha": 0, "ja_carregado": 0}
+        # Linhas concluídas (gravadas, já existentes ou incompletas) não são reprocessadas numa
+        # próxima carga do mesmo arquivo; as de GP não encontrado ficam pendentes.
+        processados, pendentes = set(), 0
+
+        # Tabelas pequenas: carregadas uma vez em memória em vez de uma consulta por linha.
+        gps = dict(conn.execute("SELECT nome_lider_gps, id_gps FROM gps"))
+        emails_cadastrados = {email for (email,) in conn.execute("SELECT acolhedor_email FROM acolhedores")}
 
         with open(caminho_acolhedores_carga_csv, mode="r", encoding="utf-8") as file:
             leitor_csv = csv.DictReader(file)
+            lote, chaves_lote, numero_lote = [], [], 0
 
             for i, linha in enumerate(leitor_csv, start=2):
+                chave = hash_registro(linha)
+                if chave in ja_processados:
+                    processados.add(chave)
+                    logs["ja_carregado"] += 1
+                    continue
+
                 nome = linha.get("Nome")
                 apelido = linha.get("Apelido")
-                email = linha.get("Email")
+                email = (linha.get("Email") or "").strip()
                 lider_gps_nome_do_csv = linha.get("GP") # Este já vem normalizado do Gemini
 
                 if not nome or not email or not lider_gps_nome_do_csv:
                     print(f"AVISO (Linha {i}): Linha incompleta. Ignorando.")
                     logs["erro_linha"] += 1
+                    processados.add(chave)
                     continue
 
                 nome = normalizar_string(nome)
 
-                # Usar o valor do CSV diretamente para a busca, pois Gemini já o normalizou
-                cursor.execute(
-                    "SELECT id_gps FROM gps WHERE nome_lider_gps = ?", (lider_gps_nome_do_csv,)
-                )
-                resultado_gps = cursor.fetchone()
+                id_gps_db = gps.get(lider_gps_nome_do_csv)
+                if id_gps_db is None:
+                    id_gps_db = gps.get(normalizar_string(lider_gps_nome_do_csv))
 
-                if resultado_gps is None:
+                if id_gps_db is None:
                     print(f"ERRO (Linha {i}): GP com líder '{lider_gps_nome_do_csv}' não encontrado no banco de dados.")
                     logs["erro_gps"] += 1
+                    pendentes += 1
                     continue
 
-                id_gps_db = resultado_gps[0]
-
-                try:
-                    cursor.execute(
-                        "INSERT INTO acolhedores (acolhedor_nome, acolhedor_apelido, acolhedor_email, id_gps) VALUES (?, ?, ?, ?)",
-                        (nome, apelido, email, id_gps_db),
-                    )
-                    logs["sucesso"] += 1
-                except sqlite3.IntegrityError:
+                if email not in emails_cadastrados:
+                    emails_cadastrados.add(email)
+                elif not atualizar_existentes:
                     print(f"AVISO (Linha {i}): Acolhedor com e-mail '{email}' já existe.")
                     logs["ja_existe"] += 1
+                    processados.add(chave)
+                    continue
+
+                lote.append((nome, apelido, email, id_gps_db))
+                chaves_lote.append(chave)
+                if len(lote) >= TAMANHO_LOTE:
+                    numero_lote += 1
+                    _gravar_lote(conn, lote, numero_lote, atualizar_existentes, logs)
+                    processados.update(chaves_lote)
+                    lote, chaves_lote = [], []
+
+            if lote:
+                numero_lote += 1
+                _gravar_lote(conn, lote, numero_lote, atualizar_existentes, logs)
+                processados.update(chaves_lote)
 
-        conn.commit()
+        registrar_ingestao(conn, caminho_acolhedores_carga_csv, tipo_carga, hash_atual, processados, pendentes)
 
     except Exception as e:
         print(f"\n--- ERRO INESPERADO DURANTE A CARGA NO BANCO DE DADOS ---")
@@ -84,17 +175,16 @@ def carregar_acolhedores(caminho_acolhedores_carga_csv):
         if conn:
             conn.rollback()
 
-    finally:
-        if conn:
-            conn.close()
-
     print("\n--- Relatório de Carga de Acolhedores ---")
-    if 'logs' in locals():
+    if logs is not None:
         print(f"Novos acolhedores inseridos: {logs['sucesso']}")
-        print(f"Acolhedores ignorados (já existiam): {logs['ja_existe']}")
+        print(f"Linhas inalteradas desde a carga anterior do arquivo: {logs['ja_carregado']}")
+        print(f"Acolhedores atualizados: {logs['atualizado']}")
+        print(f"Acolhedores ignorados (já existiam sem alterações): {logs['ja_existe']}")
         print(f"Erros (GPS não encontrado): {logs['erro_gps']}")
         print(f"Erros (Linhas com dados faltando): {logs['erro_linha']}")
     print("-----------------------------------------")
+    return logs
 
 
 if __name__ == "__main__":
@@ -102,6 +192,8 @@ if __name__ == "__main__":
         description="Script para carregar acolhedores de um arquivo CSV para o banco de dados."
     )
     parser.add_argument("--caminho_acolhedores_carga_csv", required=True, help="Caminho para o arquivo acolhedores_carga.csv gerado.")
+    parser.add_argument("--atualizar", action="store_true", help="Atualiza nome, apelido e GP de acolhedores já cadastrados.")
+    parser.add_argument("--forcar", action="store_true", help="Processa o arquivo inteiro, mesmo que já tenha sido carregado.")
     args = parser.parse_args()
 
-    carregar_acolhedores(args.caminho_acolhedores_carga_csv)
+    carregar_acolhedores(args.caminho_acolhedores_carga_csv, atualizar_existentes=args.atualizar, forcar=args.forcar)
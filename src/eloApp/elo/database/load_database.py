@@ -3,18 +3,46 @@ import json
 import os
 import argparse
 from dotenv import load_dotenv
+from .connection import obter_conexao
+from .indice_trigramas import IndiceTrigramas, resolver_por_semelhanca
+from .manifesto import hash_registro, preparar_ingestao, registrar_ingestao
 from .utils import normalizar_string
 
 load_dotenv()
 
-def carregar_base_de_dados(data_param: str):
+# Quantidade de registros gravados por transação/executemany.
+TAMANHO_LOTE = 500
+
+
+def mapear_acolhedores(conn) -> dict:
+    """
+    Monta, com uma única consulta, o dicionário {nome ou apelido normalizado: id_acolhedor}.
+    Em caso de conflito o nome tem prioridade sobre o apelido, e o menor id sobre os demais.
+    """
+    linhas = conn.execute(
+        "SELECT id_acolhedor, acolhedor_nome, acolhedor_apelido FROM acolhedores ORDER BY id_acolhedor DESC"
+    ).fetchall()
+    mapa = {}
+    for id_acolhedor, _, apelido in linhas:
+        if apelido:
+            mapa[normalizar_string(apelido)] = id_acolhedor
+    for id_acolhedor, nome, _ in linhas:
+        if nome:
+            mapa[normalizar_string(nome)] = id_acolhedor
+    mapa.pop("", None)
+    return mapa
+
+
+def carregar_base_de_dados(data_param: str, forcar: bool = False):
     """
     Carrega dados de um arquivo JSON para o banco de dados SQLite.
     O arquivo é encontrado com base na data fornecida.
+    Arquivos já carregados são ignorados (ou só os registros novos/alterados são carregados),
+    conforme o manifesto de ingestão; forcar=True recarrega o arquivo inteiro.
+    Retorna as contagens do relatório de carga.
     """
     pasta_base = os.getenv("PASTA_BASE")
     pasta_json = os.getenv("PASTA_JSON")
-    nome_db = os.getenv("NOME_BANCO_DADOS")
 
     if not pasta_base:
         print("Erro: Variável de ambiente PASTA_BASE não está configurada.")
@@ -27,82 +55,120 @@ def carregar_base_de_dados(data_param: str):
         print(f"Erro: Arquivo '{nome_arquivo}' não encontrado na pasta '{pasta_base}'.")
         return
 
+    conn = obter_conexao()
+    hash_atual, ja_processados = preparar_ingestao(conn, caminho_arquivo, "acolhimento", forcar)
+    if ja_processados is None:
+        print(f"LOG: Arquivo '{nome_arquivo}' já foi carregado e não mudou desde então. Nada a fazer.")
+        return
+
     print(f"Iniciando carga do arquivo: {caminho_arquivo}")
 
     with open(caminho_arquivo, "r", encoding="utf-8") as f:
         registros = json.load(f)
-        caminho_banco = os.path.join(pasta_base, nome_db)
-    conn = sqlite3.connect(caminho_banco)
-    cursor = conn.cursor()
-    # Habilita o suporte a chaves estrangeiras
-    cursor.execute("PRAGMA foreign_keys = ON;")
 
-    logs = {"sucesso": 0, "descartado": 0, "erros_acolhedor": 0}
+    logs = {"sucesso": 0, "descartado": 0, "erros_acolhedor": 0, "duplicado": 0, "resolvido_semelhanca": 0, "ja_carregado": 0}
     data_decisao = registros["data"]
     evento = registros.get("evento", "")
 
+    # Resolve todos os acolhedores em memória antes de tocar no banco.
+    acolhedores = mapear_acolhedores(conn)
+    indice_acolhedores = None
+    linhas, chaves_linhas = [], []
+    # Registros concluídos (carregados, duplicados ou descartados) não são reprocessados
+    # numa próxima carga do mesmo arquivo; os que falharem ficam pendentes.
+    processados, pendentes = set(), 0
+
     for reg in registros["lista"]:
+        chave = hash_registro([data_decisao, evento, reg])
+        if chave in ja_processados:
+            processados.add(chave)
+            logs["ja_carregado"] += 1
+            continue
+
         plano = reg.get("plano_de_acao", "")
 
-        if "Descartar" in plano:
+        if "Descartar" in plano or not reg.get("nome"):
             print(
                 f"LOG: Registro para '{reg.get('nome', 'N/A')}' descartado conforme plano de ação: {plano}."
             )
             logs["descartado"] += 1
+            processados.add(chave)
             continue
 
-        nome_acolhedor = reg.get("acolhedor")
-        if nome_acolhedor:
-            nome_acolhedor = normalizar_string(nome_acolhedor)
-
-        # Busca o ID do acolhedor no banco de dados, verificando nome ou apelido
-        cursor.execute(
-            "SELECT id_acolhedor FROM acolhedores WHERE acolhedor_nome = ? OR acolhedor_apelido = ?",
-            (nome_acolhedor, nome_acolhedor,),
-        )
-        resultado = cursor.fetchone()
-
-        if resultado is None:
+        nome_acolhedor = normalizar_string(reg.get("acolhedor"))
+        id_acolhedor_db = acolhedores.get(nome_acolhedor)
+        candidatos = []
+
+        if id_acolhedor_db is None and nome_acolhedor:
+            if indice_acolhedores is None:
+                indice_acolhedores = IndiceTrigramas(acolhedores.items())
+            id_acolhedor_db, candidatos = resolver_por_semelhanca(indice_acolhedores, nome_acolhedor)
+            if id_acolhedor_db is not None:
+                print(
+                    f"LOG: Acolhedor '{nome_acolhedor}' resolvido por semelhança como '{candidatos[0][1]}' ({candidatos[0][2]:.0%}) para o visitante '{reg.get('nome')}'."
+                )
+                logs["resolvido_semelhanca"] += 1
+                # Outros visitantes do mesmo acolhedor não precisam repetir a busca.
+                acolhedores[nome_acolhedor] = id_acolhedor_db
+
+        if id_acolhedor_db is None:
+            sugestoes = ", ".join(f"{chave} ({similaridade:.0%})" for _, chave, similaridade in candidatos)
             print(
                 f"ERRO DE CARGA: Acolhedor '{nome_acolhedor}' não encontrado no banco de dados para o visitante '{reg.get('nome')}'. Registro ignorado."
+                + (f" Sugestões: {sugestoes}." if sugestoes else "")
             )
             logs["erros_acolhedor"] += 1
+            pendentes += 1
             continue
 
-        id_acolhedor_db = resultado[0]
+        chaves_linhas.append(chave)
+        linhas.append(
+            (
+                reg.get("nome"),
+                reg.get("idade"),
+                reg.get("celular"),
+                data_decisao,
+                id_acolhedor_db,
+                reg.get("HouM"),
+                reg.get("situacao"),
+                evento,
+                normalizar_string(reg.get("nome")),
+            )
+        )
 
+    for inicio in range(0, len(linhas), TAMANHO_LOTE):
+        lote = linhas[inicio : inicio + TAMANHO_LOTE]
         try:
-            cursor.execute(
-                """
-                INSERT INTO acolhimento (nome, idade, numero, data_decisao, id_acolhedor, HouM, situacao, evento)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    reg.get("nome"),
-                    reg.get("idade"),
-                    reg.get("celular"),
-                    data_decisao,
-                    id_acolhedor_db,
-                    reg.get("HouM"),
-                    reg.get("situacao"),
-                    evento,
-                ),
-            )
-            logs["sucesso"] += 1
-        except sqlite3.IntegrityError:
-            print(f"LOG: Registro duplicado para '{reg.get('nome')}' na data '{data_decisao}'. Ignorando.")
-            logs["duplicado"] = logs.get("duplicado", 0) + 1
+            with conn:
+                cursor = conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO acolhimento (nome, idade, numero, data_decisao, id_acolhedor, HouM, situacao, evento, nome_normalizado)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    lote,
+                )
+                # rowcount soma apenas as linhas inseridas (não conta as escritas feitas por triggers).
+                inseridos = cursor.rowcount
         except sqlite3.Error as e:
-            print(f"ERRO SQL ao inserir '{reg.get('nome')}': {e}")
+            print(f"ERRO SQL ao inserir o lote de {len(lote)} registros a partir de '{lote[0][0]}': {e}")
+            pendentes += len(lote)
+            continue
+        # Linhas ignoradas pelo INSERT OR IGNORE já existiam para o mesmo nome e data.
+        logs["sucesso"] += inseridos
+        logs["duplicado"] += len(lote) - inseridos
+        processados.update(chaves_linhas[inicio : inicio + TAMANHO_LOTE])
 
-    conn.commit()
-    conn.close()
+    registrar_ingestao(conn, caminho_arquivo, "acolhimento", hash_atual, processados, pendentes)
 
     print("\n--- Relatório de Carga ---")
     print(f"Registros carregados com sucesso: {logs['sucesso']}")
+    print(f"Registros inalterados desde a carga anterior do arquivo: {logs['ja_carregado']}")
+    print(f"Registros duplicados (já existiam na data '{data_decisao}'): {logs['duplicado']}")
     print(f"Registros descartados (dados essenciais faltando): {logs['descartado']}")
+    print(f"Registros com acolhedor resolvido por semelhança de nome: {logs['resolvido_semelhanca']}")
     print(f"Registros com erro (acolhedor não encontrado): {logs['erros_acolhedor']}")
     print("--------------------------")
+    return logs
 
 
 if __name__ == "__main__":
@@ -112,6 +178,9 @@ if __name__ == "__main__":
     parser.add_argument(
         "--data", required=True, help="Data do arquivo de carga no formato ddmmyy."
     )
+    parser.add_argument(
+        "--forcar", action="store_true", help="Recarrega o arquivo inteiro, mesmo que já tenha sido carregado."
+    )
     args = parser.parse_args()
 
-    carregar_base_de_dados(args.data)
\ No newline at end of file
+    carregar_base_de_dados(args.data, forcar=args.forcar)
\ No newline at end of file
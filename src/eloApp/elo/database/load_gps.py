@@ -1,67 +1,71 @@
 import sqlite3
 import pandas as pd
 import os
-import unicodedata
-import re
 from dotenv import load_dotenv
-from .utils import normalizar_string
+from .connection import obter_conexao
+from .utils import normalizar_series
 
 load_dotenv()
 
-def carregar_gps(caminho_arquivo_csv: str):
-    pasta_base = os.getenv("PASTA_BASE")
-    nome_db = os.getenv("NOME_BANCO_DADOS")
-    caminho_banco = os.path.join(pasta_base, nome_db)
+COLUNA_LIDER = "LÍDER_name"
+
 
+def carregar_gps(caminho_arquivo_csv: str):
     if not caminho_arquivo_csv or not os.path.exists(caminho_arquivo_csv):
         print(f"Erro: Caminho para o arquivo CSV de GPs é inválido ou o arquivo não foi encontrado: '{caminho_arquivo_csv}'")
         return
 
     try:
-        df = pd.read_csv(caminho_arquivo_csv)
-        if 'LÍDER_name' not in df.columns:
-            print(f"Erro: O arquivo CSV deve conter a coluna 'LÍDER_name'. Colunas encontradas: {df.columns.tolist()}")
+        # As planilhas de GP têm dezenas de colunas; só a do líder é lida e convertida.
+        df = pd.read_csv(caminho_arquivo_csv, usecols=lambda coluna: coluna == COLUNA_LIDER, dtype=str)
+        if COLUNA_LIDER not in df.columns:
+            colunas = pd.read_csv(caminho_arquivo_csv, nrows=0).columns.tolist()
+            print(f"Erro: O arquivo CSV deve conter a coluna '{COLUNA_LIDER}'. Colunas encontradas: {colunas}")
             return
 
     except Exception as e:
         print(f"Erro ao ler ou processar o arquivo CSV: {e}")
         return
 
-    conn = sqlite3.connect(caminho_banco)
-    cursor = conn.cursor()
+    conn = obter_conexao()
 
-    logs = {"sucesso": 0, "falha": 0, "ja_existe": 0}
+    logs = {"sucesso": 0, "falha": 0, "ja_existe": 0, "em_branco": 0, "nome_invalido": 0}
 
-    for index, row in df.iterrows():
-        nome_lider_original = row.get("LÍDER_name")
+    lideres = df[COLUNA_LIDER]
+    em_branco = lideres.isna() | (lideres.str.strip() == "")
+    for index in lideres.index[em_branco]:
+        print(f"AVISO (Linha {index + 2}): Linha com nome do líder em branco. Ignorando.")
+    logs["em_branco"] = int(em_branco.sum())
 
-        if not nome_lider_original:
-            print(f"AVISO (Linha {index + 2}): Linha com nome do líder em branco. Ignorando.")
-            continue
+    normalizados = normalizar_series(lideres[~em_branco])
+    # Nomes só com pontuação ou símbolos ficam vazios depois de normalizados.
+    invalidos = normalizados == ""
+    for index in normalizados.index[invalidos]:
+        print(f"AVISO (Linha {index + 2}): Nome do líder '{lideres[index]}' não tem letras nem números. Ignorando.")
+    logs["nome_invalido"] = int(invalidos.sum())
+    normalizados = normalizados[~invalidos]
+    unicos = normalizados.drop_duplicates()
 
-        nome_lider_normalizado = normalizar_string(nome_lider_original)
+    existentes = {nome for (nome,) in conn.execute("SELECT nome_lider_gps FROM gps")}
+    ja_existem = unicos.isin(existentes)
+    for nome_lider_normalizado in unicos[ja_existem]:
+        print(f"LOG: Líder '{nome_lider_normalizado}' já existe no banco de dados. Ignorando.")
+    logs["ja_existe"] = int(ja_existem.sum()) + (len(normalizados) - len(unicos))
 
-        try:
-            cursor.execute(
-                """
-                INSERT INTO gps (nome_lider_gps)
-                VALUES (?)
-                """,
-                (nome_lider_normalizado,),
-            )
-            logs["sucesso"] += 1
-        except sqlite3.IntegrityError:
-            print(f"LOG: Líder '{nome_lider_normalizado}' (original: '{nome_lider_original}') já existe no banco de dados. Ignorando.")
-            logs["ja_existe"] += 1
-        except sqlite3.Error as e:
-            print(f"ERRO SQL ao inserir líder '{nome_lider_normalizado}' (original: '{nome_lider_original}'): {e}")
-            logs["falha"] += 1
-
-    conn.commit()
-    conn.close()
+    novos = unicos[~ja_existem].tolist()
+    try:
+        with conn:
+            conn.executemany("INSERT INTO gps (nome_lider_gps) VALUES (?)", ((nome,) for nome in novos))
+        logs["sucesso"] = len(novos)
+    except sqlite3.Error as e:
+        print(f"ERRO SQL ao inserir {len(novos)} líderes: {e}")
+        logs["falha"] = len(novos)
 
     print("\n--- Relatório de Carga de GPs ---")
     print(f"GPs carregados com sucesso: {logs['sucesso']}")
-    print(f"GPs ignorados (já existiam): {logs['ja_existe']}")
+    print(f"GPs ignorados (já existiam ou repetidos no arquivo): {logs['ja_existe']}")
+    print(f"Linhas ignoradas (líder em branco): {logs['em_branco']}")
+    print(f"Linhas ignoradas (nome do líder sem letras nem números): {logs['nome_invalido']}")
     print(f"Falhas na carga: {logs['falha']}")
-    print("---------------------------------")
\ No newline at end of file
+    print("---------------------------------")
+    return logs
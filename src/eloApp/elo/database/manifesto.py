@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+
+def hash_arquivo(caminho: str) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo, lendo-o em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def hash_registro(registro) -> str:
+    """Identifica um registro (dict, lista, tupla...) pelo hash do seu conteúdo, independente da ordem das chaves."""
+    serializado = json.dumps(registro, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(serializado.encode("utf-8")).hexdigest()
+
+
+def consultar_ingestao(conn: sqlite3.Connection, caminho: str, tipo: str):
+    """
+    Retorna o que a última ingestão do arquivo registrou, como um dict com "hash",
+    "chaves" (hashes dos registros já processados) e "pendentes" (registros que falharam),
+    ou None se o arquivo nunca foi carregado com este tipo de carga.
+    """
+    linha = conn.execute(
+        "SELECT hash_conteudo, chaves_registros, pendentes FROM ingestion_manifest WHERE caminho = ? AND tipo = ?",
+        (os.path.abspath(caminho), tipo),
+    ).fetchone()
+    if linha is None:
+        return None
+    return {"hash": linha[0], "chaves": set(json.loads(linha[1])), "pendentes": linha[2]}
+
+
+def registrar_ingestao(conn: sqlite3.Connection, caminho: str, tipo: str, hash_conteudo: str, chaves, pendentes: int):
+    """Grava (ou substitui) o registro da ingestão do arquivo no manifesto."""
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO ingestion_manifest (caminho, tipo, hash_conteudo, chaves_registros, pendentes, atualizado_em)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(caminho, tipo) DO UPDATE SET
+                hash_conteudo = excluded.hash_conteudo,
+                chaves_registros = excluded.chaves_registros,
+                pendentes = excluded.pendentes,
+                atualizado_em = excluded.atualizado_em
+            """,
+            (os.path.abspath(caminho), tipo, hash_conteudo, json.dumps(sorted(chaves)), pendentes),
+        )
+
+
+def preparar_ingestao(conn: sqlite3.Connection, caminho: str, tipo: str, forcar: bool = False):
+    """
+    Compara o arquivo com o manifesto. Retorna (hash_atual, chaves_ja_processadas), ou
+    (hash_atual, None) quando o arquivo não mudou desde uma ingestão completa e pode ser ignorado.
+    Com forcar=True, o arquivo é sempre carregado por inteiro.
+    """
+    hash_atual = hash_arquivo(caminho)
+    anterior = None if forcar else consultar_ingestao(conn, caminho, tipo)
+    if anterior is None:
+        return hash_atual, set()
+    if anterior["hash"] == hash_atual and anterior["pendentes"] == 0:
+        return hash_atual, None
+    return hash_atual, anterior["chaves"]
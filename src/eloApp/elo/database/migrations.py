@@ -0,0 +1,323 @@
+import sqlite3
+
+
+def _criar_indice_fts_visitantes(conn: sqlite3.Connection):
+    """Cria o índice FTS5 (opcional) sobre o nome normalizado dos visitantes, se o SQLite tiver suporte."""
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS acolhimento_fts USING fts5(
+                nome_normalizado, content='acolhimento', content_rowid='id'
+            );
+            """
+        )
+    except sqlite3.OperationalError:
+        print("AVISO: SQLite sem suporte a FTS5. A busca por nomes parciais usará apenas o índice comum.")
+        return
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS acolhimento_fts_ai AFTER INSERT ON acolhimento BEGIN
+            INSERT INTO acolhimento_fts(rowid, nome_normalizado) VALUES (new.id, new.nome_normalizado);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS acolhimento_fts_ad AFTER DELETE ON acolhimento BEGIN
+            INSERT INTO acolhimento_fts(acolhimento_fts, rowid, nome_normalizado)
+            VALUES ('delete', old.id, old.nome_normalizado);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS acolhimento_fts_au AFTER UPDATE OF nome_normalizado ON acolhimento BEGIN
+            INSERT INTO acolhimento_fts(acolhimento_fts, rowid, nome_normalizado)
+            VALUES ('delete', old.id, old.nome_normalizado);
+            INSERT INTO acolhimento_fts(rowid, nome_normalizado) VALUES (new.id, new.nome_normalizado);
+        END;
+        """
+    )
+    conn.execute("INSERT INTO acolhimento_fts(acolhimento_fts) VALUES ('rebuild');")
+
+
+# Cada migração é (versão, descrição, comandos). Um comando é um SQL ou uma função que
+# recebe a conexão. As versões já aplicadas ficam registradas na tabela schema_version;
+# novas alterações de esquema devem entrar como uma nova versão no fim da lista, nunca
+# editando uma migração já publicada.
+MIGRACOES = [
+    (
+        1,
+        "Tabelas iniciais (gps, acolhedores, acolhimento)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS gps (
+                id_gps INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome_lider_gps VARCHAR(45) NOT NULL UNIQUE
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS acolhedores (
+                id_acolhedor INTEGER PRIMARY KEY AUTOINCREMENT,
+                acolhedor_nome VARCHAR(45) NOT NULL,
+                acolhedor_apelido VARCHAR(45),
+                acolhedor_email VARCHAR(45) NOT NULL UNIQUE,
+                id_gps INTEGER,
+                FOREIGN KEY (id_gps) REFERENCES gps(id_gps)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS acolhimento (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome VARCHAR(70) NOT NULL,
+                idade INTEGER,
+                numero VARCHAR(45),
+                situacao VARCHAR(45),
+                data_decisao DATETIME NOT NULL,
+                data_carga DATETIME DEFAULT CURRENT_TIMESTAMP,
+                status_contato VARCHAR(45) DEFAULT 'Pendente',
+                observacoes VARCHAR(255),
+                id_acolhedor INTEGER,
+                HouM VARCHAR(1),
+                evento VARCHAR(45),
+                FOREIGN KEY (id_acolhedor) REFERENCES acolhedores(id_acolhedor),
+                UNIQUE(nome, data_decisao)
+            );
+            """,
+        ],
+    ),
+    (
+        2,
+        "Índices para as consultas de disparo, relatórios e cargas",
+        [
+            # gps.nome_lider_gps e acolhedores.acolhedor_email já são indexados pelas restrições UNIQUE.
+            "CREATE INDEX IF NOT EXISTS idx_acolhedores_nome ON acolhedores(acolhedor_nome);",
+            "CREATE INDEX IF NOT EXISTS idx_acolhedores_apelido ON acolhedores(acolhedor_apelido);",
+            "CREATE INDEX IF NOT EXISTS idx_acolhedores_gps ON acolhedores(id_gps);",
+            "CREATE INDEX IF NOT EXISTS idx_acolhimento_acolhedor_status ON acolhimento(id_acolhedor, status_contato);",
+            "CREATE INDEX IF NOT EXISTS idx_acolhimento_status_data ON acolhimento(status_contato, data_decisao, id_acolhedor);",
+            # Índices parciais: só contêm as linhas ainda em aberto, que são as consultadas a cada
+            # disparo de e-mails e a cada carga de respostas, e continuam pequenos com o histórico.
+            """
+            CREATE INDEX IF NOT EXISTS idx_acolhimento_pendentes
+            ON acolhimento(id_acolhedor, data_decisao, nome, idade, numero)
+            WHERE status_contato = 'Pendente';
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_acolhimento_notificados
+            ON acolhimento(id_acolhedor, nome)
+            WHERE status_contato = 'Notificado';
+            """,
+            "ANALYZE;",
+        ],
+    ),
+    (
+        3,
+        "Nome normalizado dos visitantes, indexado por acolhedor, e índice FTS5 opcional",
+        [
+            "ALTER TABLE acolhimento ADD COLUMN nome_normalizado VARCHAR(70);",
+            # normalizar() é a função normalizar_string registrada em cada conexão (ver connection.py).
+            "UPDATE acolhimento SET nome_normalizado = normalizar(nome);",
+            "CREATE INDEX IF NOT EXISTS idx_acolhimento_acolhedor_nome_normalizado ON acolhimento(id_acolhedor, nome_normalizado);",
+            "CREATE INDEX IF NOT EXISTS idx_acolhimento_nome_normalizado ON acolhimento(nome_normalizado);",
+            _criar_indice_fts_visitantes,
+        ],
+    ),
+    (
+        4,
+        "Manifesto de ingestão dos arquivos de carga",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_manifest (
+                caminho VARCHAR(255) PRIMARY KEY,
+                tipo VARCHAR(45) NOT NULL,
+                hash_conteudo CHAR(64) NOT NULL,
+                chaves_registros TEXT NOT NULL DEFAULT '[]',
+                pendentes INTEGER NOT NULL DEFAULT 0,
+                atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            """,
+        ],
+    ),
+    (
+        5,
+        "Caixa de saída (outbox) persistente dos e-mails",
+        [
+            # A mensagem é gravada já serializada (bytes MIME), na mesma transação que a
+            # mudança de status, e enviada depois pelo drenador (elo/services/outbox.py).
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo VARCHAR(45) NOT NULL,
+                remetente VARCHAR(255),
+                destinatarios TEXT NOT NULL,
+                mensagem BLOB NOT NULL,
+                status VARCHAR(45) NOT NULL DEFAULT 'pendente',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                ultimo_erro VARCHAR(255),
+                criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                proxima_tentativa DATETIME DEFAULT CURRENT_TIMESTAMP,
+                reservado_em DATETIME,
+                enviado_em DATETIME
+            );
+            """,
+            # Visitantes cobertos por cada notificação, para voltarem a 'Pendente' se o envio falhar de vez.
+            """
+            CREATE TABLE IF NOT EXISTS outbox_visitantes (
+                id_outbox INTEGER NOT NULL,
+                id_acolhimento INTEGER NOT NULL,
+                PRIMARY KEY (id_outbox, id_acolhimento),
+                FOREIGN KEY (id_outbox) REFERENCES outbox(id),
+                FOREIGN KEY (id_acolhimento) REFERENCES acolhimento(id)
+            ) WITHOUT ROWID;
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, proxima_tentativa);",
+        ],
+    ),
+    (
+        6,
+        "Data de decisão em formato ISO (coluna gerada) para filtros por período",
+        [
+            # data_decisao é gravada como dd/mm/yyyy, que não pode ser comparada como texto.
+            # A coluna virtual não ocupa espaço na tabela, só no índice abaixo.
+            """
+            ALTER TABLE acolhimento ADD COLUMN data_decisao_iso VARCHAR(10) GENERATED ALWAYS AS (
+                CASE
+                    WHEN data_decisao LIKE '__/__/____'
+                    THEN substr(data_decisao, 7, 4) || '-' || substr(data_decisao, 4, 2) || '-' || substr(data_decisao, 1, 2)
+                    ELSE substr(data_decisao, 1, 10)
+                END
+            ) VIRTUAL;
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_acolhimento_pendentes_periodo
+            ON acolhimento(data_decisao_iso, id_acolhedor)
+            WHERE status_contato = 'Pendente';
+            """,
+        ],
+    ),
+    (
+        7,
+        "Estado da sincronização incremental do IMAP (UIDVALIDITY, último UID e falhas)",
+        [
+            # Cada consumidor (ex: geração do JSON de respostas) tem sua própria marca d'água,
+            # para que um não "consuma" as mensagens que o outro ainda não processou.
+            """
+            CREATE TABLE IF NOT EXISTS imap_estado (
+                consumidor VARCHAR(45) NOT NULL,
+                conta VARCHAR(255) NOT NULL,
+                pasta VARCHAR(255) NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                ultimo_uid INTEGER NOT NULL DEFAULT 0,
+                atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (consumidor, conta, pasta)
+            );
+            """,
+            # Mensagens já ultrapassadas pela marca d'água cujo processamento falhou e será refeito.
+            """
+            CREATE TABLE IF NOT EXISTS imap_falhas (
+                consumidor VARCHAR(45) NOT NULL,
+                conta VARCHAR(255) NOT NULL,
+                pasta VARCHAR(255) NOT NULL,
+                uid INTEGER NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 1,
+                ultimo_erro VARCHAR(255),
+                atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (consumidor, conta, pasta, uid)
+            );
+            """,
+        ],
+    ),
+    (
+        8,
+        "Message-ID das notificações, para ligar as respostas aos visitantes notificados",
+        [
+            # As respostas trazem o Message-ID da notificação em In-Reply-To/References; a partir
+            # dele, outbox_visitantes dá os visitantes cobertos, sem depender dos nomes digitados.
+            """
+            CREATE TABLE IF NOT EXISTS notificacoes (
+                message_id VARCHAR(255) PRIMARY KEY,
+                id_outbox INTEGER NOT NULL,
+                id_acolhedor INTEGER,
+                criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (id_outbox) REFERENCES outbox(id),
+                FOREIGN KEY (id_acolhedor) REFERENCES acolhedores(id_acolhedor)
+            ) WITHOUT ROWID;
+            """,
+        ],
+    ),
+    (
+        9,
+        "Manifesto de ingestão com uma linha por (arquivo, tipo de carga)",
+        [
+            # O mesmo arquivo pode ser carregado com tipos diferentes (ex: acolhedores e
+            # acolhedores_atualizacao); com a chave só no caminho, um tipo apagava o registro do outro.
+            """
+            CREATE TABLE ingestion_manifest_nova (
+                caminho VARCHAR(255) NOT NULL,
+                tipo VARCHAR(45) NOT NULL,
+                hash_conteudo CHAR(64) NOT NULL,
+                chaves_registros TEXT NOT NULL DEFAULT '[]',
+                pendentes INTEGER NOT NULL DEFAULT 0,
+                atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (caminho, tipo)
+            );
+            """,
+            "INSERT INTO ingestion_manifest_nova SELECT caminho, tipo, hash_conteudo, chaves_registros, pendentes, atualizado_em FROM ingestion_manifest;",
+            "DROP TABLE ingestion_manifest;",
+            "ALTER TABLE ingestion_manifest_nova RENAME TO ingestion_manifest;",
+        ],
+    ),
+]
+
+
+def versao_atual(conn: sqlite3.Connection) -> int:
+    """Retorna a versão de esquema registrada no banco (0 se nenhuma migração foi aplicada)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao VARCHAR(255),
+            aplicada_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    versao = conn.execute("SELECT MAX(versao) FROM schema_version").fetchone()[0]
+    return versao or 0
+
+
+def aplicar_migracoes(conn: sqlite3.Connection) -> list:
+    """
+    Aplica, em ordem e cada uma em sua própria transação, as migrações ainda não registradas.
+    Retorna a lista das versões aplicadas nesta chamada.
+    """
+    aplicadas = []
+    versao_banco = versao_atual(conn)
+
+    for versao, descricao, comandos in MIGRACOES:
+        if versao <= versao_banco:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            # Outro processo pode ter aplicado a mesma migração enquanto esperávamos o lock.
+            if conn.execute("SELECT 1 FROM schema_version WHERE versao = ?", (versao,)).fetchone():
+                conn.rollback()
+                continue
+            for comando in comandos:
+                if callable(comando):
+                    comando(conn)
+                else:
+                    conn.execute(comando)
+            conn.execute(
+                "INSERT INTO schema_version (versao, descricao) VALUES (?, ?)",
+                (versao, descricao),
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"LOG: Migração {versao} aplicada: {descricao}.")
+        aplicadas.append(versao)
+
+    return aplicadas
@@ -1,6 +1,7 @@
-import sqlite3
 import os
 from dotenv import load_dotenv
+from .connection import obter_conexao
+from .migrations import aplicar_migracoes
 
 load_dotenv()
 
@@ -18,59 +19,9 @@ def setup():
         print("Erro: Variável de ambiente NOME_BANCO_DADOS não está configurada.")
         exit(2)
 
-    caminho_banco = os.path.join(PASTA_BASE, NOME_BANCO_DADOS)
-
-    conn = sqlite3.connect(caminho_banco)
-    cursor = conn.cursor()
-
-    # Habilita o suporte a chaves estrangeiras no SQLite
-    cursor.execute("PRAGMA foreign_keys = ON;")
-
-    # 1. Tabela 'gps'
-    cursor.execute(
-        """
-    CREATE TABLE IF NOT EXISTS gps (
-        id_gps INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome_lider_gps VARCHAR(45) NOT NULL UNIQUE
-    );
-    """
-    )
-
-    # 2. Tabela 'acolhedores'
-    cursor.execute(
-        """
-    CREATE TABLE IF NOT EXISTS acolhedores (
-        id_acolhedor INTEGER PRIMARY KEY AUTOINCREMENT,
-        acolhedor_nome VARCHAR(45) NOT NULL,
-        acolhedor_apelido VARCHAR(45),
-        acolhedor_email VARCHAR(45) NOT NULL UNIQUE,
-        id_gps INTEGER,
-        FOREIGN KEY (id_gps) REFERENCES gps(id_gps)
-    );
-    """
-    )
-
-    # 3. Tabela 'acolhimento'
-    cursor.execute(
-        """
-    CREATE TABLE IF NOT EXISTS acolhimento (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome VARCHAR(70) NOT NULL,
-        idade INTEGER,
-        numero VARCHAR(45),
-        situacao VARCHAR(45),
-        data_decisao DATETIME NOT NULL,
-        data_carga DATETIME DEFAULT CURRENT_TIMESTAMP,
-        status_contato VARCHAR(45) DEFAULT 'Pendente',
-        observacoes VARCHAR(255),
-        id_acolhedor INTEGER,
-        HouM VARCHAR(1),
-        evento VARCHAR(45),
-        FOREIGN KEY (id_acolhedor) REFERENCES acolhedores(id_acolhedor),
-        UNIQUE(nome, data_decisao)
-    );
-    """
-    )
+    # Cria as tabelas e índices (ou atualiza um banco existente) pelas migrações versionadas.
+    conn = obter_conexao()
+    aplicar_migracoes(conn)
 
     return "Banco de dados e tabelas verificados/criados com sucesso."
 
@@ -1,13 +1,66 @@
 import unicodedata
 import re
+from functools import lru_cache
+
+_RE_ESPACOS = re.compile(r'\s+')
+_RE_INVALIDOS = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def _remover_acentos(s):
+    nfkd_form = unicodedata.normalize('NFKD', s)
+    return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
+
+
+# Tabela de tradução pré-calculada para os caracteres latinos acentuados (À-ſ), que cobrem
+# praticamente todos os nomes em português sem precisar da decomposição NFKD.
+_TABELA_ACENTOS = str.maketrans({chr(c): _remover_acentos(chr(c)) for c in range(0xC0, 0x180)})
+
+
+@lru_cache(maxsize=16384)
+def _normalizar(s):
+    if not s.isascii():
+        traduzida = s.translate(_TABELA_ACENTOS)
+        s = traduzida if traduzida.isascii() else _remover_acentos(s)
+    sem_espacos_extra = _RE_ESPACOS.sub(' ', s).strip()
+    com_underscore = sem_espacos_extra.replace(' ', '_')
+    final = _RE_INVALIDOS.sub('', com_underscore)
+    return final.lower()
+
 
 def normalizar_string(s):
     """Normaliza uma string: minúsculas, sem acentos, sem espaços extras e com underscores."""
     if not isinstance(s, str):
         return ""
-    nfkd_form = unicodedata.normalize('NFKD', s)
-    sem_acentos = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
-    sem_espacos_extra = re.sub(r'\s+', ' ', sem_acentos).strip()
-    com_underscore = sem_espacos_extra.replace(' ', '_')
-    final = re.sub(r'[^a-zA-Z0-9_]', '', com_underscore)
-    return final.lower()
\ No newline at end of file
+    return _normalizar(s)
+
+
+def normalizar_series(valores):
+    """
+    Normaliza uma coluna inteira (pandas.Series) ou qualquer iterável de strings de uma vez.
+    Cada valor distinto é normalizado uma única vez; o resultado mantém o tipo e a ordem da entrada.
+    """
+    if hasattr(valores, "map") and hasattr(valores, "unique"):
+        mapa = {valor: normalizar_string(valor) for valor in valores.unique()}
+        return valores.map(mapa)
+    return [normalizar_string(valor) for valor in valores]
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: python -m eloApp.elo.database.utils
+    import random
+    import timeit
+
+    def _normalizar_sem_cache(s):
+        if not isinstance(s, str):
+            return ""
+        sem_espacos_extra = re.sub(r'\s+', ' ', _remover_acentos(s)).strip()
+        return re.sub(r'[^a-zA-Z0-9_]', '', sem_espacos_extra.replace(' ', '_')).lower()
+
+    nomes = ["José da Conceição", "Ana Lúcia  Gonçalves", "João Pedro", "Mônica Araújo", "Luíza Brandão"]
+    amostra = [random.choice(nomes) + f" {random.randint(0, 200)}" for _ in range(10000)]
+    assert [_normalizar_sem_cache(n) for n in amostra] == normalizar_series(amostra)
+
+    antes = timeit.timeit(lambda: [_normalizar_sem_cache(n) for n in amostra], number=20)
+    depois = timeit.timeit(lambda: normalizar_series(amostra), number=20)
+    print(f"Implementação anterior: {antes * 1000 / 20:.2f} ms por 10.000 nomes")
+    print(f"normalizar_series:      {depois * 1000 / 20:.2f} ms por 10.000 nomes ({antes / depois:.1f}x)")
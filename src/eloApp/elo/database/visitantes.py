@@ -0,0 +1,120 @@
+import sqlite3
+from .utils import normalizar_string
+
+
+def possui_indice_fts(conn: sqlite3.Connection) -> bool:
+    """Indica se o índice FTS5 de nomes de visitantes foi criado neste banco."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'acolhimento_fts'"
+    ).fetchone() is not None
+
+
+def _contem_palavras(nome_normalizado, palavras) -> bool:
+    """Todas as `palavras` começam alguma parte do nome (ex: "mar" e "sil" em "maria_da_silva")."""
+    partes = (nome_normalizado or "").split("_")
+    return all(any(parte.startswith(palavra) for parte in partes) for palavra in palavras)
+
+
+def localizar_visitantes(conn: sqlite3.Connection, nome: str, id_acolhedor=None, status=None) -> list:
+    """
+    Retorna os ids de acolhimento do visitante `nome`, opcionalmente restritos a um acolhedor
+    e a um status_contato, sempre por consultas indexadas.
+
+    Primeiro procura o nome normalizado exato. Se não houver, aceita uma correspondência parcial
+    (todas as palavras informadas presentes no nome, como "Maria" para "Maria Silva") somente
+    quando ela for única, para nunca atualizar o visitante errado.
+    """
+    nome_normalizado = normalizar_string(nome)
+    if not nome_normalizado:
+        return []
+
+    filtros, parametros = "", []
+    if id_acolhedor is not None:
+        filtros += " AND a.id_acolhedor = ?"
+        parametros.append(id_acolhedor)
+    if status is not None:
+        filtros += " AND a.status_contato = ?"
+        parametros.append(status)
+
+    ids = [
+        id_
+        for (id_,) in conn.execute(
+            f"SELECT a.id FROM acolhimento AS a WHERE a.nome_normalizado = ?{filtros}",
+            [nome_normalizado, *parametros],
+        )
+    ]
+    if ids:
+        return ids
+
+    palavras = [palavra for palavra in nome_normalizado.split("_") if palavra]
+    if possui_indice_fts(conn):
+        consulta_fts = " AND ".join(f'"{palavra}"*' for palavra in palavras)
+        candidatos = [
+            id_
+            for (id_,) in conn.execute(
+                f"""
+                SELECT a.id FROM acolhimento AS a
+                WHERE a.id IN (SELECT rowid FROM acolhimento_fts WHERE acolhimento_fts MATCH ?){filtros}
+                """,
+                [consulta_fts, *parametros],
+            )
+        ]
+    elif id_acolhedor is not None:
+        # Sem FTS5: compara as palavras apenas entre os visitantes do acolhedor (busca indexada).
+        candidatos = [
+            id_
+            for id_, candidato in conn.execute(
+                f"SELECT a.id, a.nome_normalizado FROM acolhimento AS a WHERE 1 = 1{filtros}",
+                parametros,
+            )
+            if _contem_palavras(candidato, palavras)
+        ]
+    else:
+        candidatos = []
+
+    return candidatos if len(candidatos) == 1 else []
+
+
+def localizar_entre_candidatos(candidatos, nome: str) -> list:
+    """
+    Como localizar_visitantes, mas entre candidatos já conhecidos (pares id, nome), por exemplo os
+    visitantes da notificação respondida: nome normalizado exato, ou correspondência parcial única.
+    """
+    nome_normalizado = normalizar_string(nome)
+    if not nome_normalizado:
+        return []
+    normalizados = [(id_, normalizar_string(candidato)) for id_, candidato in candidatos]
+
+    ids = [id_ for id_, candidato in normalizados if candidato == nome_normalizado]
+    if ids:
+        return ids
+
+    palavras = [palavra for palavra in nome_normalizado.split("_") if palavra]
+    parciais = [id_ for id_, candidato in normalizados if _contem_palavras(candidato, palavras)]
+    return parciais if len(parciais) == 1 else []
+
+
+def visitantes_das_notificacoes(conn: sqlite3.Connection, message_ids, id_acolhedor=None) -> list:
+    """
+    Retorna (id, nome) dos visitantes cobertos pelas notificações com esses Message-IDs (tabela
+    notificacoes + outbox_visitantes, ambas consultadas pela chave primária). Com `id_acolhedor`,
+    só valem as notificações enviadas a ele.
+    """
+    message_ids = list(dict.fromkeys(message_ids))
+    if not message_ids:
+        return []
+    filtro, parametros = "", list(message_ids)
+    if id_acolhedor is not None:
+        filtro = " AND n.id_acolhedor = ?"
+        parametros.append(id_acolhedor)
+    return conn.execute(
+        f"""
+        SELECT DISTINCT a.id, a.nome
+        FROM notificacoes AS n
+        JOIN outbox_visitantes AS ov ON ov.id_outbox = n.id_outbox
+        JOIN acolhimento AS a ON a.id = ov.id_acolhimento
+        WHERE n.message_id IN ({",".join("?" for _ in message_ids)}){filtro}
+        ORDER BY a.id
+        """,
+        parametros,
+    ).fetchall()
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Arquivo próprio (em PASTA_BASE), separado do banco principal que é enviado ao Drive.
+LLM_CACHE_ARQUIVO = os.getenv("LLM_CACHE_ARQUIVO", "cache_llm.db")
+LLM_CACHE_ATIVO = os.getenv("LLM_CACHE_ATIVO", "1") != "0"
+# Respostas mais antigas que o TTL são ignoradas; acima do tamanho máximo, as menos usadas saem.
+LLM_CACHE_TTL_HORAS = float(os.getenv("LLM_CACHE_TTL_HORAS", "168"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "50"))
+
+
+class CacheLLM:
+    """
+    Cache em SQLite das respostas do Gemini, endereçado pelo conteúdo: a chave é o hash de
+    (modelo, configuração de geração, versão do prompt, prompt). Mudar o texto do prompt, a
+    versão ou o esquema da resposta invalida as entradas. Pode ser usado por várias threads (uma
+    conexão por thread). Erros do SQLite não interrompem a chamada ao Gemini: a leitura vira uma
+    falta e a gravação é pulada.
+    """
+
+    def __init__(self, caminho: str = None, ttl_horas: float = LLM_CACHE_TTL_HORAS, max_mb: float = LLM_CACHE_MAX_MB):
+        self.caminho = caminho or os.path.join(os.getenv("PASTA_BASE") or ".", LLM_CACHE_ARQUIVO)
+        self.ttl_segundos = ttl_horas * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.acertos = 0
+        self.faltas = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = NORMAL;")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave CHAR(64) PRIMARY KEY,
+                    modelo VARCHAR(100),
+                    versao VARCHAR(45),
+                    texto TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_respostas_acessado_em ON respostas(acessado_em);
+                """
+            )
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def chave(modelo: str, versao: str, prompt: str, configuracao: str = "") -> str:
+        conteudo = "\x1f".join((modelo or "", configuracao or "", versao or "", prompt))
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def obter(self, chave: str):
+        """Texto guardado para a chave, ou None se não houver (se tiver expirado ou se o cache falhar)."""
+        agora = time.time()
+        try:
+            conn = self._conexao()
+            linha = conn.execute(
+                "SELECT texto FROM respostas WHERE chave = ? AND criado_em >= ?", (chave, agora - self.ttl_segundos)
+            ).fetchone()
+            if linha is not None:
+                with conn:
+                    conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+        except sqlite3.Error as erro:
+            print(f"AVISO: Cache do Gemini indisponível na leitura ({erro}); consultando o Gemini.")
+            linha = None
+        with self._lock:
+            if linha is None:
+                self.faltas += 1
+            else:
+                self.acertos += 1
+        return linha[0] if linha is not None else None
+
+    def guardar(self, chave: str, texto: str, modelo: str = None, versao: str = None):
+        """Guarda a resposta; se o cache falhar (ex: banco travado por outro processo), apenas não guarda."""
+        agora = time.time()
+        try:
+            conn = self._conexao()
+            with conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO respostas (chave, modelo, versao, texto, tamanho, criado_em, acessado_em)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (chave, modelo, versao, texto, len(texto.encode("utf-8")), agora, agora),
+                )
+                self._podar(conn, agora)
+        except sqlite3.Error as erro:
+            print(f"AVISO: Resposta do Gemini não guardada no cache ({erro}).")
+
+    def _podar(self, conn: sqlite3.Connection, agora: float):
+        """Remove as entradas expiradas e, acima do tamanho máximo, as acessadas há mais tempo (LRU)."""
+        conn.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.ttl_segundos,))
+        conn.execute(
+            """
+            DELETE FROM respostas WHERE chave IN (
+                SELECT chave FROM (
+                    SELECT chave, SUM(tamanho) OVER (ORDER BY acessado_em DESC, chave) AS acumulado
+                    FROM respostas
+                )
+                WHERE acumulado > ?
+            )
+            """,
+            (self.max_bytes,),
+        )
+
+    def resumo(self) -> str:
+        """Linha de log com os acertos e faltas desde o último resumo (os contadores são zerados)."""
+        with self._lock:
+            acertos, faltas = self.acertos, self.faltas
+            self.acertos = self.faltas = 0
+        total = acertos + faltas
+        taxa = 100 * acertos / total if total else 0
+        return f"LOG: Cache do Gemini: {acertos} acerto(s), {faltas} falta(s) ({taxa:.0f}% de acertos)."
+
+
+_cache_padrao = None
+_lock_cache = threading.Lock()
+
+
+def cache_padrao() -> CacheLLM:
+    """Cache compartilhado pelo processo, criado no primeiro uso."""
+    global _cache_padrao
+    with _lock_cache:
+        if _cache_padrao is None:
+            _cache_padrao = CacheLLM()
+        return _cache_padrao
+
+
+def gerar_com_cache(model, prompt: str, versao: str, converter=None, cache: CacheLLM = None, configuracao: str = "",
+                    **opcoes):
+    """
+    Chama model.generate_content(prompt, **opcoes) passando pelo cache e retorna o texto da
+    resposta, ou converter(texto) se `converter` for informado. `configuracao` descreve a
+    configuração de geração do modelo (modo JSON, esquema) e entra na chave. Só respostas que o
+    `converter` aceita (sem levantar exceção) são guardadas, para que um JSON inválido não fique
+    no cache.
+    """
+    if not LLM_CACHE_ATIVO:
+        texto = model.generate_content(prompt, **opcoes).text
+        return converter(texto) if converter else texto
+
+    cache = cache or cache_padrao()
+    modelo = getattr(model, "model_name", None) or type(model).__name__
+    chave = cache.chave(modelo, versao, prompt, configuracao)
+
+    texto = cache.obter(chave)
+    if texto is not None:
+        return converter(texto) if converter else texto
+
+    texto = model.generate_content(prompt, **opcoes).text
+    resultado = converter(texto) if converter else texto
+    cache.guardar(chave, texto, modelo, versao)
+    return resultado
@@ -3,13 +3,17 @@ import json
 import os
 import argparse
 from dotenv import load_dotenv
+from ..database.connection import obter_conexao
+from ..database.manifesto import hash_registro, preparar_ingestao, registrar_ingestao
+from ..database.visitantes import localizar_visitantes
 
 load_dotenv()
 
 
-def carregar_respostas_para_base(data_param: str):
+def carregar_respostas_para_base(data_param: str, forcar: bool = False):
     """
     Lê o arquivo JSON de acompanhamento e atualiza a base de dados.
+    Atualizações já aplicadas numa carga anterior do mesmo arquivo são puladas (ver manifesto).
     """
     pasta_base = os.getenv("PASTA_BASE")
     if not pasta_base:
@@ -23,59 +27,93 @@ def carregar_respostas_para_base(data_param: str):
         print(f"Erro: Arquivo '{nome_arquivo}' não encontrado na pasta '{pasta_base}'.")
         return
 
+    conn = obter_conexao()
+    cursor = conn.cursor()
+
+    hash_atual, ja_processados = preparar_ingestao(conn, caminho_arquivo, "acompanhamento", forcar)
+    if ja_processados is None:
+        print(f"LOG: Arquivo '{nome_arquivo}' já foi carregado e não mudou desde então. Nada a fazer.")
+        return
+
     print(f"Iniciando carga de atualizações do arquivo: {caminho_arquivo}")
 
     with open(caminho_arquivo, "r", encoding="utf-8") as f:
         registros_de_update = json.load(f)
 
-        caminho_banco = os.path.join(pasta_base, "igreja_dados.db")
-    conn = sqlite3.connect(caminho_banco)
-    cursor = conn.cursor()
-
-    logs = {"sucesso": 0, "nao_encontrado": 0, "erros": 0}
+    logs = {"sucesso": 0, "nao_encontrado": 0, "erros": 0, "ja_carregado": 0}
+    # Visitantes não encontrados podem ser carregados depois, então ficam pendentes.
+    processados, pendentes = set(), 0
+    acolhedores_por_email = dict(conn.execute("SELECT acolhedor_email, id_acolhedor FROM acolhedores"))
 
     for update in registros_de_update:
+        chave = hash_registro(update)
+        if chave in ja_processados:
+            processados.add(chave)
+            logs["ja_carregado"] += 1
+            continue
+
         nome = update.get("nome_visitante")
         status = update.get("status_resposta")
         obs = update.get("observacao")
+        # Respostas geradas com o remetente permitem restringir a busca aos visitantes do acolhedor.
+        id_acolhedor = acolhedores_por_email.get(update.get("email_acolhedor"))
 
         if not nome or not status:
             logs["erros"] += 1
             print(
                 f"AVISO: Registro inválido no JSON (nome ou status faltando): {update}"
             )
+            processados.add(chave)
             continue
 
         try:
             # O ideal é atualizar apenas registros que foram notificados e aguardam resposta
+            if update.get("ids_acolhimento"):
+                # Resposta ligada à notificação pelo Message-ID: os ids já são conhecidos.
+                ids = [
+                    id_
+                    for (id_,) in conn.execute(
+                        f"""
+                        SELECT id FROM acolhimento
+                        WHERE id IN ({",".join("?" for _ in update["ids_acolhimento"])}) AND status_contato = 'Notificado'
+                        """,
+                        update["ids_acolhimento"],
+                    )
+                ]
+            else:
+                ids = localizar_visitantes(conn, nome, id_acolhedor=id_acolhedor, status="Notificado")
             cursor.execute(
-                """
+                f"""
                 UPDATE acolhimento 
                 SET status_contato = ?, observacoes = ? 
-                WHERE nome LIKE ? AND status_contato = 'Notificado'
+                WHERE id IN ({",".join("?" for _ in ids)})
                 """,
-                (status, obs, f"%{nome}%"),
+                (status, obs, *ids),
             )
 
             # Verifica se alguma linha foi realmente alterada
             if cursor.rowcount > 0:
                 print(f"SUCESSO: Registro de '{nome}' atualizado para '{status}'.")
                 logs["sucesso"] += 1
+                processados.add(chave)
             else:
                 print(
                     f"AVISO: Visitante '{nome}' não encontrado com status 'Notificado'. Pode já ter sido atualizado ou não existe."
                 )
                 logs["nao_encontrado"] += 1
+                pendentes += 1
 
         except sqlite3.Error as e:
             logs["erros"] += 1
+            pendentes += 1
             print(f"ERRO SQL ao atualizar '{nome}': {e}")
 
     conn.commit()
-    conn.close()
+    registrar_ingestao(conn, caminho_arquivo, "acompanhamento", hash_atual, processados, pendentes)
 
     print("\n--- Relatório de Carga de Acompanhamento ---")
     print(f"Registros atualizados com sucesso: {logs['sucesso']}")
+    print(f"Registros já aplicados numa carga anterior do arquivo: {logs['ja_carregado']}")
     print(f"Registros não encontrados ou já atualizados: {logs['nao_encontrado']}")
     print(f"Erros de processamento: {logs['erros']}")
     print("---------------------------------------------")
@@ -90,6 +128,9 @@ if __name__ == "__main__":
         required=True,
         help="Data do arquivo de acompanhamento no formato ddmmyyyy.",
     )
+    parser.add_argument(
+        "--forcar", action="store_true", help="Reaplica todas as atualizações do arquivo."
+    )
     args = parser.parse_args()
 
-    carregar_respostas_para_base(args.data)
+    carregar_respostas_para_base(args.data, forcar=args.forcar)
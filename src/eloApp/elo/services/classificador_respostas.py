@@ -0,0 +1,223 @@
+import re
+import sqlite3
+from ..database.utils import normalizar_string
+
+# Regras por status, aplicadas ao texto normalizado (minúsculas, sem acentos nem pontuação).
+# Uma linha só é classificada localmente quando casa com exatamente um status.
+REGRAS_STATUS = {
+    "Número incorreto": [
+        re.compile(r"\b(numero|telefone|celular|contato|whatsapp|whats|zap)( (esta|ta|e|estava))? (errado|incorreto|invalido|inexistente)\b"),
+        re.compile(r"\b(numero|telefone) (nao existe|nao e del[ae]|de outra pessoa)\b"),
+    ],
+    "Não atendeu": [
+        re.compile(r"\bnao (atendeu|atende|atenderam|respondeu|responde|responderam|retornou)\b"),
+        re.compile(r"\b(ninguem atendeu|caixa postal|sem resposta|sem retorno)\b"),
+    ],
+    "Atendeu e já tem igreja": [
+        re.compile(r"\bja (tem|possui|frequenta|congrega|participa de|e membro de?) (uma |outra |a )?igreja\b"),
+        re.compile(r"\b(frequenta|congrega em|membro de) outra igreja\b"),
+    ],
+    "Atendeu e tem interesse": [
+        re.compile(r"\b(tem|teve|demonstrou|mostrou|com) interesse\b"),
+        re.compile(r"\binteressad[oa]s?\b"),
+        re.compile(r"\b(quer|vai|pretende) (voltar|vir|visitar|conhecer|participar)\b"),
+    ],
+}
+# Negação ou incerteza fora da frase de status pode inverter o sentido ("não ficou interessado",
+# "o número tá errado não", "acho que já tem igreja"); perguntas também: a linha fica para o Gemini.
+_RE_NEGACAO = re.compile(r"\b(nao|nunca|sem|nenhum|nenhuma|jamais|nem)\b")
+_RE_INCERTEZA = re.compile(r"\b(acho|achamos|acredito|talvez|parece|provavelmente|possivelmente|sera)\b")
+# Palavras que podem acompanhar o status sem citar ninguém ("ela ainda não atendeu"). Com um
+# único visitante possível, qualquer outra palavra pode ser o nome de outra pessoa.
+_PALAVRAS_NEUTRAS = {"a", "o", "ela", "ele", "visitante", "ainda", "hoje", "ontem", "tambem", "ja", "mas", "ok"}
+
+# Linhas de cortesia que não alteram o sentido da resposta.
+_RE_CORTESIA = re.compile(
+    r"(?:(?:oi|ola|bom dia|boa tarde|boa noite|prezad[oa]s?|pessoal|tudo bem|"
+    r"segue[m]?( o| os| a| as)? (retorno|retornos|status|atualizacao|atualizacoes)|"
+    r"obrigad[oa]|abracos?|abs|att|atenciosamente|deus (te |vos )?abencoe|"
+    r"enviado do meu \w+)\s*)+"
+)
+# Início do trecho citado: a mensagem original repete a tabela com todos os visitantes.
+_RE_CITACAO = re.compile(r"^(>|-{2,}\s*(mensagem original|original message)|(de|from|em|on)\s.*(escreveu|wrote):?\s*$|(de|from):\s)", re.I)
+_RE_ASSINATURA = re.compile(r"^--\s*$")
+_RE_PONTUACAO = re.compile(r"[^\w\s]")
+_RE_MESSAGE_ID = re.compile(r"<[^<>\s]+>")
+_CONECTIVOS = {"da", "de", "do", "das", "dos", "e"}
+
+
+def _texto_normalizado(texto: str) -> str:
+    return normalizar_string(_RE_PONTUACAO.sub(" ", texto)).replace("_", " ")
+
+
+def _palavras_nome(nome: str) -> list:
+    return [palavra for palavra in normalizar_string(nome).split("_") if palavra and palavra not in _CONECTIVOS]
+
+
+def _linhas_da_resposta(body: str) -> list:
+    """Linhas escritas pelo acolhedor, sem o trecho citado da mensagem original nem a assinatura."""
+    linhas = []
+    for linha in body.splitlines():
+        if _RE_CITACAO.match(linha.strip()) or _RE_ASSINATURA.match(linha):
+            break
+        if linha.strip():
+            linhas.append(linha.strip())
+    return linhas
+
+
+def remover_citacao(body: str) -> str:
+    """Texto escrito pelo acolhedor, sem a notificação citada (que repete todos os visitantes)."""
+    return "\n".join(_linhas_da_resposta(body))
+
+
+def message_ids_respondidos(msg) -> list:
+    """Message-IDs a que o e-mail responde: In-Reply-To primeiro, depois References (do mais recente)."""
+    ids = _RE_MESSAGE_ID.findall(msg.get("In-Reply-To", "") or "")
+    ids += reversed(_RE_MESSAGE_ID.findall(msg.get("References", "") or ""))
+    return list(dict.fromkeys(ids))
+
+
+def _decodificar_parte(parte) -> str:
+    conteudo = parte.get_payload(decode=True) or b""
+    try:
+        return conteudo.decode(parte.get_content_charset() or "utf-8", errors="ignore")
+    except LookupError:
+        # Charset declarado desconhecido pelo Python.
+        return conteudo.decode("utf-8", errors="ignore")
+
+
+def corpo_texto(msg) -> str:
+    """Corpo em texto simples do e-mail, no charset declarado; bytes inválidos são descartados."""
+    if msg.is_multipart():
+        for parte in msg.walk():
+            if parte.get_content_type() == "text/plain":
+                return _decodificar_parte(parte)
+        return ""
+    return _decodificar_parte(msg)
+
+
+def carregar_visitantes_notificados(conn: sqlite3.Connection, id_acolhedor) -> list:
+    """Nomes dos visitantes do acolhedor que aguardam retorno (status 'Notificado')."""
+    return [
+        nome
+        for (nome,) in conn.execute(
+            "SELECT nome FROM acolhimento WHERE id_acolhedor = ? AND status_contato = 'Notificado'",
+            (id_acolhedor,),
+        )
+    ]
+
+
+def _sem_status(texto: str, status: str) -> str:
+    """Texto normalizado da linha sem os trechos que casaram com as regras de `status`."""
+    for regra in REGRAS_STATUS[status]:
+        texto = regra.sub(" ", texto)
+    return texto
+
+
+def _visitantes_mencionados(palavras_linha: set, visitantes: list):
+    """
+    Visitantes citados na linha (o primeiro nome precisa aparecer). Entre citações que se
+    sobrepõem, vale a mais específica ("Maria Silva" vence "Maria"); se duas empatam, a linha é
+    ambígua e o retorno é None.
+    """
+    citados = []
+    for nome, palavras in visitantes:
+        if palavras and palavras[0] in palavras_linha:
+            citados.append((nome, frozenset(p for p in palavras if p in palavras_linha)))
+
+    mantidos = [
+        (nome, encontradas)
+        for nome, encontradas in citados
+        if not any(encontradas < outras for _, outras in citados)
+    ]
+    if len({encontradas for _, encontradas in mantidos}) != len(mantidos):
+        return None
+    return [nome for nome, _ in mantidos]
+
+
+def classificar_resposta(body: str, visitantes: list, ignorar=()):
+    """
+    Classifica localmente uma resposta curta ("Maria - não atendeu", "João: número errado").
+
+    `visitantes` são os nomes que o acolhedor pode estar citando e `ignorar`, linhas que podem
+    aparecer sozinhas sem alterar o sentido (nome e apelido do próprio acolhedor, na assinatura).
+    Retorna a lista de atualizações no mesmo formato do Gemini (nome_visitante, status_resposta,
+    observacao) ou None quando alguma linha não é entendida com segurança; nesse caso a mensagem
+    inteira deve ir para o Gemini.
+    """
+    candidatos = [(nome, _palavras_nome(nome)) for nome in visitantes]
+    ignorar = {_texto_normalizado(texto) for texto in ignorar if texto}
+    palavras_sem_nome = _PALAVRAS_NEUTRAS | {palavra for texto in ignorar for palavra in texto.split()}
+    atribuidos = {}
+    aguardando_status = []
+
+    def atribuir(nomes, status, linha):
+        for nome in nomes:
+            if atribuidos.get(nome, (status,))[0] != status:
+                return False
+            atribuidos[nome] = (status, linha)
+        return True
+
+    for linha in _linhas_da_resposta(body):
+        texto = _texto_normalizado(linha)
+        if not texto or texto in ignorar or _RE_CORTESIA.fullmatch(texto):
+            continue
+
+        nomes = _visitantes_mencionados(set(texto.split()), candidatos)
+        if nomes is None:
+            return None
+        status = [s for s, regras in REGRAS_STATUS.items() if any(regra.search(texto) for regra in regras)]
+        if len(status) > 1:
+            return None
+        if status and ("?" in linha or _RE_NEGACAO.search(_sem_status(texto, status[0]))
+                       or _RE_INCERTEZA.search(texto)):
+            return None
+
+        if nomes and status:
+            if aguardando_status or not atribuir(nomes, status[0], linha):
+                return None
+        elif nomes:
+            # Nome numa linha e status na seguinte ("Maria\nnão atendeu").
+            if aguardando_status:
+                return None
+            aguardando_status = nomes
+        elif status:
+            if aguardando_status:
+                destino, aguardando_status = aguardando_status, []
+            elif len(candidatos) == 1 and not atribuidos and set(_sem_status(texto, status[0]).split()) <= palavras_sem_nome:
+                destino = [candidatos[0][0]]
+            else:
+                return None
+            if not atribuir(destino, status[0], linha):
+                return None
+        else:
+            return None
+
+    if aguardando_status or not atribuidos:
+        return None
+    return [
+        {"nome_visitante": nome, "status_resposta": status, "observacao": linha}
+        for nome, (status, linha) in atribuidos.items()
+    ]
+
+
+class EstatisticasClassificador:
+    """Conta quantas respostas foram resolvidas localmente e quantas seguiram para o Gemini."""
+
+    def __init__(self):
+        self.locais = 0
+        self.gemini = 0
+
+    def registrar(self, resolvida_localmente: bool):
+        if resolvida_localmente:
+            self.locais += 1
+        else:
+            self.gemini += 1
+
+    def resumo(self) -> str:
+        total = self.locais + self.gemini
+        taxa = 100 * self.locais / total if total else 0
+        return (
+            f"LOG: Classificador local resolveu {self.locais} de {total} resposta(s) ({taxa:.0f}%); "
+            f"{self.gemini} enviada(s) ao Gemini."
+        )
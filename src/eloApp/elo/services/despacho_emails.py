@@ -0,0 +1,248 @@
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.message import Message
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuração padrão para o Gmail; SMTP_SEGURANCA aceita "ssl" (porta 465), "starttls" (587) ou "nenhuma".
+SMTP_SERVIDOR = os.getenv("SMTP_SERVIDOR", "smtp.gmail.com")
+SMTP_PORTA = int(os.getenv("SMTP_PORTA", "465"))
+SMTP_SEGURANCA = os.getenv("SMTP_SEGURANCA", "ssl")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Poucas conexões simultâneas e um limite por minuto abaixo do que o Gmail tolera.
+SMTP_CONEXOES = int(os.getenv("SMTP_CONEXOES", "3"))
+SMTP_LIMITE_POR_MINUTO = float(os.getenv("SMTP_LIMITE_POR_MINUTO", "60"))
+SMTP_TENTATIVAS = int(os.getenv("SMTP_TENTATIVAS", "3"))
+
+
+def conectar_smtp(usuario=None, senha=None, servidor=None, porta=None, seguranca=None) -> smtplib.SMTP:
+    """Abre e autentica uma conexão SMTP conforme a configuração (variáveis SMTP_* e EMAIL_USER/EMAIL_PASS)."""
+    servidor = servidor or SMTP_SERVIDOR
+    porta = porta or SMTP_PORTA
+    seguranca = seguranca or SMTP_SEGURANCA
+    usuario = usuario if usuario is not None else os.getenv("EMAIL_USER")
+    senha = senha if senha is not None else os.getenv("EMAIL_PASS")
+
+    if seguranca == "ssl":
+        conexao = smtplib.SMTP_SSL(servidor, porta, timeout=SMTP_TIMEOUT)
+    else:
+        conexao = smtplib.SMTP(servidor, porta, timeout=SMTP_TIMEOUT)
+        if seguranca == "starttls":
+            conexao.starttls()
+    if usuario and senha:
+        conexao.login(usuario, senha)
+    return conexao
+
+
+def _erro_de_conexao(erro: BaseException) -> bool:
+    """Erros que invalidam a conexão (queda, timeout, falha de rede)."""
+    if isinstance(erro, smtplib.SMTPServerDisconnected):
+        return True
+    # smtplib.SMTPException herda de OSError, mas só os erros de socket invalidam a conexão.
+    return isinstance(erro, OSError) and not isinstance(erro, smtplib.SMTPException)
+
+
+def erro_transitorio(erro: BaseException) -> bool:
+    """Erros em que vale a pena tentar o envio de novo."""
+    if _erro_de_conexao(erro) or isinstance(erro, smtplib.SMTPConnectError):
+        return True
+    if isinstance(erro, smtplib.SMTPResponseException):
+        # Códigos 4xx são temporários (ex: 421 limite excedido, 451 erro local do servidor).
+        return 400 <= erro.smtp_code < 500
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        # Todos os destinatários recusados no RCPT: temporário só se nenhum código for definitivo.
+        return all(400 <= codigo < 500 for codigo, _ in erro.recipients.values())
+    return False
+
+
+class LimitadorTaxa:
+    """Balde de fichas (token bucket) compartilhado entre as threads de envio."""
+
+    def __init__(self, por_minuto: float, rajada: int = 1):
+        self.intervalo = 60.0 / por_minuto if por_minuto > 0 else 0.0
+        self.capacidade = max(1, rajada)
+        self._fichas = float(self.capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até haver uma ficha disponível e a consome."""
+        if not self.intervalo:
+            return
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) / self.intervalo)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) * self.intervalo
+            time.sleep(espera)
+
+
+class PoolSMTP:
+    """
+    Pool limitado de conexões SMTP autenticadas. As conexões são abertas sob demanda
+    (no máximo `tamanho`), reutilizadas entre mensagens e descartadas quando falham.
+    """
+
+    def __init__(self, tamanho: int = SMTP_CONEXOES, fabrica=conectar_smtp):
+        self.fabrica = fabrica
+        self._livres = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._abertas = []
+        self._lock = threading.Lock()
+        # Falha de autenticação: não adianta (e é arriscado) tentar logar de novo a cada mensagem.
+        self.erro_fatal = None
+
+    @contextmanager
+    def conexao(self):
+        self._vagas.acquire()
+        try:
+            if self.erro_fatal is not None:
+                raise self.erro_fatal
+            try:
+                conexao = self._livres.get_nowait()
+            except queue.Empty:
+                try:
+                    conexao = self.fabrica()
+                except smtplib.SMTPAuthenticationError as erro:
+                    self.erro_fatal = erro
+                    raise
+                with self._lock:
+                    self._abertas.append(conexao)
+            try:
+                yield conexao
+            except BaseException as erro:
+                if _erro_de_conexao(erro):
+                    self._descartar(conexao)
+                else:
+                    self._livres.put(conexao)
+                raise
+            self._livres.put(conexao)
+        finally:
+            self._vagas.release()
+
+    def _descartar(self, conexao):
+        with self._lock:
+            if conexao in self._abertas:
+                self._abertas.remove(conexao)
+        try:
+            conexao.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def fechar(self):
+        with self._lock:
+            abertas, self._abertas = self._abertas, []
+        for conexao in abertas:
+            try:
+                conexao.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def despachar_mensagens(
+    mensagens,
+    remetente=None,
+    conexoes: int = SMTP_CONEXOES,
+    limite_por_minuto: float = SMTP_LIMITE_POR_MINUTO,
+    tentativas: int = SMTP_TENTATIVAS,
+    espera_inicial: float = 1.0,
+    fabrica=conectar_smtp,
+) -> list:
+    """
+    Envia `mensagens` (lista de (destinatarios, email.message.Message ou a mensagem já
+    serializada em bytes)) em paralelo por um pool de conexões SMTP, respeitando o limite por
+    minuto e refazendo envios com falha temporária com espera exponencial. Retorna, na mesma
+    ordem, None para cada envio bem-sucedido ou a exceção do último erro.
+    """
+    if not mensagens:
+        return []
+    remetente = remetente or os.getenv("EMAIL_USER")
+    limitador = LimitadorTaxa(limite_por_minuto, rajada=conexoes)
+
+    def enviar(item):
+        destinatarios, mensagem = item
+        texto = mensagem.as_string() if isinstance(mensagem, Message) else mensagem
+        for tentativa in range(1, tentativas + 1):
+            limitador.aguardar()
+            try:
+                with pool.conexao() as conexao:
+                    conexao.sendmail(remetente, destinatarios, texto)
+                return None
+            except Exception as erro:
+                if tentativa == tentativas or not erro_transitorio(erro):
+                    return erro
+                espera = espera_inicial * 2 ** (tentativa - 1)
+                time.sleep(espera + random.uniform(0, espera / 2))
+
+    inicio = time.perf_counter()
+    with PoolSMTP(conexoes, fabrica) as pool, ThreadPoolExecutor(max_workers=conexoes) as executor:
+        resultados = list(executor.map(enviar, mensagens))
+    duracao = time.perf_counter() - inicio
+
+    enviados = sum(1 for erro in resultados if erro is None)
+    print(
+        f"LOG: {enviados}/{len(mensagens)} e-mail(s) enviado(s) em {duracao:.1f} s "
+        f"({enviados / duracao if duracao else 0:.1f} mensagens/s, {conexoes} conexão(ões))."
+    )
+    return resultados
+
+
+if __name__ == "__main__":
+    # Benchmark contra um servidor SMTP local que imita um servidor lento (latência fixa por DATA):
+    # python -m eloApp.elo.services.despacho_emails
+    import functools
+    import socketserver
+
+    LATENCIA = 0.05
+    MENSAGENS = 100
+
+    class _ServidorSMTP(socketserver.StreamRequestHandler):
+        def _responder(self, linha: str):
+            self.wfile.write(f"{linha}\r\n".encode())
+
+        def handle(self):
+            self._responder("220 localhost ESMTP")
+            for linha in self.rfile:
+                comando = linha[:4].upper()
+                if comando == b"DATA":
+                    self._responder("354 Termine com <CRLF>.<CRLF>")
+                    while self.rfile.readline() not in (b".\r\n", b""):
+                        pass
+                    time.sleep(LATENCIA)
+                    self._responder("250 OK")
+                elif comando == b"QUIT":
+                    self._responder("221 Tchau")
+                    return
+                else:
+                    self._responder("250 OK")
+
+    servidor = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _ServidorSMTP)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    fabrica = functools.partial(
+        conectar_smtp, usuario="", senha="", servidor="127.0.0.1", porta=servidor.server_address[1], seguranca="nenhuma"
+    )
+
+    texto = "Subject: Visitantes\r\n\r\nCorpo\r\n"
+    for conexoes in (1, 2, 4, 8):
+        mensagens = [([f"acolhedor{i}@x.com"], texto) for i in range(MENSAGENS)]
+        erros = despachar_mensagens(mensagens, "eu@x.com", conexoes=conexoes, limite_por_minuto=0, fabrica=fabrica)
+        assert all(erro is None for erro in erros)
+    servidor.shutdown()
@@ -10,6 +10,7 @@ from googleapiclient.http import MediaIoBaseDownload
 
 # Reutilizando a função de autenticação e configurações
 from .auth import autenticar
+from ..database.connection import fechar_conexoes, trabalhadores_ativos
 from .upload_drive import (
     NOME_ARQUIVO_LOCAL,
     NOME_PASTA_DRIVE,
@@ -62,6 +63,18 @@ def download_arquivo_db():
         print(f"Arquivo '{NOME_ARQUIVO_LOCAL}' encontrado no Drive (ID: {file_id}).")
 
         # 2. Fazer backup do arquivo local antigo, se existir
+        # Outros processos (drenador da outbox, observador de respostas) mantêm conexões em WAL
+        # que este processo não consegue fechar: trocar o arquivo por baixo deles corromperia o banco.
+        ativos = trabalhadores_ativos()
+        if ativos:
+            print(
+                f"ERRO: O banco está em uso por {', '.join(ativos)}. Aguarde a drenagem da outbox "
+                "terminar e pare o observador de respostas antes de baixar o banco."
+            )
+            return
+        # As conexões abertas apontam para o arquivo antigo e precisam ser fechadas antes.
+        fechar_conexoes()
+        backup_path = None
         if os.path.exists(CAMINHO_ARQUIVO_DB):
             print(f"Arquivo local '{CAMINHO_ARQUIVO_DB}' encontrado. Fazendo backup...")
             # Garante que a pasta de backup exista
@@ -74,6 +87,18 @@ def download_arquivo_db():
             os.rename(CAMINHO_ARQUIVO_DB, backup_path)
             print(f"Backup criado em: {backup_path}")
 
+        # -wal/-shm que sobraram (ex: de um processo que não fechou o banco) não podem ser
+        # pareados com o arquivo baixado. O -wal pode ter transações que ainda não estão no
+        # arquivo antigo, então ele acompanha o backup.
+        for sufixo in ("-wal", "-shm"):
+            sobra = CAMINHO_ARQUIVO_DB + sufixo
+            if not os.path.exists(sobra):
+                continue
+            if backup_path:
+                os.rename(sobra, backup_path + sufixo)
+            else:
+                os.remove(sobra)
+
         # 3. Baixar o novo arquivo
         print("Baixando a versão mais recente do banco de dados...")
         request = service.files().get_media(fileId=file_id)
@@ -0,0 +1,152 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from .llm import LLM_CONCORRENCIA, LLM_TIMEOUT_SEGUNDOS, gerar, obter_modelo
+
+# Entra na chave do cache do Gemini: incrementar quando a interpretação da resposta mudar.
+VERSAO_PROMPT_RESPOSTA = "resposta/2"
+STATUS_RESPOSTA = ("Atendeu e tem interesse", "Atendeu e já tem igreja", "Não atendeu", "Número incorreto")
+PROMPT_RESPOSTA = """
+Analise o corpo do e-mail de resposta abaixo e, para cada visitante mencionado, extraia as informações em um objeto JSON.
+As chaves devem ser "nome_visitante", "status_resposta" e "observacao".
+
+Os possíveis valores para "status_resposta" são:
+- "Atendeu e tem interesse"
+- "Atendeu e já tem igreja"
+- "Não atendeu"
+- "Número incorreto"
+
+{visitantes}E-mail:
+---
+{body}
+---
+
+Retorne APENAS uma lista de objetos JSON.
+"""
+# Incluído quando a resposta foi ligada à notificação original (Message-ID).
+PROMPT_VISITANTES = """Os visitantes desta notificação são: {nomes}.
+Use em "nome_visitante" exatamente um destes nomes.
+
+"""
+
+
+def esquema_atualizacoes(status=STATUS_RESPOSTA) -> dict:
+    """Esquema da saída JSON do Gemini: lista de {nome_visitante, status_resposta, observacao}."""
+    return {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "nome_visitante": {"type": "STRING"},
+                "status_resposta": {"type": "STRING", "format": "enum", "enum": list(status)},
+                "observacao": {"type": "STRING"},
+            },
+            "required": ["nome_visitante", "status_resposta"],
+        },
+    }
+
+
+def modelo_atualizacoes():
+    """Modelo compartilhado que responde no esquema de esquema_atualizacoes()."""
+    return obter_modelo(esquema=esquema_atualizacoes())
+
+
+class RespostaInvalida(ValueError):
+    """O Gemini respondeu, mas o texto não é a lista JSON esperada."""
+
+    def __init__(self, texto):
+        super().__init__("Gemini não retornou um JSON válido.")
+        self.texto = texto
+
+
+def montar_prompt(body: str, visitantes=None) -> str:
+    """Prompt de extração; com `visitantes` (nomes), o Gemini só precisa escolher entre eles."""
+    lista = PROMPT_VISITANTES.format(nomes="; ".join(visitantes)) if visitantes else ""
+    return PROMPT_RESPOSTA.format(body=body, visitantes=lista)
+
+
+def _converter_atualizacoes(texto: str) -> list:
+    try:
+        updates = json.loads(texto)
+    except json.JSONDecodeError:
+        raise RespostaInvalida(texto)
+    if not isinstance(updates, list):
+        raise RespostaInvalida(texto)
+    return updates
+
+
+def extrair_atualizacoes(model, body: str, timeout: float = LLM_TIMEOUT_SEGUNDOS, visitantes=None) -> list:
+    """Extrai, com o Gemini, a lista de atualizações (nome_visitante, status_resposta, observacao) de um e-mail."""
+    return gerar(
+        model, montar_prompt(body, visitantes), VERSAO_PROMPT_RESPOSTA, converter=_converter_atualizacoes, timeout=timeout
+    )
+
+
+def extrair_em_paralelo(model, corpos, concorrencia: int = LLM_CONCORRENCIA, timeout: float = LLM_TIMEOUT_SEGUNDOS,
+                        visitantes=None) -> list:
+    """
+    Extrai as atualizações de vários e-mails com até `concorrencia` chamadas simultâneas.
+    `visitantes`, se informado, traz para cada corpo a lista de nomes candidatos (ou None).
+    Retorna, na mesma ordem de `corpos`, tuplas (atualizacoes, None) ou (None, erro), para que
+    quem chama marque como processadas apenas as mensagens extraídas com sucesso.
+    """
+    corpos = list(corpos)
+    visitantes = visitantes or [None] * len(corpos)
+
+    def extrair(item):
+        body, nomes = item
+        try:
+            return extrair_atualizacoes(model, body, timeout, nomes), None
+        except Exception as erro:
+            return None, erro
+
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia)) as executor:
+        return list(executor.map(extrair, zip(corpos, visitantes)))
+
+
+if __name__ == "__main__":
+    # Benchmark contra um servidor local que imita o Gemini (latência fixa por requisição):
+    # python -m eloApp.elo.services.extracao_respostas
+    import threading
+    import time
+    import urllib.request
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from . import cache_llm
+
+    # As respostas falsas não podem ir para o cache real (PASTA_BASE/cache_llm.db), de onde
+    # seriam servidas às execuções de verdade até expirar; sem cache, também não se mede o cache.
+    cache_llm.LLM_CACHE_ATIVO = False
+
+    LATENCIA = 0.25
+    MENSAGENS = 64
+
+    class _ServidorFalso(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(LATENCIA)
+            corpo = json.dumps([{"nome_visitante": "Maria", "status_resposta": "Não atendeu", "observacao": ""}])
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(corpo.encode())))
+            self.end_headers()
+            self.wfile.write(corpo.encode())
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ServidorFalso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_port}/generate"
+
+    class _ModeloHTTP:
+        def generate_content(self, prompt, request_options=None):
+            pedido = urllib.request.Request(url, data=prompt.encode(), method="POST")
+            with urllib.request.urlopen(pedido, timeout=(request_options or {}).get("timeout")) as resposta:
+                return type("Resposta", (), {"text": resposta.read().decode()})()
+
+    for concorrencia in (1, 2, 4, 8, 16):
+        corpos = [f"Maria não atendeu ({concorrencia}-{i})" for i in range(MENSAGENS)]
+        inicio = time.perf_counter()
+        resultados = extrair_em_paralelo(_ModeloHTTP(), corpos, concorrencia=concorrencia, timeout=10)
+        duracao = time.perf_counter() - inicio
+        assert all(erro is None for _, erro in resultados)
+        print(f"concorrência {concorrencia:2d}: {duracao:5.2f} s para {MENSAGENS} e-mails ({MENSAGENS / duracao:5.1f} e-mails/s)")
+    servidor.shutdown()
@@ -1,48 +1,30 @@
-import google.generativeai as genai
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from dotenv import load_dotenv
 from typing import Optional
+from .cache_llm import cache_padrao
+from .leitura_lista import dividir_lista, ler_lista
+from .llm import LLM_CONCORRENCIA, LLM_TIMEOUT_SEGUNDOS, gerar, obter_modelo
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+# Entra na chave do cache do Gemini: incrementar quando a interpretação da resposta mudar.
+VERSAO_PROMPT = "carga/2"
+# Blocos "Nome:" enviados ao Gemini por chamada. Listas maiores são divididas e estruturadas
+# em paralelo, para não estourar o limite de saída do modelo.
+CARGA_BLOCOS_POR_LOTE = int(os.getenv("CARGA_BLOCOS_POR_LOTE", "20"))
 
-def gerar_arquivo_carga(caminho_arquivo_txt: Optional[str] = None, dados_entrada_texto: Optional[str] = None):
-    """
-    Lê dados de um arquivo de texto ou de uma string, envia para o Gemini para estruturação
-    e salva o resultado em um arquivo JSON nomeado.
-    """
-    dados_entrada = None
-    if dados_entrada_texto:
-        dados_entrada = dados_entrada_texto
-    elif caminho_arquivo_txt:
-        try:
-            with open(caminho_arquivo_txt, "r", encoding="utf-8") as f:
-                dados_entrada = f.read()
-        except FileNotFoundError:
-            print(f"Erro: Arquivo de entrada não encontrado em '{caminho_arquivo_txt}'")
-            return
-    else:
-        print("Erro: Nenhum dado de entrada fornecido (nem arquivo, nem texto).")
-        return
-
-    if not dados_entrada:
-        print("Erro: Dados de entrada estão vazios.")
-        return
-
-    model = genai.GenerativeModel("gemini-2.5-flash")
-
-    # Prompt para atender aos requisitos
-    prompt = f"""
+PROMPT_CARGA = """
     Analise a lista semi-estruturada de pessoas abaixo e converta-a em uma lista de objetos JSON.
 
     No começo da lista deve estar a data daquela lista. No json gerado deve ser o primeiro campo, de nome "data", a conter essa informação.
     Abaixo da data, deve haver o nome do evento. Os valores possíveis são: ['conectados', 'congresso_inove', 'congresso_tdc','acampa','revolucao']. O nome do campo no JSON deve ser "evento".
     Se não houver uma informação de data ou evento, retorne esse campo definido para uma string vazia: ""
     Em seguida estruture um campo de nome "lista" a partir dos dados fornecidos seguindo as regras abaixo:
-    
+
     Regras para cada objeto:
     1. As chaves devem ser "nome", "idade", "celular", "acolhedor", "plano_de_acao", "HouM" e "situacao".
     2. Se um "apelido" for fornecido e não estiver vazio, use o "apelido" como o valor para a chave "nome". Caso contrário, use o "nome" original.
@@ -61,22 +43,164 @@ def gerar_arquivo_carga(caminho_arquivo_txt: Optional[str] = None, dados_entrada
     ---
     """
 
-    print("Enviando dados para o Gemini para estruturação...")
+
+def montar_lotes(cabecalho: str, blocos, blocos_por_lote: int = CARGA_BLOCOS_POR_LOTE) -> list:
+    """
+    Agrupa blocos (índice, seção, texto) em trechos autocontidos para o Gemini: cada um repete o
+    cabeçalho e a linha da seção (que orienta o HouM) e traz até `blocos_por_lote` pessoas.
+    Retorna (índice do primeiro bloco, texto) de cada trecho.
+    """
+    lotes, atual, secao_atual = [], [], None
+    for indice, secao, bloco in blocos:
+        if atual and (secao != secao_atual or len(atual) >= blocos_por_lote):
+            lotes.append((secao_atual, atual))
+            atual = []
+        secao_atual = secao
+        atual.append((indice, bloco))
+    if atual:
+        lotes.append((secao_atual, atual))
+
+    return [
+        (lote[0][0], "\n\n".join(parte for parte in (cabecalho, secao, *(bloco for _, bloco in lote)) if parte))
+        for secao, lote in lotes
+    ]
+
+
+def dividir_em_lotes(texto: str, blocos_por_lote: int = CARGA_BLOCOS_POR_LOTE) -> list:
+    """
+    Divide a lista inteira em trechos para o Gemini (ver montar_lotes). Um texto sem blocos
+    "Nome:" reconhecíveis segue inteiro, num único trecho.
+    """
+    cabecalho, blocos = dividir_lista(texto)
+    if not blocos:
+        return [texto]
+    return [
+        trecho
+        for _, trecho in montar_lotes(cabecalho, ((i, secao, bloco) for i, (secao, bloco) in enumerate(blocos)), blocos_por_lote)
+    ]
+
+
+def _converter_json(texto: str) -> dict:
+    dados = json.loads(texto)
+    if not isinstance(dados, dict) or not isinstance(dados.get("lista"), list):
+        raise ValueError("O Gemini não retornou o objeto com 'data', 'evento' e 'lista'.")
+    return dados
+
+
+def estruturar_trechos(model, lotes: list, concorrencia: int = LLM_CONCORRENCIA, timeout: float = LLM_TIMEOUT_SEGUNDOS) -> list:
+    """
+    Estrutura os trechos com chamadas simultâneas ao Gemini e retorna os objetos {data, evento,
+    lista} na ordem dos trechos. Se algum trecho falhar, levanta a exceção: um arquivo parcial
+    faria visitantes sumirem da carga sem aviso.
+    """
+    resultados = [None] * len(lotes)
+    inicio = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia)) as executor:
+        futuros = {
+            executor.submit(
+                gerar, model, PROMPT_CARGA.format(dados_entrada=lote), VERSAO_PROMPT, converter=_converter_json, timeout=timeout
+            ): indice
+            for indice, lote in enumerate(lotes)
+        }
+        for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+            indice = futuros[futuro]
+            resultados[indice] = futuro.result()
+            print(
+                f"LOG: Trecho {indice + 1} de {len(lotes)} estruturado ({len(resultados[indice]['lista'])} registro(s)); "
+                f"{concluidos}/{len(lotes)} concluído(s) em {time.perf_counter() - inicio:.1f} s."
+            )
+    return resultados
+
+
+def estruturar_lotes(model, lotes: list, concorrencia: int = LLM_CONCORRENCIA, timeout: float = LLM_TIMEOUT_SEGUNDOS) -> dict:
+    """Estrutura os trechos (ver estruturar_trechos) e junta tudo num único objeto {data, evento, lista}."""
+    resultados = estruturar_trechos(model, lotes, concorrencia, timeout)
+
+    # O cabeçalho vai em todos os trechos; vale o primeiro que o trouxer preenchido.
+    datas = [r.get("data") for r in resultados if r.get("data")]
+    eventos = [r.get("evento") for r in resultados if r.get("evento")]
+    if len(set(datas)) > 1 or len(set(eventos)) > 1:
+        print(f"AVISO: Trechos com cabeçalhos diferentes (datas {sorted(set(datas))}, eventos {sorted(set(eventos))}); usando o primeiro.")
+    return {
+        "data": datas[0] if datas else "",
+        "evento": eventos[0] if eventos else "",
+        "lista": [registro for resultado in resultados for registro in resultado["lista"]],
+    }
+
+
+def estruturar_lista(model, texto: str) -> dict:
+    """
+    Estrutura a lista colada. No formato padrão (Data/Evento, *Meninos*/*Meninas*, blocos
+    "Nome:"), o cabeçalho e os blocos bem formados são lidos localmente (leitura_lista.py) e só os
+    blocos que o leitor não entende vão para o Gemini, agrupados em trechos paralelos. Fora do
+    formato, a lista inteira é dividida em trechos e estruturada pelo Gemini.
+    """
+    leitura = ler_lista(texto)
+    if leitura is None:
+        lotes = dividir_em_lotes(texto)
+        print(f"Enviando dados para o Gemini para estruturação ({len(lotes)} trecho(s))...")
+        return estruturar_lotes(model, lotes)
+
+    cabecalho, data, evento, blocos, registros = leitura
+    pendentes = [(i, secao, bloco) for i, ((secao, bloco), registro) in enumerate(zip(blocos, registros)) if registro is None]
+    print(f"LOG: {len(blocos) - len(pendentes)} de {len(blocos)} bloco(s) lidos localmente; {len(pendentes)} seguem para o Gemini.")
+
+    # Cada posição recebe os registros do seu bloco; um trecho do Gemini ocupa a posição do seu primeiro bloco.
+    por_bloco = [[registro] if registro is not None else [] for registro in registros]
+    if pendentes:
+        lotes = montar_lotes(cabecalho, pendentes)
+        print(f"Enviando dados para o Gemini para estruturação ({len(lotes)} trecho(s))...")
+        resultados = estruturar_trechos(model, [trecho for _, trecho in lotes])
+        for (indice, _), resultado in zip(lotes, resultados):
+            por_bloco[indice] = resultado["lista"]
+
+    return {"data": data, "evento": evento, "lista": [registro for lista in por_bloco for registro in lista]}
+
+
+def gerar_arquivo_carga(caminho_arquivo_txt: Optional[str] = None, dados_entrada_texto: Optional[str] = None):
+    """
+    Lê dados de um arquivo de texto ou de uma string, envia para o Gemini para estruturação
+    e salva o resultado em um arquivo JSON nomeado.
+    """
+    dados_entrada = None
+    if dados_entrada_texto:
+        dados_entrada = dados_entrada_texto
+    elif caminho_arquivo_txt:
+        try:
+            with open(caminho_arquivo_txt, "r", encoding="utf-8") as f:
+                dados_entrada = f.read()
+        except FileNotFoundError:
+            print(f"Erro: Arquivo de entrada não encontrado em '{caminho_arquivo_txt}'")
+            return
+    else:
+        print("Erro: Nenhum dado de entrada fornecido (nem arquivo, nem texto).")
+        return
+
+    if not dados_entrada:
+        print("Erro: Dados de entrada estão vazios.")
+        return
+
+    model = obter_modelo(resposta_json=True)
+
+    # Blocos no formato padrão são lidos localmente; o restante (e listas grandes fora do formato)
+    # vai para o Gemini em trechos paralelos, e o tempo passa a ser o do trecho mais lento.
     try:
-        response = model.generate_content(prompt)
-        if not response or not hasattr(response, "text"):
-            raise ValueError("Resposta inválida ou vazia recebida do Gemini.")
+        dados_estruturados = estruturar_lista(model, dados_entrada)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Erro ao processar a resposta do Gemini: {e}")
+        if isinstance(e, json.JSONDecodeError):
+            print("Resposta recebida do Gemini:")
+            print(e.doc)
+        return
     except Exception as e:
         print(f"Erro ao enviar dados para o Gemini ou ao receber a resposta: {e}")
         return
 
-    print("Análise do Gemini completa.")
+    print("Estruturação completa.")
+    print(cache_padrao().resumo())
 
     try:
-        # Limpa a resposta do Gemini para garantir que é um JSON válido
-        json_text = response.text.strip().replace("```json", "").replace("```", "")
-        dados_estruturados = json.loads(json_text)
-
         # Extrai a data do JSON estruturado
         try:
             data_arquivo = datetime.strptime(dados_estruturados["data"], "%d/%m/%Y")  # Valida o formato da data
@@ -102,8 +226,8 @@ def gerar_arquivo_carga(caminho_arquivo_txt: Optional[str] = None, dados_entrada
 
     except (json.JSONDecodeError, ValueError) as e:
         print(f"Erro ao processar a resposta do Gemini ou salvar o arquivo: {e}")
-        print("Resposta recebida do Gemini:")
-        print(response.text)
+        print("Dados estruturados recebidos do Gemini:")
+        print(json.dumps(dados_estruturados, indent=4, ensure_ascii=False))
 
 
 if __name__ == "__main__":
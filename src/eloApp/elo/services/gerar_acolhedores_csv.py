@@ -1,91 +1,256 @@
 import argparse
+import csv
+import io
+import json
 import os
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from ..database.indice_trigramas import IndiceTrigramas, resolver_por_semelhanca
+from ..database.utils import normalizar_string
+from .cache_llm import cache_padrao
+from .llm import LLM_CONCORRENCIA, gerar, obter_modelo
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Entra na chave do cache do Gemini: incrementar quando a interpretação da resposta mudar.
+VERSAO_PROMPT = "acolhedores/3"
+# Linhas com GP não resolvido enviadas ao Gemini por chamada, e candidatos sugeridos por linha.
+ACOLHEDORES_LINHAS_POR_LOTE = int(os.getenv("ACOLHEDORES_LINHAS_POR_LOTE", "25"))
+CANDIDATOS_GP_POR_LINHA = 5
+
+COLUNAS_SAIDA = ["Nome", "Apelido", "Nascimento", "Email", "Celular", "GP"]
+# Palavras (do cabeçalho normalizado) que identificam cada coluna de saída no CSV do formulário.
+_PALAVRAS_COLUNA = {
+    "GP": ("lider", "gp"),
+    "Apelido": ("apelido",),
+    "Nascimento": ("nascimento",),
+    "Email": ("email", "e_mail"),
+    "Celular": ("numero", "celular", "telefone", "whatsapp"),
+    "Nome": ("nome",),
+}
+# Palavras que não identificam um líder na busca por nome parcial ("de" casaria "ana_de_souza").
+_CONECTIVOS = {"de", "da", "do", "dos", "das", "e"}
+_TAMANHO_MINIMO_PALAVRA = 3
+
+PROMPT_COLUNAS = """
+Você recebe os nomes das colunas de um CSV de cadastro de acolhedores. Associe cada um dos campos
+{campos} à coluna correspondente (ou null, se não existir).
+
+Colunas: {colunas}
+
+Retorne APENAS um objeto JSON no formato {{"Campo": "nome exato da coluna ou null"}}.
+"""
+
+PROMPT_GP = """
+Para cada linha abaixo, escolha o líder de GP informado entre os candidatos (nomes normalizados:
+minúsculas, sem acentos, com underscores). Se nenhum candidato corresponder com segurança, use "".
+
+Candidatos: {candidatos}
+
+Linhas (id e nome do líder como foi digitado):
+{linhas}
+
+Retorne APENAS uma lista JSON de objetos {{"id": <id da linha>, "gp": "<candidato exato ou vazio>"}}.
+"""
+
+
+def _converter_objeto(texto: str) -> dict:
+    dados = json.loads(texto)
+    if not isinstance(dados, dict):
+        raise ValueError("O Gemini não retornou um objeto JSON.")
+    return dados
+
+
+def _converter_lista(texto: str) -> list:
+    dados = json.loads(texto)
+    if not isinstance(dados, list):
+        raise ValueError("O Gemini não retornou uma lista JSON.")
+    return dados
+
+
+def mapear_colunas(cabecalho: list) -> dict:
+    """
+    Associa localmente cada coluna de saída a uma coluna do CSV bruto, pelas palavras do
+    cabeçalho normalizado. Colunas sem correspondência única ficam fora do dicionário.
+    """
+    normalizadas = {coluna: normalizar_string(coluna) for coluna in cabecalho}
+    mapa, usadas = {}, set()
+    # A ordem de _PALAVRAS_COLUNA importa: "Nome_do_lider_de_gp" é reservado para GP antes de Nome.
+    for saida, palavras in _PALAVRAS_COLUNA.items():
+        encontradas = [
+            coluna
+            for coluna, normalizada in normalizadas.items()
+            if coluna not in usadas
+            and any(palavra in normalizada.split("_") or normalizada.startswith(palavra) for palavra in palavras)
+        ]
+        if len(encontradas) == 1:
+            mapa[saida] = encontradas[0]
+            usadas.add(encontradas[0])
+    return mapa
+
+
+def _mapear_colunas_com_llm(model, cabecalho: list, mapa: dict) -> dict:
+    """Pede ao Gemini só as colunas que faltaram no mapeamento local (o prompt leva apenas o cabeçalho)."""
+    faltantes = [saida for saida in COLUNAS_SAIDA if saida not in mapa]
+    sugestao = gerar(
+        model,
+        PROMPT_COLUNAS.format(campos=", ".join(faltantes), colunas=json.dumps(cabecalho, ensure_ascii=False)),
+        VERSAO_PROMPT,
+        converter=_converter_objeto,
+    )
+    for saida in faltantes:
+        coluna = sugestao.get(saida)
+        if coluna in cabecalho:
+            mapa[saida] = coluna
+    return mapa
+
+
+def _ler_gps(gps_data_string: str) -> list:
+    """Nomes dos líderes (nome_lider_gps) a partir do CSV id_gps,nome_lider_gps."""
+    return [linha["nome_lider_gps"] for linha in csv.DictReader(io.StringIO(gps_data_string)) if linha.get("nome_lider_gps")]
+
+
+def resolver_gp(nome: str, lideres: set, lideres_por_palavra: dict, indice: IndiceTrigramas):
+    """
+    Resolve o líder de GP digitado no formulário: nome normalizado exato, nome parcial único
+    ("Rafael" -> "rafael_ricardo") ou semelhança de trigramas alta e sem empate. Retorna o
+    nome_lider_gps ou None.
+    """
+    normalizado = normalizar_string(nome)
+    if not normalizado:
+        return None
+    if normalizado in lideres:
+        return normalizado
+
+    palavras = [
+        palavra
+        for palavra in normalizado.split("_")
+        if len(palavra) >= _TAMANHO_MINIMO_PALAVRA and palavra not in _CONECTIVOS
+    ]
+    if palavras:
+        contendo_todas = set.intersection(*(lideres_por_palavra.get(palavra, set()) for palavra in palavras))
+        if len(contendo_todas) == 1:
+            return next(iter(contendo_todas))
+
+    lider, _ = resolver_por_semelhanca(indice, normalizado)
+    return lider
+
+
+def _resolver_gps_com_llm(model, pendentes: list, indice: IndiceTrigramas) -> dict:
+    """
+    Envia ao Gemini, em lotes paralelos, só as linhas com GP não resolvido, cada lote com os
+    líderes mais parecidos com os nomes digitados nele. Linhas sem nenhum líder parecido nem são
+    enviadas. Retorna {id da linha: nome_lider_gps}.
+    """
+    candidatos_por_linha = {}
+    for id_linha, nome in pendentes:
+        encontrados = indice.buscar(nome, limite=CANDIDATOS_GP_POR_LINHA, similaridade_minima=0.2)
+        if encontrados:
+            candidatos_por_linha[id_linha] = {lider for lider, _, _ in encontrados}
+    pendentes = [(id_linha, nome) for id_linha, nome in pendentes if id_linha in candidatos_por_linha]
+    lotes = [
+        pendentes[inicio : inicio + ACOLHEDORES_LINHAS_POR_LOTE]
+        for inicio in range(0, len(pendentes), ACOLHEDORES_LINHAS_POR_LOTE)
+    ]
+
+    def resolver_lote(lote):
+        candidatos = sorted(set().union(*(candidatos_por_linha[id_linha] for id_linha, _ in lote)))
+        linhas = "\n".join(f"{id_linha}: {nome}" for id_linha, nome in lote)
+        escolhas = gerar(
+            model,
+            PROMPT_GP.format(candidatos=", ".join(candidatos), linhas=linhas),
+            VERSAO_PROMPT,
+            converter=_converter_lista,
+        )
+        # Só valem respostas entre os candidatos da própria linha.
+        return {
+            escolha.get("id"): escolha.get("gp")
+            for escolha in escolhas
+            if isinstance(escolha, dict) and escolha.get("gp") in candidatos_por_linha.get(escolha.get("id"), ())
+        }
+
+    resolvidos = {}
+    with ThreadPoolExecutor(max_workers=max(1, LLM_CONCORRENCIA)) as executor:
+        for resultado in executor.map(resolver_lote, lotes):
+            resolvidos.update(resultado)
+    return resolvidos
+
 
 def gerar_csv_com_llm(caminho_dados: str, gps_data_string: str):
     """
-    Usa o Gemini para processar o CSV de acolhedores e a lista de GPs do banco de dados.
+    Gera acolhedores_carga.csv (Nome,Apelido,Nascimento,Email,Celular,GP) a partir do CSV do
+    formulário e da lista de GPs do banco. Colunas e líderes de GP são resolvidos localmente;
+    o Gemini só é consultado para colunas ambíguas e para as linhas cujo GP não foi resolvido.
     """
     try:
-        with open(caminho_dados, 'r', encoding='utf-8') as f:
-            dados_csv = f.read()
+        with open(caminho_dados, 'r', encoding='utf-8-sig', newline='') as f:
+            leitor = csv.DictReader(f)
+            cabecalho = leitor.fieldnames or []
+            linhas = list(leitor)
     except FileNotFoundError as e:
         print(f"Erro: Arquivo de dados não encontrado. {e}")
         return
 
-    model = genai.GenerativeModel(os.getenv("MODEL"))
-
-    prompt = f"""
-    Você é um especialista em processamento de dados. Sua única função é receber um arquivo CSV de acolhida e uma lista de líderes de GP e retorná-los como um único CSV formatado.
-
-    **Arquivo 1 (Dados da Acolhida):**
-    (Colunas: `Carimbo_de_data/hora`, `Nome`, `apelido`, `Nascimento`, `email`, `numero`, `Nome_do_lider_de_gp`)
-    ```csv
-    {dados_csv}
-    ```
-
-    **Arquivo 2 (Líderes de GP do Banco de Dados):**
-    (Colunas: `id_gps`, `nome_lider_gps`)
-    **IMPORTANTE: A coluna `nome_lider_gps` já está normalizada (minúsculas, sem acentos, com underscores).**
-    ```csv
-    {gps_data_string}
-    ```
-
-    **Tarefa:**
-
-    1.  Encontre a correspondência exata entre o nome do líder em `Nome_do_lider_de_gp` do Arquivo 1 e a coluna `nome_lider_gps` do Arquivo 2.
-    2.  **Gere** um novo CSV com as seguintes colunas e mapeamento:
-        *   `Nome` (de `Nome`)
-        *   `Apelido` (de `apelido`)
-        *   `Nascimento` (de `Nascimento`)
-        *   `Email` (de `email`)
-        *   `Celular` (de `numero`)
-        *   `GP` (use o valor EXATO de `nome_lider_gps` correspondente do Arquivo 2, SEM NENHUMA ALTERAÇÃO OU NORMALIZAÇÃO ADICIONAL)
-
-    **REGRAS DE SAÍDA:**
-    *   **NÃO** inclua o cabeçalho CSV na sua resposta.
-    *   **NÃO** inclua explicações, planos de ação ou qualquer texto extra.
-    *   Sua resposta deve conter **APENAS** os dados CSV brutos.
-
-    **Exemplo de Saída:**
-    ```
-"John Doe","Johnny","1990-01-01","john.doe@example.com","(11) 99999-9999","rafael_ricardo"
-"Jane Smith","Jane","1985-05-20","jane.smith@email.com","(21) 88888-8888","aline_figueiredo"
-    ```
-    """
+    pasta_csv = os.getenv("PASTA_CSV")
+    if not pasta_csv:
+        print("Erro: Variável de ambiente PASTA_CSV não configurada.")
+        return
+
+    model = obter_modelo(resposta_json=True)
 
-    print("Enviando dados para o Gemini...")
     try:
-        response = model.generate_content(prompt)
-        csv_output = response.text.strip()
+        mapa = mapear_colunas(cabecalho)
+        if any(saida not in mapa for saida in COLUNAS_SAIDA):
+            print("Enviando o cabeçalho ao Gemini para completar o mapeamento de colunas...")
+            mapa = _mapear_colunas_com_llm(model, cabecalho, mapa)
+        for saida in ("Nome", "Email", "GP"):
+            if saida not in mapa:
+                print(f"Erro: Coluna para '{saida}' não encontrada no arquivo ({', '.join(cabecalho)}).")
+                return None
+        print("LOG: Colunas: " + ", ".join(f"{saida} <- '{mapa[saida]}'" for saida in COLUNAS_SAIDA if saida in mapa) + ".")
 
-        if csv_output.startswith("```csv"):
-            csv_output = csv_output[6:]
-        if csv_output.endswith("```"):
-            csv_output = csv_output[:-3]
-        csv_output = csv_output.strip()
+        lideres = _ler_gps(gps_data_string)
+        conjunto_lideres = set(lideres)
+        lideres_por_palavra = {}
+        for lider in lideres:
+            for palavra in lider.split("_"):
+                lideres_por_palavra.setdefault(palavra, set()).add(lider)
+        indice = IndiceTrigramas((lider, lider) for lider in lideres)
 
-        pasta_csv = os.getenv("PASTA_CSV")
-        if not pasta_csv:
-            print("Erro: Variável de ambiente PASTA_CSV não configurada.")
-            return
+        gps_resolvidos, pendentes = {}, []
+        for id_linha, linha in enumerate(linhas):
+            nome_gp = (linha.get(mapa["GP"]) or "").strip()
+            lider = resolver_gp(nome_gp, conjunto_lideres, lideres_por_palavra, indice)
+            if lider:
+                gps_resolvidos[id_linha] = lider
+            elif nome_gp:
+                pendentes.append((id_linha, nome_gp))
+        print(f"LOG: GP resolvido localmente em {len(gps_resolvidos)} de {len(linhas)} linha(s); {len(pendentes)} seguem para o Gemini.")
+
+        if pendentes:
+            print("Enviando ao Gemini as linhas com GP não resolvido...")
+            gps_resolvidos.update(_resolver_gps_com_llm(model, pendentes, indice))
+            print(cache_padrao().resumo())
 
         caminho_saida = os.path.join(pasta_csv, "acolhedores_carga.csv")
-        
-        header = "Nome,Apelido,Nascimento,Email,Celular,GP\n"
-        with open(caminho_saida, 'w', encoding='utf-8') as f:
-            f.write(header)
-            f.write(csv_output)
+        nao_resolvidos = 0
+        with open(caminho_saida, 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.writer(f, quoting=csv.QUOTE_ALL)
+            escritor.writerow(COLUNAS_SAIDA)
+            for id_linha, linha in enumerate(linhas):
+                registro = [(linha.get(mapa[saida]) or "").strip() if saida in mapa else "" for saida in COLUNAS_SAIDA]
+                if id_linha in gps_resolvidos:
+                    registro[-1] = gps_resolvidos[id_linha]
+                elif registro[-1]:
+                    # Mantém o nome digitado: a carga informa o GP não encontrado e a linha fica pendente.
+                    nao_resolvidos += 1
+                escritor.writerow(registro)
 
+        if nao_resolvidos:
+            print(f"AVISO: {nao_resolvidos} linha(s) com GP não resolvido mantiveram o nome digitado.")
         print(f"Arquivo '{caminho_saida}' gerado com sucesso!")
         return caminho_saida
 
     except Exception as e:
         print(f"Erro ao gerar o CSV com o Gemini: {e}")
         return None
-
@@ -0,0 +1,176 @@
+import re
+from ..database.utils import normalizar_string
+
+# Valores aceitos para "evento" (os mesmos do prompt de estruturação).
+EVENTOS = ("conectados", "congresso_inove", "congresso_tdc", "acampa", "revolucao")
+SITUACOES = ("visitante", "conversao", "reconciliacao")
+
+PLANO_DESCARTAR = "Descartar registro por falta de dados essenciais"
+PLANO_SOLICITAR_DADOS = "Carregar registro e solicitar dados faltantes ao acolhedor"
+PLANO_NORMAL = "Carregar registro normalmente"
+
+# Rótulos aceitos em cada bloco (já normalizados) e a chave correspondente no JSON.
+_CAMPOS = {
+    "nome": "nome",
+    "apelido": "apelido",
+    "idade": "idade",
+    "numero": "celular",
+    "celular": "celular",
+    "telefone": "celular",
+    "whatsapp": "celular",
+    "acolhedor": "acolhedor",
+    "acolhedora": "acolhedor",
+    "situacao": "situacao",
+}
+_HOUM_POR_SECAO = {"meninos": "H", "meninas": "M"}
+
+_RE_SECAO = re.compile(r"^\s*\*+\s*(meninos|meninas)\s*\*+\s*$", re.I)
+_RE_INICIO_BLOCO = re.compile(r"^\s*nome\s*:", re.I)
+_RE_CAMPO = re.compile(r"^\s*([^:]+?)\s*:\s*(.*?)\s*$")
+_RE_SEPARADOR = re.compile(r"^[\W_]*$")
+_RE_DATA = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+_RE_IDADE = re.compile(r"^(\d{1,3})(\s*anos?)?$", re.I)
+
+
+def dividir_lista(texto: str):
+    """
+    Separa a lista colada em cabeçalho (Data/Evento) e blocos de pessoa. Cada bloco começa numa
+    linha "Nome:" e é retornado como (seção, texto), onde a seção é a linha "*Meninos*"/"*Meninas*"
+    em que ele aparece ("" se não houver). Linhas soltas antes de um bloco vão junto com ele.
+    O texto é percorrido uma única vez, linha a linha.
+    """
+    cabecalho, blocos = [], []
+    secao, atual, soltas = "", None, []
+
+    def fechar():
+        if atual is not None:
+            blocos.append((secao, "\n".join(atual).strip()))
+
+    for linha in texto.splitlines():
+        if _RE_SECAO.match(linha):
+            fechar()
+            atual, secao = None, linha.strip()
+        elif _RE_INICIO_BLOCO.match(linha):
+            fechar()
+            atual, soltas = soltas + [linha], []
+        elif atual is not None:
+            atual.append(linha)
+        elif secao:
+            if linha.strip():
+                soltas.append(linha)
+        else:
+            cabecalho.append(linha)
+    fechar()
+    return "\n".join(cabecalho).strip(), blocos
+
+
+def ler_cabecalho(cabecalho: str):
+    """Retorna (data dd/mm/yyyy, evento) do cabeçalho, ou None se algum dos dois não for reconhecido."""
+    data, evento = None, ""
+    for linha in cabecalho.splitlines():
+        campo = _RE_CAMPO.match(linha)
+        if not campo:
+            continue
+        rotulo, valor = normalizar_string(campo.group(1)), campo.group(2)
+        if rotulo == "data":
+            encontrada = _RE_DATA.search(valor)
+            if not encontrada:
+                return None
+            dia, mes, ano = encontrada.groups()
+            data = f"{int(dia):02d}/{int(mes):02d}/{ano}"
+        elif rotulo == "evento":
+            evento = normalizar_string(valor)
+            if evento and evento not in EVENTOS:
+                return None
+    if data is None:
+        return None
+    return data, evento
+
+
+def ler_bloco(secao: str, bloco: str):
+    """
+    Converte um bloco "Nome:/Idade:/Numero:/Acolhedor:" no registro que o Gemini geraria
+    (nome, idade, celular, acolhedor, plano_de_acao, HouM, situacao). Retorna None se alguma
+    linha não for entendida com segurança (rótulo desconhecido, campo repetido, idade por
+    extenso, pessoa fora de uma seção *Meninos*/*Meninas*); o bloco então vai para o Gemini.
+    """
+    secao_normalizada = normalizar_string(secao.strip("* \t"))
+    if secao_normalizada not in _HOUM_POR_SECAO:
+        return None
+
+    valores = {}
+    for linha in bloco.splitlines():
+        if _RE_SEPARADOR.match(linha):
+            continue
+        campo = _RE_CAMPO.match(linha)
+        if not campo:
+            return None
+        chave = _CAMPOS.get(normalizar_string(campo.group(1)))
+        if chave is None or chave in valores:
+            return None
+        valores[chave] = campo.group(2)
+
+    idade = None
+    if valores.get("idade"):
+        encontrada = _RE_IDADE.match(valores["idade"])
+        if not encontrada:
+            return None
+        idade = int(encontrada.group(1))
+
+    situacao = normalizar_string(valores.get("situacao")) or "visitante"
+    if situacao not in SITUACOES:
+        return None
+
+    nome = valores.get("apelido") or valores.get("nome", "")
+    acolhedor = valores.get("acolhedor", "")
+    celular = valores.get("celular", "")
+    if not nome or not acolhedor:
+        plano = PLANO_DESCARTAR
+    elif idade is None or not celular:
+        plano = PLANO_SOLICITAR_DADOS
+    else:
+        plano = PLANO_NORMAL
+
+    return {
+        "nome": nome,
+        "idade": idade,
+        "celular": celular,
+        "acolhedor": acolhedor,
+        "plano_de_acao": plano,
+        "HouM": _HOUM_POR_SECAO[secao_normalizada],
+        "situacao": situacao,
+    }
+
+
+def ler_lista(texto: str):
+    """
+    Lê localmente uma lista no formato padrão do dashboard. Retorna None se o cabeçalho
+    (Data/Evento) não for reconhecido ou se não houver blocos "Nome:"; senão, retorna
+    (cabecalho_texto, data, evento, blocos, registros), onde registros[i] é o registro do
+    blocos[i] ou None quando o bloco precisa ser estruturado pelo Gemini.
+    """
+    cabecalho, blocos = dividir_lista(texto)
+    lido = ler_cabecalho(cabecalho)
+    if lido is None or not blocos:
+        return None
+    data, evento = lido
+    registros = [ler_bloco(secao, bloco) for secao, bloco in blocos]
+    return cabecalho, data, evento, blocos, registros
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m eloApp.elo.services.leitura_lista
+    import time
+
+    partes = ["Data: 14/06/2026", "", "Evento: congresso_inove", ""]
+    for secao, inicio in (("*Meninos*", 0), ("*Meninas*", 500)):
+        partes.append(secao)
+        for i in range(inicio, inicio + 500):
+            partes += [f"Nome: Pessoa {i}", "Idade: 19", "Numero: (11) 98888-0000", "Acolhedor: Ana Lúcia", ""]
+    texto = "\n".join(partes)
+
+    inicio = time.perf_counter()
+    _, data, evento, blocos, registros = ler_lista(texto)
+    duracao = time.perf_counter() - inicio
+    locais = sum(registro is not None for registro in registros)
+    print(f"{len(blocos)} blocos lidos em {duracao * 1000:.1f} ms ({locais} sem o Gemini); data {data}, evento {evento}.")
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from .cache_llm import gerar_com_cache
+
+load_dotenv()
+
+# Modelo usado por todas as etapas que consultam o Gemini.
+GEMINI_MODELO = os.getenv("MODEL") or "gemini-2.5-flash"
+# Chamadas simultâneas ao Gemini e tempo máximo de cada uma. A concorrência padrão é baixa
+# para caber no limite de requisições por minuto das chaves gratuitas.
+LLM_CONCORRENCIA = int(os.getenv("LLM_CONCORRENCIA", "4"))
+LLM_TIMEOUT_SEGUNDOS = float(os.getenv("LLM_TIMEOUT_SEGUNDOS", "60"))
+# Tentativas por chamada (erros transitórios da API ou resposta que não passa na conversão)
+# e espera antes da segunda tentativa, dobrada a cada nova falha.
+LLM_TENTATIVAS = int(os.getenv("LLM_TENTATIVAS", "3"))
+LLM_ESPERA_SEGUNDOS = float(os.getenv("LLM_ESPERA_SEGUNDOS", "2"))
+
+_modelos = {}
+# Configuração de geração de cada modelo criado, para a chave do cache (id do modelo -> texto).
+_configuracoes = {}
+_lock = threading.Lock()
+
+
+def obter_modelo(resposta_json: bool = False, esquema: dict = None):
+    """
+    Retorna o GenerativeModel de GEMINI_MODELO, criado (e a API configurada) só no primeiro uso
+    e reaproveitado depois. Com `resposta_json`, o Gemini devolve apenas JSON; com `esquema`,
+    o JSON segue o esquema informado.
+    """
+    chave = (resposta_json or esquema is not None, json.dumps(esquema, sort_keys=True) if esquema else None)
+    with _lock:
+        if chave not in _modelos:
+            # Importado aqui para que comandos que não usam o Gemini não paguem a importação.
+            import google.generativeai as genai
+
+            if not _modelos:
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            configuracao = None
+            if chave[0]:
+                configuracao = {"response_mime_type": "application/json"}
+                if esquema:
+                    configuracao["response_schema"] = esquema
+            _modelos[chave] = genai.GenerativeModel(GEMINI_MODELO, generation_config=configuracao)
+            _configuracoes[id(_modelos[chave])] = json.dumps(configuracao, sort_keys=True) if configuracao else ""
+        return _modelos[chave]
+
+
+def _erros_transitorios() -> tuple:
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        # Sem o SDK (ex: modelo de testes), só os erros de rede da biblioteca padrão.
+        return (TimeoutError, ConnectionError)
+
+    return (
+        TimeoutError,
+        ConnectionError,
+        exceptions.DeadlineExceeded,
+        exceptions.ServiceUnavailable,
+        exceptions.ResourceExhausted,
+        exceptions.InternalServerError,
+    )
+
+
+def gerar(model, prompt: str, versao: str, converter=None, timeout: float = LLM_TIMEOUT_SEGUNDOS,
+          tentativas: int = LLM_TENTATIVAS):
+    """
+    Chama o Gemini pelo cache (ver gerar_com_cache) com prazo de `timeout` segundos por chamada.
+    Erros transitórios da API e respostas recusadas pelo `converter` (ValueError, como um JSON
+    inválido) são tentados de novo até `tentativas` vezes; os demais erros sobem na hora.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return gerar_com_cache(
+                model, prompt, versao, converter=converter, configuracao=_configuracoes.get(id(model), ""),
+                request_options={"timeout": timeout},
+            )
+        except Exception as erro:
+            if not isinstance(erro, ValueError) and not isinstance(erro, _erros_transitorios()):
+                raise
+            if tentativa == tentativas:
+                raise
+            espera = LLM_ESPERA_SEGUNDOS * 2 ** (tentativa - 1)
+            print(f"AVISO: Tentativa {tentativa} de {tentativas} ao Gemini falhou ({erro}). Nova tentativa em {espera:.0f} s.")
+            time.sleep(espera)
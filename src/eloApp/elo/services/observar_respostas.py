@@ -0,0 +1,161 @@
+import imaplib
+import os
+import random
+import select
+import ssl
+import threading
+import time
+from dotenv import load_dotenv
+from ..database.connection import trabalhador_do_banco
+from .process_replies import processar_respostas
+from .sincronizacao_imap import IMAP_PASTA, conectar_imap
+
+load_dotenv()
+
+# O IDLE é renovado (e a caixa sincronizada) a cada intervalo, mesmo sem novidades: serve de
+# heartbeat e fica abaixo dos ~29 minutos após os quais o Gmail encerra um IDLE ocioso.
+IMAP_IDLE_RENOVAR_SEGUNDOS = float(os.getenv("IMAP_IDLE_RENOVAR_SEGUNDOS", "600"))
+# Espera máxima entre tentativas de reconexão (a espera dobra a cada falha seguida).
+IMAP_RECONEXAO_MAXIMA_SEGUNDOS = float(os.getenv("IMAP_RECONEXAO_MAXIMA_SEGUNDOS", "300"))
+
+
+def _entrar_idle(mail: imaplib.IMAP4) -> bytes:
+    """Envia o comando IDLE (imaplib não o implementa) e espera a confirmação do servidor."""
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+    while True:
+        linha = mail.readline()
+        if not linha:
+            raise imaplib.IMAP4.abort("Conexão encerrada pelo servidor ao entrar em IDLE.")
+        if linha.startswith(b"+"):
+            return tag
+        if linha.startswith(tag):
+            raise imaplib.IMAP4.error(f"Servidor recusou o IDLE: {linha.decode(errors='ignore').strip()}")
+
+
+def _dados_pendentes(mail: imaplib.IMAP4) -> bool:
+    """
+    Indica se já há dados recebidos e não lidos que o select() não enxerga: linhas no buffer
+    de leitura do imaplib (mail.file), que pode ter lido o "* N EXISTS" junto com a confirmação
+    do IDLE, ou dados já decifrados e pendentes no SSL.
+    """
+    pendente = getattr(mail.sock, "pending", None)
+    if pendente and pendente():
+        return True
+    # peek() devolve o que está no buffer; se ele estiver vazio, tenta uma leitura do socket,
+    # que aqui não pode bloquear.
+    timeout = mail.sock.gettimeout()
+    mail.sock.settimeout(0)
+    try:
+        return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        mail.sock.settimeout(timeout)
+
+
+def _aguardar_novidades(mail: imaplib.IMAP4, timeout: float) -> bool:
+    """Espera, em IDLE, por uma notificação de nova mensagem. Retorna False se o tempo acabar antes."""
+    limite = time.monotonic() + timeout
+    while True:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return False
+        if not _dados_pendentes(mail):
+            prontos, _, _ = select.select([mail.sock], [], [], restante)
+            if not prontos:
+                return False
+        linha = mail.readline()
+        if not linha or linha.startswith(b"* BYE"):
+            raise imaplib.IMAP4.abort("Conexão encerrada pelo servidor durante o IDLE.")
+        if linha.rstrip().upper().endswith((b"EXISTS", b"RECENT")):
+            return True
+
+
+def _sair_idle(mail: imaplib.IMAP4, tag: bytes):
+    """Encerra o IDLE (DONE) e consome as respostas até a confirmação do comando."""
+    mail.send(b"DONE\r\n")
+    while True:
+        linha = mail.readline()
+        if not linha:
+            raise imaplib.IMAP4.abort("Conexão encerrada pelo servidor ao sair do IDLE.")
+        if linha.startswith(tag):
+            if not linha[len(tag):].lstrip().upper().startswith(b"OK"):
+                raise imaplib.IMAP4.error(f"IDLE terminou com erro: {linha.decode(errors='ignore').strip()}")
+            return
+
+
+def observar_respostas(
+    processar=processar_respostas,
+    fabrica=conectar_imap,
+    pasta: str = IMAP_PASTA,
+    renovar_segundos: float = IMAP_IDLE_RENOVAR_SEGUNDOS,
+    reconexao_maxima: float = IMAP_RECONEXAO_MAXIMA_SEGUNDOS,
+    parar: threading.Event = None,
+):
+    """
+    Mantém uma conexão IMAP em IDLE e chama `processar` (por padrão, processar_respostas, que
+    sincroniza por UID, extrai as respostas e atualiza o banco) a cada nova mensagem, a cada
+    renovação do IDLE e a cada reconexão. Quedas de conexão são refeitas com espera exponencial.
+    Roda até `parar` ser sinalizado (ou até o processo ser interrompido).
+    """
+    parar = parar or threading.Event()
+    espera = 1.0
+
+    with trabalhador_do_banco("observador_respostas"):
+        while not parar.is_set():
+            mail = None
+            try:
+                mail = fabrica()
+                tipo, _ = mail.select(pasta)
+                if tipo != "OK":
+                    raise imaplib.IMAP4.error(f"Não foi possível selecionar a pasta '{pasta}'.")
+                suporta_idle = "IDLE" in mail.capabilities
+                if not suporta_idle:
+                    print("AVISO: Servidor IMAP sem suporte a IDLE; a caixa será verificada periodicamente.")
+                print(f"LOG: Observando a pasta '{pasta}' por novas respostas.")
+                espera = 1.0
+
+                # Alcança o que chegou enquanto o observador estava desconectado.
+                processar()
+
+                while not parar.is_set():
+                    if suporta_idle:
+                        tag = _entrar_idle(mail)
+                        chegou = _aguardar_novidades(mail, renovar_segundos)
+                        _sair_idle(mail, tag)
+                    else:
+                        parar.wait(renovar_segundos)
+                        mail.noop()
+                        chegou = False
+
+                    if parar.is_set():
+                        break
+                    if chegou:
+                        print("LOG: Nova mensagem na caixa de entrada; processando respostas.")
+                    else:
+                        print(f"LOG: Heartbeat do observador de respostas ({time.strftime('%d/%m/%Y %H:%M:%S')}).")
+                    processar()
+
+            except (imaplib.IMAP4.error, OSError) as e:
+                if parar.is_set():
+                    break
+                atraso = espera + random.uniform(0, espera / 2)
+                print(f"AVISO: Conexão IMAP perdida ({e}). Nova tentativa em {atraso:.0f} s.")
+                parar.wait(atraso)
+                espera = min(espera * 2, reconexao_maxima)
+            finally:
+                if mail is not None:
+                    try:
+                        mail.logout()
+                    except (imaplib.IMAP4.error, OSError):
+                        pass
+
+    print("LOG: Observador de respostas encerrado.")
+
+
+if __name__ == "__main__":
+    try:
+        observar_respostas()
+    except KeyboardInterrupt:
+        print("\nObservador de respostas interrompido.")
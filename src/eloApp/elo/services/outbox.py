@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import smtplib
+import sqlite3
+import subprocess
+import sys
+from dotenv import load_dotenv
+from ..database.connection import obter_conexao, trabalhador_do_banco
+from .despacho_emails import despachar_mensagens, erro_transitorio
+
+load_dotenv()
+
+# Mensagens reservadas por vez pelo drenador e número de rodadas até desistir de uma mensagem.
+OUTBOX_LOTE = int(os.getenv("OUTBOX_LOTE", "50"))
+OUTBOX_MAX_TENTATIVAS = int(os.getenv("OUTBOX_MAX_TENTATIVAS", "5"))
+# Espera base (dobrada a cada rodada com falha) antes de uma mensagem voltar a ser tentada.
+OUTBOX_ESPERA_SEGUNDOS = 60
+# Uma reserva mais antiga que isto é de um drenador que morreu no meio do envio.
+OUTBOX_RESERVA_MINUTOS = 10
+
+
+def enfileirar(conn: sqlite3.Connection, tipo: str, destinatarios, mensagem, remetente=None, ids_acolhimento=()) -> int:
+    """
+    Grava a mensagem na caixa de saída e retorna o id dela. Não faz commit: deve ser chamada
+    dentro da mesma transação que altera o status dos visitantes (`ids_acolhimento`), para
+    que a mudança de status e o e-mail a enviar sejam gravados juntos ou não sejam gravados.
+    """
+    if isinstance(destinatarios, str):
+        destinatarios = [destinatarios]
+    cursor = conn.execute(
+        "INSERT INTO outbox (tipo, remetente, destinatarios, mensagem) VALUES (?, ?, ?, ?)",
+        (tipo, remetente, json.dumps(list(destinatarios)), mensagem.as_bytes()),
+    )
+    id_outbox = cursor.lastrowid
+    conn.executemany(
+        "INSERT OR IGNORE INTO outbox_visitantes (id_outbox, id_acolhimento) VALUES (?, ?)",
+        ((id_outbox, id_acolhimento) for id_acolhimento in ids_acolhimento),
+    )
+    return id_outbox
+
+
+def resumo_outbox(conn: sqlite3.Connection) -> dict:
+    """Retorna a quantidade de mensagens por status (pendente, enviando, enviado, falha)."""
+    return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+def _reservar_lote(conn: sqlite3.Connection, tamanho: int) -> list:
+    """
+    Reserva (status 'enviando') até `tamanho` mensagens prontas para envio, incluindo as
+    reservadas há muito tempo por um drenador interrompido. BEGIN IMMEDIATE garante que dois
+    drenadores rodando ao mesmo tempo nunca reservem a mesma mensagem.
+    """
+    try:
+        conn.execute("BEGIN IMMEDIATE;")
+        linhas = conn.execute(
+            """
+            SELECT id, remetente, destinatarios, mensagem, tentativas
+            FROM outbox
+            WHERE (status = 'pendente' AND proxima_tentativa <= CURRENT_TIMESTAMP)
+               OR (status = 'enviando' AND reservado_em <= datetime('now', ?))
+            ORDER BY id
+            LIMIT ?
+            """,
+            (f"-{OUTBOX_RESERVA_MINUTOS} minutes", tamanho),
+        ).fetchall()
+        conn.executemany(
+            """
+            UPDATE outbox SET status = 'enviando', reservado_em = CURRENT_TIMESTAMP, tentativas = tentativas + 1
+            WHERE id = ?
+            """,
+            ((linha[0],) for linha in linhas),
+        )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return linhas
+
+
+def _registrar_resultados(conn: sqlite3.Connection, linhas: list, erros: list, max_tentativas: int) -> dict:
+    """Grava o resultado de cada envio: enviado, reagendado (com espera exponencial) ou falha definitiva."""
+    enviados, reagendados, falhas = [], [], []
+    for (id_outbox, _, _, _, tentativas_anteriores), erro in zip(linhas, erros):
+        tentativas = tentativas_anteriores + 1
+        if erro is None:
+            enviados.append((id_outbox,))
+        elif isinstance(erro, smtplib.SMTPAuthenticationError):
+            # Problema de configuração, não da mensagem: volta para a fila sem gastar tentativa.
+            reagendados.append((str(erro)[:255], "+0 seconds", -1, id_outbox))
+        elif tentativas < max_tentativas and erro_transitorio(erro):
+            espera = OUTBOX_ESPERA_SEGUNDOS * 2 ** (tentativas - 1)
+            reagendados.append((str(erro)[:255], f"+{espera} seconds", 0, id_outbox))
+        else:
+            falhas.append((str(erro)[:255], id_outbox))
+
+    with conn:
+        conn.executemany(
+            "UPDATE outbox SET status = 'enviado', enviado_em = CURRENT_TIMESTAMP, ultimo_erro = NULL WHERE id = ?",
+            enviados,
+        )
+        conn.executemany(
+            """
+            UPDATE outbox SET status = 'pendente', ultimo_erro = ?, proxima_tentativa = datetime('now', ?),
+                   tentativas = tentativas + ?
+            WHERE id = ?
+            """,
+            reagendados,
+        )
+        conn.executemany("UPDATE outbox SET status = 'falha', ultimo_erro = ? WHERE id = ?", falhas)
+        # Notificações que não serão mais enviadas: os visitantes voltam para o próximo disparo.
+        conn.executemany(
+            """
+            UPDATE acolhimento SET status_contato = 'Pendente'
+            WHERE status_contato = 'Notificado'
+              AND id IN (SELECT id_acolhimento FROM outbox_visitantes WHERE id_outbox = ?)
+            """,
+            ((id_outbox,) for _, id_outbox in falhas),
+        )
+
+    for erro, id_outbox in falhas:
+        print(f"ERRO: Mensagem {id_outbox} da outbox não foi enviada e foi descartada: {erro}")
+    return {"enviado": len(enviados), "reagendado": len(reagendados), "falha": len(falhas)}
+
+
+def drenar_outbox(tamanho_lote: int = OUTBOX_LOTE, max_tentativas: int = OUTBOX_MAX_TENTATIVAS) -> dict:
+    """
+    Envia as mensagens prontas da caixa de saída, lote a lote, até não restar nenhuma.
+    Mensagens com falha temporária são reagendadas e ficam para a próxima execução.
+    Retorna os totais de mensagens enviadas, reagendadas e com falha definitiva.
+    """
+    with trabalhador_do_banco("outbox"):
+        conn = obter_conexao()
+        totais = {"enviado": 0, "reagendado": 0, "falha": 0}
+
+        while True:
+            linhas = _reservar_lote(conn, tamanho_lote)
+            if not linhas:
+                break
+
+            # O despacho usa um único remetente por chamada; agrupa as mensagens por remetente.
+            erros = [None] * len(linhas)
+            por_remetente = {}
+            for posicao, linha in enumerate(linhas):
+                por_remetente.setdefault(linha[1], []).append(posicao)
+            for remetente, posicoes in por_remetente.items():
+                mensagens = [(json.loads(linhas[p][2]), linhas[p][3]) for p in posicoes]
+                for posicao, erro in zip(posicoes, despachar_mensagens(mensagens, remetente)):
+                    erros[posicao] = erro
+
+            for chave, quantidade in _registrar_resultados(conn, linhas, erros, max_tentativas).items():
+                totais[chave] += quantidade
+
+            if any(isinstance(erro, smtplib.SMTPAuthenticationError) for erro in erros):
+                print("ERRO: Falha de autenticação SMTP. As mensagens continuam na fila; verifique EMAIL_USER/EMAIL_PASS.")
+                break
+
+        print(
+            f"LOG: Outbox drenada: {totais['enviado']} enviada(s), {totais['reagendado']} reagendada(s), "
+            f"{totais['falha']} com falha definitiva."
+        )
+    return totais
+
+
+def iniciar_drenagem_em_segundo_plano() -> subprocess.Popen:
+    """
+    Inicia o drenador em um processo separado e retorna imediatamente (usado pelo dashboard).
+    A saída do drenador é acrescentada ao arquivo outbox.log na PASTA_BASE.
+    """
+    raiz_app = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    caminho_log = os.path.join(os.getenv("PASTA_BASE") or raiz_app, "outbox.log")
+    with open(caminho_log, "a") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "elo.services.outbox"],
+            cwd=raiz_app,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Envia as mensagens pendentes da caixa de saída (outbox).")
+    parser.add_argument("--lote", type=int, default=OUTBOX_LOTE, help="Mensagens reservadas por vez.")
+    args = parser.parse_args()
+    drenar_outbox(tamanho_lote=args.lote)
@@ -1,105 +1,165 @@
-import imaplib
 import email
 from email.header import decode_header
-import google.generativeai as genai
 import os
 import json
-import sqlite3
 from dotenv import load_dotenv
+from ..database.connection import obter_conexao
+from ..database.visitantes import localizar_entre_candidatos, localizar_visitantes, visitantes_das_notificacoes
+from .cache_llm import cache_padrao
+from .classificador_respostas import (
+    EstatisticasClassificador,
+    carregar_visitantes_notificados,
+    classificar_resposta,
+    corpo_texto,
+    message_ids_respondidos,
+    remover_citacao,
+)
+from .extracao_respostas import STATUS_RESPOSTA, esquema_atualizacoes
+from .llm import gerar, obter_modelo
+from .sincronizacao_imap import SessaoIMAP
 
 load_dotenv()
 
-# Configurações
-IMAP_SERVER = "imap.gmail.com"
-EMAIL_CONTA = os.getenv("EMAIL_USER") # A conta que recebe as respostas
-EMAIL_PASS = os.getenv("EMAIL_PASS")
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Identifica, no estado da sincronização IMAP, as mensagens já lidas por esta etapa.
+CONSUMIDOR_IMAP = "respostas_diretas"
+# Entra na chave do cache do Gemini: incrementar quando a interpretação da resposta mudar.
+VERSAO_PROMPT = "respostas_diretas/2"
+# Além dos status da extração padrão, esta etapa aceita "Ignorado".
+STATUS_RESPOSTA_DIRETA = STATUS_RESPOSTA + ("Ignorado",)
+
+
+def _converter_json(texto):
+    updates = json.loads(texto)
+    if not isinstance(updates, list):
+        raise ValueError("O Gemini não retornou uma lista JSON.")
+    return updates
 
 def processar_respostas():
     pasta_base = os.getenv('PASTA_BASE')
     if not pasta_base:
         print("Erro: Variável de ambiente PASTA_BASE não está configurada.")
         return
-    caminho_banco = os.path.join(pasta_base, 'igreja_dados.db')
-    conn = sqlite3.connect(caminho_banco)
+    conn = obter_conexao()
     cursor = conn.cursor()
 
     try:
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER)
-        mail.login(EMAIL_CONTA, EMAIL_PASS)
-        mail.select("inbox")
-
-        status, messages = mail.search(None, '(UNSEEN)')
-        if status != 'OK' or not messages[0]:
-            print("Nenhuma resposta nova.")
-            return
-
-        for msg_id in messages[0].split():
-            _, msg_data = mail.fetch(msg_id, "(RFC822)")
-            msg = email.message_from_bytes(msg_data[0][1])
-
-            # Pega o e-mail do remetente
-            remetente_email, _ = email.utils.parseaddr(msg["From"])
-
-            # Verifica se o remetente é um acolhedor conhecido
-            cursor.execute("SELECT id_acolhedor FROM acolhedores WHERE acolhedor_email = ?", (remetente_email,))
-            result = cursor.fetchone()
-            if not result:
-                print(f"Ignorando e-mail de remetente desconhecido: {remetente_email}")
-                continue
-            
-            id_acolhedor_remetente = result[0]
-            
-            # Extrai o corpo do e-mail
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain": body = part.get_payload(decode=True).decode()
-            else:
-                body = msg.get_payload(decode=True).decode()
-
-            if not body: continue
-
-            # Usa Gemini para extrair informações
-            model = genai.GenerativeModel('gemini-pro')
-            prompt = f"""
-            Analise o corpo do e-mail abaixo. Para cada visitante mencionado, retorne um objeto JSON com "nome_visitante", "status_resposta" e "observacao".
-            Valores possíveis para "status_resposta": "Atendeu e tem interesse", "Atendeu e já tem igreja", "Não atendeu", "Número incorreto", "Ignorado".
-
-            E-mail:
-            ---
-            {body}
-            ---
-
-            Retorne APENAS uma lista de objetos JSON.
-            """
-            response = model.generate_content(prompt)
-            json_text = response.text.strip().replace("```json", "").replace("```", "")
-            
-            try:
-                updates = json.loads(json_text)
-                for update in updates:
-                    nome = update.get("nome_visitante")
-                    status = update.get("status_resposta")
-                    obs = update.get("observacao")
-                    
-                    if nome and status:
-                        # Atualiza o visitante pelo nome E pelo ID do acolhedor que respondeu
-                        cursor.execute(
-                            "UPDATE acolhimento SET status_contato = ?, observacoes = ? WHERE nome LIKE ? AND id_acolhedor = ?",
-                            (status, obs, f'%{nome}%', id_acolhedor_remetente)
+        with SessaoIMAP(CONSUMIDOR_IMAP) as sessao:
+            if not sessao.pendentes():
+                print("Nenhuma resposta nova.")
+                sessao.confirmar()
+                return
+
+            visitantes_por_acolhedor = {}
+            estatisticas = EstatisticasClassificador()
+            correlacionadas = 0
+
+            for uid, msg in sessao.mensagens():
+                # Pega o e-mail do remetente
+                _, remetente_email = email.utils.parseaddr(msg["From"])
+
+                # Verifica se o remetente é um acolhedor conhecido
+                cursor.execute(
+                    "SELECT id_acolhedor, acolhedor_nome, acolhedor_apelido FROM acolhedores WHERE acolhedor_email = ?",
+                    (remetente_email,),
+                )
+                result = cursor.fetchone()
+                if not result:
+                    print(f"Ignorando e-mail de remetente desconhecido: {remetente_email}")
+                    continue
+                
+                id_acolhedor_remetente, *nomes_acolhedor = result
+                
+                # Extrai o corpo do e-mail. Uma mensagem ilegível é registrada como falha, para não
+                # travar a marca d'água da sincronização (e as respostas seguintes) nela.
+                try:
+                    body = corpo_texto(msg)
+                except Exception as e:
+                    print(f"AVISO: Não foi possível ler o corpo do e-mail de {remetente_email}: {e}")
+                    sessao.marcar_falha(uid, e)
+                    continue
+
+                if not body.strip():
+                    print(f"AVISO: E-mail UID {uid} de {remetente_email} sem corpo em texto. Registrado como falha.")
+                    sessao.marcar_falha(uid, "corpo vazio")
+                    continue
+
+                # Se a resposta cita o Message-ID da notificação, os candidatos são exatamente os
+                # visitantes daquele e-mail; senão, todos os visitantes do acolhedor que aguardam retorno.
+                candidatos = visitantes_das_notificacoes(conn, message_ids_respondidos(msg), id_acolhedor_remetente)
+                if candidatos:
+                    nomes_candidatos = [nome for _, nome in candidatos]
+                    body = remover_citacao(body) or body
+                else:
+                    if id_acolhedor_remetente not in visitantes_por_acolhedor:
+                        visitantes_por_acolhedor[id_acolhedor_remetente] = carregar_visitantes_notificados(
+                            conn, id_acolhedor_remetente
                         )
-                        print(f"Atualizado: Visitante '{nome}' por {remetente_email} -> Status: {status}")
-                conn.commit()
-            except Exception as e:
-                print(f"Erro ao processar resposta do Gemini ou atualizar BD: {e}")
+                    nomes_candidatos = visitantes_por_acolhedor[id_acolhedor_remetente]
+                correlacionadas += bool(candidatos)
+
+                # Respostas curtas e inequívocas são classificadas localmente; o restante vai para o Gemini.
+                updates = classificar_resposta(body, nomes_candidatos, ignorar=nomes_acolhedor)
+                estatisticas.registrar(updates is not None)
+
+                try:
+                    if updates is None:
+                        # Usa Gemini para extrair informações
+                        model = obter_modelo(esquema=esquema_atualizacoes(STATUS_RESPOSTA_DIRETA))
+                        lista_visitantes = (
+                            f"Os visitantes desta notificação são: {'; '.join(nomes_candidatos)}. "
+                            'Use em "nome_visitante" exatamente um destes nomes.'
+                            if candidatos else ""
+                        )
+                        prompt = f"""
+                        Analise o corpo do e-mail abaixo. Para cada visitante mencionado, retorne um objeto JSON com "nome_visitante", "status_resposta" e "observacao".
+                        Valores possíveis para "status_resposta": "Atendeu e tem interesse", "Atendeu e já tem igreja", "Não atendeu", "Número incorreto", "Ignorado".
+                        {lista_visitantes}
+
+                        E-mail:
+                        ---
+                        {body}
+                        ---
+
+                        Retorne APENAS uma lista de objetos JSON.
+                        """
+                        updates = gerar(model, prompt, VERSAO_PROMPT, converter=_converter_json)
+                    for update in updates:
+                        nome = update.get("nome_visitante")
+                        status = update.get("status_resposta")
+                        obs = update.get("observacao")
+                        
+                        if nome and status:
+                            # Atualiza o visitante pelo nome entre os candidatos da notificação ou,
+                            # sem ela, pelo nome E pelo ID do acolhedor que respondeu
+                            if candidatos:
+                                ids = localizar_entre_candidatos(candidatos, nome)
+                            else:
+                                ids = localizar_visitantes(conn, nome, id_acolhedor=id_acolhedor_remetente)
+                            if not ids:
+                                print(f"AVISO: Visitante '{nome}' não encontrado (ou ambíguo) entre os visitantes de {remetente_email}.")
+                                continue
+                            cursor.execute(
+                                f"UPDATE acolhimento SET status_contato = ?, observacoes = ? WHERE id IN ({','.join('?' for _ in ids)})",
+                                (status, obs, *ids)
+                            )
+                            print(f"Atualizado: Visitante '{nome}' por {remetente_email} -> Status: {status}")
+                    conn.commit()
+                    sessao.marcar_processada(uid)
+                    # Os visitantes atualizados deixam de aguardar retorno.
+                    visitantes_por_acolhedor.pop(id_acolhedor_remetente, None)
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Erro ao processar resposta do Gemini ou atualizar BD: {e}")
+                    sessao.marcar_falha(uid, e)
+
+            print(estatisticas.resumo())
+            print(f"LOG: {correlacionadas} resposta(s) ligada(s) à notificação original pelo Message-ID.")
+            print(cache_padrao().resumo())
+            # Avança a marca d'água e marca como lidas as mensagens já gravadas no banco.
+            sessao.confirmar()
 
     except Exception as e:
         print(f"Erro geral: {e}")
-    finally:
-        conn.close()
-        if 'mail' in locals() and mail.state == 'SELECTED':
-            mail.logout()
 
 if __name__ == '__main__':
     processar_respostas()
\ No newline at end of file
@@ -1,124 +1,194 @@
-import imaplib
 import email
 from email.header import decode_header
-import google.generativeai as genai
 import os
 import json
+import time
 from datetime import datetime
 from dotenv import load_dotenv
+from ..database.connection import obter_conexao
+from ..database.visitantes import localizar_entre_candidatos, visitantes_das_notificacoes
+from .cache_llm import cache_padrao
+from .classificador_respostas import (
+    EstatisticasClassificador,
+    carregar_visitantes_notificados,
+    classificar_resposta,
+    corpo_texto,
+    message_ids_respondidos,
+    remover_citacao,
+)
+from .extracao_respostas import RespostaInvalida, extrair_em_paralelo, modelo_atualizacoes
+from .llm import LLM_CONCORRENCIA
+from .sincronizacao_imap import SessaoIMAP
 
 load_dotenv()
 
-# Configurações
-IMAP_SERVER = "imap.gmail.com"
-EMAIL_CONTA = os.getenv("EMAIL_USER")  # A conta que recebe as respostas
-EMAIL_PASS = os.getenv("EMAIL_PASS")
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Identifica, no estado da sincronização IMAP, as mensagens já lidas por esta etapa.
+CONSUMIDOR_IMAP = "acompanhamento_json"
 
 
 def gerar_json_respostas():
     """
-    Lê e-mails não lidos, estrutura as respostas com o Gemini e salva em um arquivo JSON.
-    Marca os e-mails como lidos após o processamento para não serem lidos novamente.
+    Lê as respostas que chegaram desde a última execução (sincronização incremental por UID),
+    estrutura as respostas com o Gemini e salva em um arquivo JSON. Os e-mails só são marcados
+    como lidos depois que o arquivo é gravado; os que falharem são tentados de novo na próxima execução.
     """
     print("Conectando à caixa de e-mail para verificar respostas...")
     respostas_consolidadas = []
 
-    try:
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER)
-        mail.login(EMAIL_CONTA, EMAIL_PASS)
-        mail.select("inbox")
-
-        # Procura por e-mails não lidos
-        status, messages = mail.search(None, "(UNSEEN)")
-        if status != "OK" or not messages[0]:
-            print("Nenhuma resposta nova para processar.")
-            return
-
-        message_ids = messages[0].split()
-        print(f"Encontrados {len(message_ids)} novos e-mails.")
-
-        model = genai.GenerativeModel("gemini-pro")
-
-        for msg_id in message_ids:
-            # Busca o e-mail
-            _, msg_data = mail.fetch(msg_id, "(RFC822)")
-            msg = email.message_from_bytes(msg_data[0][1])
-
-            # Extrai o corpo do e-mail
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        body = part.get_payload(decode=True).decode(
-                            "utf-8", errors="ignore"
-                        )
-                        break
-            else:
-                body = msg.get_payload(decode=True).decode("utf-8", errors="ignore")
-
-            if not body.strip():
-                continue
-
-            # Prompt para o Gemini
-            prompt = f"""
-            Analise o corpo do e-mail de resposta abaixo e, para cada visitante mencionado, extraia as informações em um objeto JSON.
-            As chaves devem ser "nome_visitante", "status_resposta" e "observacao".
-
-            Os possíveis valores para "status_resposta" são:
-            - "Atendeu e tem interesse"
-            - "Atendeu e já tem igreja"
-            - "Não atendeu"
-            - "Número incorreto"
-
-            E-mail:
-            ---
-            {body}
-            ---
+    pasta_base = os.getenv("PASTA_BASE")
+    if not pasta_base:
+        print("ERRO CRÍTICO: Variável de ambiente PASTA_BASE não definida.")
+        return
 
-            Retorne APENAS uma lista de objetos JSON.
-            """
-
-            response = model.generate_content(prompt)
-            json_text = response.text.strip().replace("```json", "").replace("```", "")
-
-            try:
-                updates = json.loads(json_text)
+    try:
+        with SessaoIMAP(CONSUMIDOR_IMAP) as sessao:
+            if not sessao.pendentes():
+                print("Nenhuma resposta nova para processar.")
+                sessao.confirmar()
+                return
+
+            print(f"Encontrados {sessao.pendentes()} novos e-mails.")
+
+            # Respostas curtas e inequívocas são resolvidas localmente, sem gastar cota do Gemini.
+            conn = obter_conexao()
+            acolhedores = {
+                email_: (id_, (nome, apelido))
+                for email_, id_, nome, apelido in conn.execute(
+                    "SELECT acolhedor_email, id_acolhedor, acolhedor_nome, acolhedor_apelido FROM acolhedores"
+                )
+            }
+            visitantes_por_acolhedor = {}
+            estatisticas = EstatisticasClassificador()
+            correlacionadas = 0
+
+            # Primeiro lê todas as mensagens; as que sobrarem para o Gemini são extraídas depois,
+            # com várias chamadas simultâneas, já que quase todo o tempo é espera pela API.
+            recebidas = []
+            for uid, msg in sessao.mensagens():
+                # O remetente permite restringir a atualização aos visitantes daquele acolhedor.
+                _, remetente_email = email.utils.parseaddr(msg["From"])
+                # Corpo ilegível ou vazio fica registrado como falha (com o UID), em vez de a marca
+                # d'água passar pela mensagem sem que ela tenha sido processada.
+                try:
+                    body = corpo_texto(msg)
+                except Exception as e:
+                    print(f"AVISO: Não foi possível ler o corpo do e-mail UID {uid} de {remetente_email}: {e}")
+                    sessao.marcar_falha(uid, e)
+                    continue
+                if not body.strip():
+                    print(f"AVISO: E-mail UID {uid} de {remetente_email} sem corpo em texto. Registrado como falha.")
+                    sessao.marcar_falha(uid, "corpo vazio")
+                    continue
+
+                updates, candidatos = None, []
+                if remetente_email in acolhedores:
+                    id_acolhedor, nomes_acolhedor = acolhedores[remetente_email]
+                    # Com o Message-ID da notificação respondida, os candidatos são os visitantes
+                    # daquele e-mail, e o texto citado da notificação pode ser descartado.
+                    candidatos = visitantes_das_notificacoes(conn, message_ids_respondidos(msg), id_acolhedor)
+                    if candidatos:
+                        body = remover_citacao(body) or body
+                        nomes_candidatos = [nome for _, nome in candidatos]
+                    else:
+                        if id_acolhedor not in visitantes_por_acolhedor:
+                            visitantes_por_acolhedor[id_acolhedor] = carregar_visitantes_notificados(conn, id_acolhedor)
+                        nomes_candidatos = visitantes_por_acolhedor[id_acolhedor]
+                    updates = classificar_resposta(body, nomes_candidatos, ignorar=nomes_acolhedor)
+                estatisticas.registrar(updates is not None)
+                correlacionadas += bool(candidatos)
+
+                if updates is None:
+                    recebidas.append((uid, remetente_email, body, candidatos))
+                    continue
+                _completar_atualizacoes(updates, remetente_email, candidatos)
                 respostas_consolidadas.extend(updates)
+                print(f"E-mail classificado localmente. {len(updates)} atualização(ões) extraída(s).")
+                sessao.marcar_processada(uid)
+
+            print(estatisticas.resumo())
+            print(f"LOG: {correlacionadas} resposta(s) ligada(s) à notificação original pelo Message-ID.")
+
+            resultados = []
+            if recebidas:
+                model = modelo_atualizacoes()
+                inicio = time.perf_counter()
+                resultados = extrair_em_paralelo(
+                    model,
+                    [body for _, _, body, _ in recebidas],
+                    visitantes=[[nome for _, nome in candidatos] or None for _, _, _, candidatos in recebidas],
+                )
                 print(
-                    f"E-mail processado com sucesso. {len(updates)} atualização(ões) extraída(s)."
+                    f"LOG: {len(recebidas)} e-mail(s) enviados ao Gemini em {time.perf_counter() - inicio:.1f} s "
+                    f"(até {LLM_CONCORRENCIA} chamada(s) simultânea(s))."
                 )
-                # MARCA O E-MAIL COMO LIDO para não processar de novo
-                mail.store(msg_id, "+FLAGS", "\\Seen")
-            except json.JSONDecodeError:
+                print(cache_padrao().resumo())
+
+            for (uid, remetente_email, _, candidatos), (updates, erro) in zip(recebidas, resultados):
+                if isinstance(erro, RespostaInvalida):
+                    print(
+                        f"AVISO: Gemini não retornou um JSON válido para um dos e-mails. E-mail será tentado de novo na próxima execução."
+                    )
+                    print("Resposta recebida:", erro.texto)
+                    sessao.marcar_falha(uid, "JSON inválido retornado pelo Gemini")
+                    continue
+                if erro is not None:
+                    print(f"AVISO: Falha ao consultar o Gemini para um dos e-mails ({erro}). Ele será tentado de novo.")
+                    sessao.marcar_falha(uid, erro)
+                    continue
+
+                _completar_atualizacoes(updates, remetente_email, candidatos)
+                respostas_consolidadas.extend(updates)
                 print(
-                    f"AVISO: Gemini não retornou um JSON válido para um dos e-mails. E-mail será mantido como não lido."
+                    f"E-mail processado com sucesso. {len(updates)} atualização(ões) extraída(s)."
                 )
-                print("Resposta recebida:", json_text)
+                # Só será marcado como lido em confirmar(), depois de gravado o arquivo.
+                sessao.marcar_processada(uid)
+
+            if respostas_consolidadas:
+                salvar_respostas(respostas_consolidadas, pasta_base)
+            else:
+                print("Nenhuma resposta válida foi extraída para gerar o arquivo.")
+            sessao.confirmar()
 
     except Exception as e:
         print(f"Ocorreu um erro durante o processamento de e-mails: {e}")
-    finally:
-        if "mail" in locals() and mail.state == "SELECTED":
-            mail.logout()
-
-    # Salva o arquivo JSON se houver respostas consolidadas
-    if respostas_consolidadas:
-        pasta_base = os.getenv("PASTA_BASE")
-        if not pasta_base:
-            print("ERRO CRÍTICO: Variável de ambiente PASTA_BASE não definida.")
-            return
-
-        data_hoje = datetime.now().strftime("%d%m%Y")
-        nome_arquivo = f"acompanhamento_carga_{data_hoje}.json"
-        caminho_completo = os.path.join(pasta_base, nome_arquivo)
-
-        with open(caminho_completo, "w", encoding="utf-8") as f:
-            json.dump(respostas_consolidadas, f, indent=4, ensure_ascii=False)
-
-        print(f"\nArquivo '{nome_arquivo}' gerado com sucesso em '{pasta_base}'.")
-    else:
-        print("Nenhuma resposta válida foi extraída para gerar o arquivo.")
+
+
+def _completar_atualizacoes(updates, remetente_email, candidatos):
+    """
+    Acrescenta o remetente a cada atualização e, quando a resposta foi ligada à notificação,
+    os ids de acolhimento do visitante, que a carga usa em vez de procurar pelo nome.
+    """
+    for update in updates:
+        update["email_acolhedor"] = remetente_email
+        if candidatos:
+            ids = localizar_entre_candidatos(candidatos, update.get("nome_visitante"))
+            if ids:
+                update["ids_acolhimento"] = ids
+
+
+def salvar_respostas(respostas, pasta_base):
+    """
+    Acrescenta as respostas ao arquivo de acompanhamento do dia (acompanhamento_carga_ddmmyyyy.json).
+    Como cada execução só traz as mensagens novas, uma segunda execução no mesmo dia não pode
+    sobrescrever as respostas da primeira.
+    """
+    data_hoje = datetime.now().strftime("%d%m%Y")
+    nome_arquivo = f"acompanhamento_carga_{data_hoje}.json"
+    caminho_completo = os.path.join(pasta_base, nome_arquivo)
+
+    existentes = []
+    if os.path.exists(caminho_completo):
+        with open(caminho_completo, "r", encoding="utf-8") as f:
+            existentes = json.load(f)
+
+    # Grava em arquivo temporário e renomeia, para nunca deixar um JSON incompleto.
+    caminho_temporario = f"{caminho_completo}.tmp"
+    with open(caminho_temporario, "w", encoding="utf-8") as f:
+        json.dump(existentes + respostas, f, indent=4, ensure_ascii=False)
+    os.replace(caminho_temporario, caminho_completo)
+
+    print(f"\nArquivo '{nome_arquivo}' gerado com sucesso em '{pasta_base}'.")
 
 
 if __name__ == "__main__":
@@ -1,15 +1,18 @@
 import os
 import dotenv
-import sqlite3
 import datetime
 import pandas as pd
-import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
-import matplotlib.pyplot as plt
+import csv
+import io
 import tempfile
 import ast
+from ..database.connection import caminho_banco_dados, obter_conexao
+from ..database.manifesto import hash_registro
+from .outbox import enfileirar
+from .templates_email import renderizar_alocacao
 
 def verificar_variaveis_ambiente():
     """Verifica se todas as variáveis de ambiente necessárias estão configuradas."""
@@ -23,74 +26,137 @@ def verificar_variaveis_ambiente():
 
 dotenv.load_dotenv(verbose=True)
 
+# Relatórios já renderizados, reaproveitados enquanto o período e as contagens não mudarem.
+PASTA_CACHE_RELATORIOS = "cache_relatorios"
+MAX_RELATORIOS_EM_CACHE = 20
+
+# Filtro dos acolhimentos pendentes no período; usa o índice parcial idx_acolhimento_pendentes_periodo.
+FILTRO_PENDENTES_PERIODO = (
+    "WHERE acc.status_contato = 'Pendente' "
+    "AND acc.data_decisao_iso BETWEEN ? AND ? "
+)
+
+# Formatos do relatório: "html" (tabela no corpo do e-mail) ou "imagem" (JPEG com matplotlib).
+FORMATOS_RELATORIO = ("html", "imagem")
+
+
+def get_color(val):
+    """Cor da contagem de pendências no relatório: verde até 2, amarelo em 3, vermelho acima."""
+    if val <= 2:
+        return 'green'
+    elif val == 3:
+        return 'yellow'
+    else:
+        return 'red'
+
+
 def getPendingAllocations(start_date, end_date) -> pd.DataFrame:
     if not verificar_variaveis_ambiente():
         return
 
-    pasta_base = os.getenv("PASTA_BASE")
-    nome_db = os.getenv("NOME_BANCO_DADOS")
-    caminho_banco = os.path.join(pasta_base, nome_db)
-    conn = None
-
-    if not os.path.exists(caminho_banco):
+    if not os.path.exists(caminho_banco_dados()):
         print(f"Erro: Arquivo do banco de dados nao encontrado")
         return
     
     try:
-        conn = sqlite3.connect(caminho_banco)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
+        conn = obter_conexao(somente_leitura=True)
 
         print(f"Iniciando Query dos Acolhimentos Pendentes entre {start_date} e {end_date}")
         
-        query = (f"SELECT acc.data_decisao, acc.evento, acc.HouM, acc.status_contato, "
+        query = ("SELECT acc.data_decisao, acc.evento, acc.HouM, acc.status_contato, "
          "a.acolhedor_nome, g.nome_lider_gps "
          "FROM acolhimento AS acc "
          "LEFT JOIN acolhedores a ON a.id_acolhedor = acc.id_acolhedor "
          "LEFT JOIN gps AS g ON g.id_gps = a.id_gps "
-         "WHERE acc.status_contato = 'Pendente' "
-         f"AND acc.data_decisao >= '{start_date}' OR acc.data_decisao <='{end_date}';")
+         + FILTRO_PENDENTES_PERIODO)
 
-        df = pd.read_sql(query, conn)
+        df = pd.read_sql(query, conn, params=(start_date, end_date))
         return df
     except Exception as e:
         print(f"\n--- ERRO INESPERADO DURANTE A LEITURA DO BANCO DE DADOS ---")
         print(f"Ocorreu um erro: {e}")
-        if conn:
-            conn.rollback()
-
-    finally:
-        if conn:
-            conn.close()
 
 
 def getCountPendingAllocations(start_date, end_date):
-    df = getPendingAllocations(start_date, end_date)
-    if df is None:
+    """Conta, no próprio SQLite (GROUP BY), os acolhimentos pendentes de cada acolhedor no período."""
+    if not verificar_variaveis_ambiente():
+        return None
+
+    if not os.path.exists(caminho_banco_dados()):
+        print(f"Erro: Arquivo do banco de dados nao encontrado")
+        return None
+
+    try:
+        conn = obter_conexao(somente_leitura=True)
+        print(f"Iniciando contagem dos Acolhimentos Pendentes entre {start_date} e {end_date}")
+
+        query = ("SELECT a.acolhedor_nome, COUNT(*) AS acolhimentos_pendentes "
+         "FROM acolhimento AS acc "
+         "JOIN acolhedores a ON a.id_acolhedor = acc.id_acolhedor "
+         + FILTRO_PENDENTES_PERIODO +
+         "GROUP BY a.acolhedor_nome "
+         "ORDER BY a.acolhedor_nome;")
+
+        return pd.read_sql(query, conn, params=(start_date, end_date))
+    except Exception as e:
+        print(f"\n--- ERRO INESPERADO DURANTE A LEITURA DO BANCO DE DADOS ---")
+        print(f"Ocorreu um erro: {e}")
         return None
 
-    pending_counts = df.groupby('acolhedor_nome').size().reset_index(name='acolhimentos_pendentes')
-    return pending_counts
+
+def _caminho_relatorio_em_cache(start_date, end_date, df, extensao) -> str:
+    """
+    Caminho do relatório em cache. A chave é o hash do período e das próprias contagens:
+    qualquer mudança nos dados que altere o relatório gera um arquivo novo.
+    """
+    pasta = os.path.join(os.getenv("PASTA_BASE") or tempfile.gettempdir(), PASTA_CACHE_RELATORIOS)
+    os.makedirs(pasta, exist_ok=True)
+    chave = hash_registro([start_date, end_date, df.columns.tolist(), df.values.tolist()])
+    return os.path.join(pasta, f"alocacao_{chave}{extensao}")
+
+
+def _limpar_cache_relatorios(pasta):
+    """Mantém apenas os MAX_RELATORIOS_EM_CACHE relatórios usados mais recentemente."""
+    arquivos = sorted(
+        (os.path.join(pasta, nome) for nome in os.listdir(pasta)),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for caminho in arquivos[MAX_RELATORIOS_EM_CACHE:]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
 
 def plot_pending_allocations_as_jpeg(start_date, end_date):
     """
-    Generates a JPEG image of a table with conditional formatting for pending allocations
-    and saves it to a temporary file.
+    Generates a JPEG image of a table with conditional formatting for pending allocations.
+    The image is cached on disk (see _caminho_relatorio_em_cache) and reused while the
+    report data does not change; the returned file must not be deleted by the caller.
     """
     df = getCountPendingAllocations(start_date, end_date)
     if df is None or df.empty:
         print("Não há dados de alocações pendentes para gerar o relatório.")
         return None
 
-    def get_color(val):
-        if val <= 2:
-            return 'green'
-        elif val == 3:
-            return 'yellow'
-        else:
-            return 'red'
+    try:
+        output_path = _caminho_relatorio_em_cache(start_date, end_date, df, ".jpg")
+    except OSError as e:
+        print(f"Erro ao preparar a pasta de cache dos relatórios: {e}")
+        return None
+    if os.path.exists(output_path):
+        os.utime(output_path)
+        print(f"Relatório de alocações pendentes reaproveitado do cache: {output_path}")
+        return output_path
 
-    fig, ax = plt.subplots(figsize=(8, len(df) * 0.5))  # Adjust size based on number of rows
+    # Importado só aqui: o matplotlib leva centenas de ms para carregar e só o modo imagem o usa.
+    from matplotlib.figure import Figure
+
+    # Figure sem pyplot: não fica registrada no estado global do matplotlib e é liberada
+    # ao sair da função, sem acumular memória no processo do dashboard.
+    fig = Figure(figsize=(8, len(df) * 0.5))  # Adjust size based on number of rows
+    ax = fig.subplots()
     ax.axis('tight')
     ax.axis('off')
 
@@ -104,30 +170,55 @@ def plot_pending_allocations_as_jpeg(start_date, end_date):
         the_table[(i + 1, 1)].set_facecolor(color)
 
     try:
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmpfile:
-            output_path = tmpfile.name
-            plt.savefig(output_path, bbox_inches='tight', dpi=150)
-            print(f"Relatório temporário de alocações pendentes salvo em: {output_path}")
-            return output_path
+        # Grava em arquivo temporário e renomeia, para nunca deixar um JPEG incompleto no cache.
+        caminho_temporario = f"{output_path}.{os.getpid()}.tmp"
+        fig.savefig(caminho_temporario, bbox_inches='tight', dpi=150, format='jpg')
+        os.replace(caminho_temporario, output_path)
+        print(f"Relatório de alocações pendentes salvo em: {output_path}")
+        _limpar_cache_relatorios(os.path.dirname(output_path))
+        return output_path
     except Exception as e:
-        print(f"Erro ao salvar o arquivo JPEG temporário: {e}")
+        print(f"Erro ao salvar o arquivo JPEG do relatório: {e}")
         return None
+    finally:
+        fig.clear()
 
-def send_allocation_email(start_date, end_date):
+def _linhas_csv(df) -> str:
+    saida = io.StringIO()
+    writer = csv.writer(saida)
+    writer.writerow(df.columns)
+    writer.writerows(df.values.tolist())
+    return saida.getvalue()
+
+
+def send_allocation_email(start_date, end_date, formato="imagem", anexar_csv=False):
     """
-    Sends an email with the pending allocations report (as a JPEG image) to a list of recipients.
+    Queues an email with the pending allocations report to a list of recipients in the outbox;
+    the outbox drain worker sends it. formato="imagem" attaches a JPEG table (matplotlib);
+    formato="html" renders the same colored table inline, without matplotlib. With
+    anexar_csv=True the counts are also attached as a CSV file.
     """
     if not verificar_variaveis_ambiente():
         return
 
-    attachment_path = plot_pending_allocations_as_jpeg(start_date, end_date)
-    if not attachment_path:
-        print("Não foi possível gerar o anexo. E-mail não enviado.")
+    if formato not in FORMATOS_RELATORIO:
+        print(f"ERRO: Formato de relatório inválido: '{formato}'. Use um de {FORMATOS_RELATORIO}.")
         return
 
+    if formato == "imagem":
+        attachment_path = plot_pending_allocations_as_jpeg(start_date, end_date)
+        if not attachment_path:
+            print("Não foi possível gerar o anexo. E-mail não enviado.")
+            return
+        df = None
+    else:
+        df = getCountPendingAllocations(start_date, end_date)
+        if df is None or df.empty:
+            print("Não há dados de alocações pendentes para gerar o relatório. E-mail não enviado.")
+            return
+
     try:
         from_email = os.getenv("EMAIL_USER")
-        password = os.getenv("EMAIL_PASS")
         mail_list_str = os.getenv("MAIL_LIST")
         
         if not mail_list_str:
@@ -141,27 +232,40 @@ def send_allocation_email(start_date, end_date):
         msg['To'] = ", ".join(to_emails)
         msg['Subject'] = f"Alocação dos Acolhedores - {datetime.date.today().strftime("%d/%m/%Y")}"
 
-        body = "Segue em anexo a alocação dos acolhedores nos dias de congresso.\n Atenção para não alocar acolhedores no vermelho\n\nAtenciosamente, Ministerio ELO"
-        msg.attach(MIMEText(body, 'plain'))
-
-        with open(attachment_path, 'rb') as fp:
-            img = MIMEImage(fp.read())
-        img.add_header('Content-Disposition', 'attachment', filename=os.path.basename(attachment_path))
-        msg.attach(img)
-
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(from_email, password)
-        text = msg.as_string()
-        server.sendmail(from_email, to_emails, text)
-        server.quit()
-        print("E-mail enviado com sucesso!")
+        if formato == "imagem":
+            body = "Segue em anexo a alocação dos acolhedores nos dias de congresso.\n Atenção para não alocar acolhedores no vermelho\n\nAtenciosamente, Ministerio ELO"
+            msg.attach(MIMEText(body, 'plain'))
+
+            with open(attachment_path, 'rb') as fp:
+                img = MIMEImage(fp.read())
+            img.add_header('Content-Disposition', 'attachment', filename=os.path.basename(attachment_path))
+            msg.attach(img)
+        else:
+            html_body, text_body = renderizar_alocacao(
+                (nome, pendentes, get_color(pendentes)) for nome, pendentes in df.values.tolist()
+            )
+            corpo = MIMEMultipart("alternative")
+            corpo.attach(MIMEText(text_body, 'plain'))
+            corpo.attach(MIMEText(html_body, 'html'))
+            msg.attach(corpo)
+
+        if anexar_csv:
+            if df is None:
+                df = getCountPendingAllocations(start_date, end_date)
+            anexo_csv = MIMEText(_linhas_csv(df), 'csv', 'utf-8')
+            anexo_csv.add_header(
+                'Content-Disposition', 'attachment',
+                filename=f"alocacao_{start_date}_{end_date}.csv",
+            )
+            msg.attach(anexo_csv)
+
+        # O envio fica com o drenador da outbox; aqui a mensagem só é gravada na fila.
+        conn = obter_conexao()
+        with conn:
+            enfileirar(conn, "alocacao", to_emails, msg, from_email)
+        print("E-mail colocado na fila de envio com sucesso!")
     except Exception as e:
         print(f"Erro ao enviar o e-mail: {e}")
-    finally:
-        if attachment_path and os.path.exists(attachment_path):
-            os.remove(attachment_path)
-            print(f"Arquivo temporário removido: {attachment_path}")
 
 '''
 if __name__ == "__main__":
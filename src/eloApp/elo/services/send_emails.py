@@ -1,86 +1,80 @@
-import smtplib
-import sqlite3
-import pandas as pd
+from itertools import groupby
+from operator import itemgetter
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import make_msgid
 from dotenv import load_dotenv
 import os
+from ..database.connection import obter_conexao
+from .outbox import drenar_outbox, enfileirar
+from .templates_email import renderizar_notificacao
 
 load_dotenv()
 
+
 def enviar_notificacoes_personalizadas():
+    """Coloca na outbox um e-mail por acolhedor com visitantes pendentes. Retorna quantos foram enfileirados."""
     pasta_base = os.getenv('PASTA_BASE')
     if not pasta_base:
         print("Erro: Variável de ambiente PASTA_BASE não está configurada.")
-        return
-    caminho_banco = os.path.join(pasta_base, 'igreja_dados.db')
-    conn = sqlite3.connect(caminho_banco)
-    cursor = conn.cursor()
+        return 0
+    conn = obter_conexao()
 
-    # Encontra acolhedores que têm visitantes pendentes
+    # Uma única consulta (pelo índice parcial de pendentes) traz todos os visitantes
+    # pendentes, já ordenados por acolhedor para serem agrupados em memória.
     query = """
-    SELECT DISTINCT a.id_acolhedor, ac.acolhedor_nome, ac.acolhedor_email
+    SELECT a.id_acolhedor, ac.acolhedor_nome, ac.acolhedor_email,
+           a.id, a.nome, a.idade, a.numero, a.data_decisao
     FROM acolhimento a
     JOIN acolhedores ac ON a.id_acolhedor = ac.id_acolhedor
     WHERE a.status_contato = 'Pendente'
+    ORDER BY a.id_acolhedor, a.data_decisao, a.nome
     """
-    acolhedores_a_notificar = pd.read_sql_query(query, conn)
+    pendentes = conn.execute(query).fetchall()
 
-    if acolhedores_a_notificar.empty:
+    if not pendentes:
         print("Nenhum acolhedor com visitantes pendentes.")
-        conn.close()
-        return
+        return 0
 
     remetente = os.getenv("EMAIL_USER")
-    senha = os.getenv("EMAIL_PASS")
-
-    for _, acolhedor in acolhedores_a_notificar.iterrows():
-        id_acolhedor = acolhedor['id_acolhedor']
-        nome_acolhedor = acolhedor['acolhedor_nome']
-        email_acolhedor = acolhedor['acolhedor_email']
+    envios = []
 
-        # Pega a lista de visitantes para este acolhedor específico
-        df_visitantes = pd.read_sql_query(
-            f"SELECT nome, idade, numero, decisao FROM acolhimento WHERE id_acolhedor = {id_acolhedor} AND status_contato = 'Pendente'",
-            conn
-        )
-
-        if df_visitantes.empty:
-            continue
+    for (id_acolhedor, nome_acolhedor, email_acolhedor), linhas in groupby(pendentes, key=itemgetter(0, 1, 2)):
+        linhas = list(linhas)
+        # Templates pré-compilados (templates_email.py): texto simples e HTML a partir das tuplas.
+        html_body, text_body = renderizar_notificacao(nome_acolhedor, (linha[4:] for linha in linhas))
 
         # Monta e-mail personalizado
         message = MIMEMultipart("alternative")
         message["Subject"] = "Você tem novos visitantes para acolher!"
         message["From"] = remetente
         message["To"] = email_acolhedor
-
-        html_body = f"""
-        <html><body>
-            <p>Olá {nome_acolhedor},</p>
-            <p>Estes são os novos visitantes atribuídos a você para contato:</p>
-            {df_visitantes.to_html(index=False, justify='left')}
-            <p>Por favor, responda a este e-mail informando o resultado do contato.</p>
-        </body></html>
-        """
+        # Gerado uma única vez e gravado junto com a mensagem, o Message-ID se mantém nas novas
+        # tentativas de envio e volta nas respostas (In-Reply-To/References).
+        message["Message-ID"] = make_msgid(domain=(remetente or "").rpartition("@")[2] or None)
+        message.attach(MIMEText(text_body, "plain"))
         message.attach(MIMEText(html_body, "html"))
+        envios.append((id_acolhedor, nome_acolhedor, email_acolhedor, [linha[3] for linha in linhas], message))
+
+    # A mudança para 'Notificado' e as mensagens a enviar são gravadas na mesma transação;
+    # o envio em si fica com o drenador da outbox (elo/services/outbox.py).
+    with conn:
+        for id_acolhedor, _, email_acolhedor, ids_visitantes, message in envios:
+            id_outbox = enfileirar(conn, "notificacao", email_acolhedor, message, remetente, ids_visitantes)
+            conn.execute(
+                "INSERT INTO notificacoes (message_id, id_outbox, id_acolhedor) VALUES (?, ?, ?)",
+                (message["Message-ID"], id_outbox, id_acolhedor),
+            )
+        conn.executemany(
+            "UPDATE acolhimento SET status_contato = 'Notificado' WHERE id = ?",
+            ((id_,) for _, _, _, ids_visitantes, _ in envios for id_ in ids_visitantes),
+        )
 
-        try:
-            # Envia o email
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-                server.login(remetente, senha)
-                server.sendmail(remetente, email_acolhedor, message.as_string())
-
-            print(f"E-mail enviado com sucesso para {nome_acolhedor} ({email_acolhedor}).")
-
-            # Atualiza o status para 'Notificado' para evitar reenvio
-            ids_para_atualizar = pd.read_sql_query(f"SELECT id FROM acolhimento WHERE id_acolhedor = {id_acolhedor} AND status_contato = 'Pendente'", conn)['id'].tolist()
-            cursor.execute(f"UPDATE acolhimento SET status_contato = 'Notificado' WHERE id IN ({','.join('?' for _ in ids_para_atualizar)})", ids_para_atualizar)
-            conn.commit()
-
-        except Exception as e:
-            print(f"Falha ao enviar e-mail para {nome_acolhedor}: {e}")
-
-    conn.close()
+    for _, nome_acolhedor, email_acolhedor, ids_visitantes, _ in envios:
+        print(f"E-mail para {nome_acolhedor} ({email_acolhedor}) colocado na fila de envio ({len(ids_visitantes)} visitante(s)).")
+    print(f"{len(envios)} e-mail(s) na fila; os visitantes foram marcados como 'Notificado'.")
+    return len(envios)
 
 if __name__ == '__main__':
-    enviar_notificacoes_personalizadas()
\ No newline at end of file
+    enviar_notificacoes_personalizadas()
+    drenar_outbox()
@@ -0,0 +1,237 @@
+import email
+import imaplib
+import os
+import re
+import sqlite3
+from dotenv import load_dotenv
+from ..database.connection import obter_conexao
+
+load_dotenv()
+
+# Configuração padrão para o Gmail; IMAP_SEGURANCA aceita "ssl" (porta 993) ou "nenhuma".
+IMAP_SERVIDOR = os.getenv("IMAP_SERVIDOR", "imap.gmail.com")
+IMAP_PORTA = int(os.getenv("IMAP_PORTA", "993"))
+IMAP_SEGURANCA = os.getenv("IMAP_SEGURANCA", "ssl")
+IMAP_PASTA = os.getenv("IMAP_PASTA", "INBOX")
+# Mensagens buscadas por UID FETCH e tentativas antes de desistir de uma mensagem com falha.
+IMAP_LOTE = int(os.getenv("IMAP_LOTE", "50"))
+IMAP_MAX_TENTATIVAS = int(os.getenv("IMAP_MAX_TENTATIVAS", "3"))
+
+_RE_UID = re.compile(rb"UID (\d+)")
+
+
+def conectar_imap(usuario=None, senha=None, servidor=None, porta=None, seguranca=None) -> imaplib.IMAP4:
+    """Abre e autentica uma conexão IMAP conforme a configuração (variáveis IMAP_* e EMAIL_USER/EMAIL_PASS)."""
+    servidor = servidor or IMAP_SERVIDOR
+    porta = porta or IMAP_PORTA
+    seguranca = seguranca or IMAP_SEGURANCA
+    usuario = usuario if usuario is not None else os.getenv("EMAIL_USER")
+    senha = senha if senha is not None else os.getenv("EMAIL_PASS")
+
+    if seguranca == "ssl":
+        mail = imaplib.IMAP4_SSL(servidor, porta)
+    else:
+        mail = imaplib.IMAP4(servidor, porta)
+    mail.login(usuario, senha)
+    return mail
+
+
+def conjunto_uids(uids) -> str:
+    """Compacta UIDs no formato de conjunto do IMAP (ex: [1, 2, 3, 7] -> "1:3,7")."""
+    faixas = []
+    for uid in sorted(set(uids)):
+        if faixas and uid == faixas[-1][1] + 1:
+            faixas[-1][1] = uid
+        else:
+            faixas.append([uid, uid])
+    return ",".join(str(inicio) if inicio == fim else f"{inicio}:{fim}" for inicio, fim in faixas)
+
+
+def _uids_da_busca(dados) -> list:
+    return [int(uid) for uid in (dados[0] or b"").split()]
+
+
+class SessaoIMAP:
+    """
+    Sincronização incremental de uma pasta IMAP por UID, para um `consumidor` (ex: "acompanhamento_json").
+
+    O banco guarda, por consumidor, o UIDVALIDITY da pasta e o último UID já entregue; cada
+    execução busca só os UIDs acima dele (e os que falharam antes), em lotes de UID FETCH
+    com BODY.PEEK[], que não marca nada como lido. Uso:
+
+        with SessaoIMAP("acompanhamento_json") as sessao:
+            for uid, msg in sessao.mensagens():
+                ...  # processa
+                sessao.marcar_processada(uid)  # ou sessao.marcar_falha(uid, erro)
+            ...  # grava o resultado (arquivo, banco)
+            sessao.confirmar()
+
+    Só confirmar() avança a marca d'água e marca as mensagens processadas como lidas; se o
+    processo cair antes, a próxima execução entrega as mesmas mensagens de novo.
+    """
+
+    def __init__(self, consumidor: str, pasta: str = IMAP_PASTA, tamanho_lote: int = IMAP_LOTE,
+                 fabrica=conectar_imap, conta=None, conn: sqlite3.Connection = None):
+        self.consumidor = consumidor
+        self.pasta = pasta
+        self.tamanho_lote = tamanho_lote
+        self.fabrica = fabrica
+        self.conta = conta or os.getenv("EMAIL_USER") or ""
+        self.conn = conn
+        self.mail = None
+        self.uidvalidity = None
+        self._ultimo_uid = 0
+        self._reiniciada = False
+        self._novos = []
+        self._repetir = []
+        self._entregues = set()
+        self._processadas = set()
+        self._falhas = {}
+
+    def __enter__(self):
+        self.conn = self.conn or obter_conexao()
+        self.mail = self.fabrica()
+        tipo, _ = self.mail.select(self.pasta)
+        if tipo != "OK":
+            raise imaplib.IMAP4.error(f"Não foi possível selecionar a pasta '{self.pasta}'.")
+        self.uidvalidity = int(self._codigo_resposta("UIDVALIDITY"))
+        self._preparar()
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.mail.logout()
+        except (imaplib.IMAP4.error, OSError):
+            pass
+
+    def _codigo_resposta(self, codigo: str):
+        valor = self.mail.response(codigo)[1][0]
+        if valor is None:
+            raise imaplib.IMAP4.error(f"O servidor não informou {codigo} para a pasta '{self.pasta}'.")
+        return valor
+
+    def _chave(self) -> tuple:
+        return (self.consumidor, self.conta, self.pasta)
+
+    def _preparar(self):
+        """Define quais UIDs são novos e quais falhas anteriores devem ser tentadas de novo."""
+        estado = self.conn.execute(
+            "SELECT uidvalidity, ultimo_uid FROM imap_estado WHERE consumidor = ? AND conta = ? AND pasta = ?",
+            self._chave(),
+        ).fetchone()
+
+        if estado is None or estado[0] != self.uidvalidity:
+            # Primeira sincronização (ou a pasta foi recriada e os UIDs antigos não valem mais):
+            # parte das mensagens não lidas, como o fluxo fazia antes, e da posição atual da pasta.
+            if estado is not None:
+                print(f"AVISO: UIDVALIDITY da pasta '{self.pasta}' mudou; a sincronização recomeça pelas não lidas.")
+            self._reiniciada = True
+            _, dados = self.mail.uid("SEARCH", None, "UNSEEN")
+            self._novos = _uids_da_busca(dados)
+            try:
+                self._ultimo_uid = int(self._codigo_resposta("UIDNEXT")) - 1
+            except imaplib.IMAP4.error:
+                _, dados = self.mail.uid("SEARCH", None, "ALL")
+                self._ultimo_uid = max(_uids_da_busca(dados), default=0)
+            self._ultimo_uid = max([self._ultimo_uid, *self._novos])
+            return
+
+        anterior = estado[1]
+        # "n:*" sempre inclui a última mensagem da pasta, mesmo que o UID dela seja menor que n.
+        _, dados = self.mail.uid("SEARCH", "UID", f"{anterior + 1}:*")
+        self._novos = [uid for uid in _uids_da_busca(dados) if uid > anterior]
+        self._ultimo_uid = max([anterior, *self._novos])
+        self._repetir = [
+            uid
+            for (uid,) in self.conn.execute(
+                """
+                SELECT uid FROM imap_falhas
+                WHERE consumidor = ? AND conta = ? AND pasta = ? AND tentativas < ?
+                ORDER BY uid
+                """,
+                (*self._chave(), IMAP_MAX_TENTATIVAS),
+            )
+        ]
+
+    def pendentes(self) -> int:
+        """Quantidade de mensagens a entregar nesta sessão (novas + novas tentativas)."""
+        return len(set(self._novos) | set(self._repetir))
+
+    def mensagens(self):
+        """Gera (uid, email.message.Message) das mensagens a processar, buscadas em lotes por UID FETCH."""
+        uids = sorted(set(self._novos) | set(self._repetir))
+        for inicio in range(0, len(uids), self.tamanho_lote):
+            lote = uids[inicio : inicio + self.tamanho_lote]
+            tipo, dados = self.mail.uid("FETCH", conjunto_uids(lote), "(BODY.PEEK[])")
+            if tipo != "OK":
+                raise imaplib.IMAP4.error(f"Falha no UID FETCH do lote {conjunto_uids(lote)}.")
+            for item in dados:
+                if not isinstance(item, tuple):
+                    continue
+                encontrado = _RE_UID.search(item[0])
+                if not encontrado:
+                    continue
+                uid = int(encontrado.group(1))
+                self._entregues.add(uid)
+                yield uid, email.message_from_bytes(item[1])
+
+    def marcar_processada(self, uid: int):
+        self._falhas.pop(uid, None)
+        self._processadas.add(uid)
+
+    def marcar_falha(self, uid: int, erro):
+        self._processadas.discard(uid)
+        self._falhas[uid] = str(erro)[:255]
+
+    def confirmar(self):
+        """
+        Grava o novo estado (marca d'água, falhas a repetir) e marca como lidas as mensagens
+        processadas. Mensagens entregues e não marcadas (ex: remetente desconhecido) são apenas
+        ultrapassadas pela marca d'água, sem alterar as flags.
+        """
+        # Falhas antigas que não falharam de novo (resolvidas, ignoradas ou que sumiram da pasta)
+        # saem da lista de repetição.
+        resolvidas = set(self._repetir) - set(self._falhas)
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO imap_estado (consumidor, conta, pasta, uidvalidity, ultimo_uid, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(consumidor, conta, pasta) DO UPDATE SET
+                    uidvalidity = excluded.uidvalidity,
+                    ultimo_uid = excluded.ultimo_uid,
+                    atualizado_em = excluded.atualizado_em
+                """,
+                (*self._chave(), self.uidvalidity, self._ultimo_uid),
+            )
+            if self._reiniciada:
+                self.conn.execute(
+                    "DELETE FROM imap_falhas WHERE consumidor = ? AND conta = ? AND pasta = ?", self._chave()
+                )
+            self.conn.executemany(
+                "DELETE FROM imap_falhas WHERE consumidor = ? AND conta = ? AND pasta = ? AND uid = ?",
+                ((*self._chave(), uid) for uid in resolvidas),
+            )
+            self.conn.executemany(
+                """
+                INSERT INTO imap_falhas (consumidor, conta, pasta, uid, ultimo_erro)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(consumidor, conta, pasta, uid) DO UPDATE SET
+                    tentativas = tentativas + 1,
+                    ultimo_erro = excluded.ultimo_erro,
+                    atualizado_em = CURRENT_TIMESTAMP
+                """,
+                ((*self._chave(), uid, erro) for uid, erro in self._falhas.items()),
+            )
+
+        if self._processadas:
+            try:
+                self.mail.uid("STORE", conjunto_uids(self._processadas), "+FLAGS", "(\\Seen)")
+            except (imaplib.IMAP4.error, OSError) as erro:
+                print(f"AVISO: Não foi possível marcar as mensagens como lidas: {erro}")
+
+        print(
+            f"LOG: IMAP ({self.consumidor}): {len(self._entregues)} mensagem(ns) lida(s), "
+            f"{len(self._processadas)} processada(s), {len(self._falhas)} com falha; "
+            f"último UID sincronizado: {self._ultimo_uid}."
+        )
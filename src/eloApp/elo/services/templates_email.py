@@ -0,0 +1,143 @@
+from html import escape
+from string import Template
+
+# Colunas da tabela de visitantes, na ordem das tuplas recebidas pelos renderizadores.
+COLUNAS_VISITANTES = ("nome", "idade", "numero", "data_decisao")
+
+# Templates compilados uma única vez, no import do módulo. Os valores dinâmicos são
+# inseridos por substitute(); as partes fixas (cabeçalho da tabela) são montadas aqui.
+_HTML_NOTIFICACAO = Template(
+    """<html><body>
+    <p>Olá $nome_acolhedor,</p>
+    <p>Estes são os novos visitantes atribuídos a você para contato:</p>
+    $tabela
+    <p>Por favor, responda a este e-mail informando o resultado do contato.</p>
+</body></html>
+"""
+)
+
+_TEXTO_NOTIFICACAO = Template(
+    """Olá $nome_acolhedor,
+
+Estes são os novos visitantes atribuídos a você para contato:
+
+$tabela
+
+Por favor, responda a este e-mail informando o resultado do contato.
+"""
+)
+
+_CABECALHO_TABELA_HTML = (
+    '<table border="1" cellpadding="4" style="border-collapse: collapse;">'
+    '<thead><tr style="text-align: left;">'
+    + "".join(f"<th>{coluna}</th>" for coluna in COLUNAS_VISITANTES)
+    + "</tr></thead><tbody>"
+)
+_LINHA_HTML = "<tr>" + "<td>{}</td>" * len(COLUNAS_VISITANTES) + "</tr>"
+_LINHA_TEXTO = "- " + " | ".join(f"{coluna}: {{}}" for coluna in COLUNAS_VISITANTES)
+
+
+def _valor(valor) -> str:
+    return "" if valor is None else str(valor)
+
+
+def tabela_visitantes_html(linhas) -> str:
+    """Renderiza as tuplas (nome, idade, numero, data_decisao) como uma tabela HTML."""
+    corpo = "".join(_LINHA_HTML.format(*(escape(_valor(v)) for v in linha)) for linha in linhas)
+    return f"{_CABECALHO_TABELA_HTML}{corpo}</tbody></table>"
+
+
+def tabela_visitantes_texto(linhas) -> str:
+    """Renderiza as tuplas (nome, idade, numero, data_decisao) como uma lista em texto simples."""
+    return "\n".join(_LINHA_TEXTO.format(*(_valor(v) for v in linha)) for linha in linhas)
+
+
+def renderizar_notificacao(nome_acolhedor: str, linhas) -> tuple:
+    """Retorna (html, texto) do e-mail de novos visitantes para o acolhedor."""
+    linhas = list(linhas)
+    html = _HTML_NOTIFICACAO.substitute(
+        nome_acolhedor=escape(_valor(nome_acolhedor)), tabela=tabela_visitantes_html(linhas)
+    )
+    texto = _TEXTO_NOTIFICACAO.substitute(nome_acolhedor=_valor(nome_acolhedor), tabela=tabela_visitantes_texto(linhas))
+    return html, texto
+
+
+# Relatório de alocação: mesma formatação condicional da imagem (verde/amarelo/vermelho).
+COLUNAS_ALOCACAO = ("acolhedor_nome", "acolhimentos_pendentes")
+
+_HTML_ALOCACAO = Template(
+    """<html><body>
+    <p>Segue a alocação dos acolhedores nos dias de congresso.<br>
+    Atenção para não alocar acolhedores no vermelho.</p>
+    $tabela
+    <p>Atenciosamente, Ministerio ELO</p>
+</body></html>
+"""
+)
+
+_TEXTO_ALOCACAO = Template(
+    """Segue a alocação dos acolhedores nos dias de congresso.
+Atenção para não alocar acolhedores no vermelho.
+
+$tabela
+
+Atenciosamente, Ministerio ELO
+"""
+)
+
+_CABECALHO_ALOCACAO_HTML = (
+    '<table border="1" cellpadding="4" style="border-collapse: collapse; text-align: center;">'
+    "<thead><tr>" + "".join(f"<th>{coluna}</th>" for coluna in COLUNAS_ALOCACAO) + "</tr></thead><tbody>"
+)
+_LINHA_ALOCACAO_HTML = '<tr><td>{}</td><td style="background-color: {};">{}</td></tr>'
+_NOMES_CORES = {"green": "verde", "yellow": "amarelo", "red": "vermelho"}
+
+
+def renderizar_alocacao(linhas) -> tuple:
+    """
+    Retorna (html, texto) do relatório de alocação a partir de tuplas
+    (acolhedor_nome, acolhimentos_pendentes, cor), onde cor é um nome de cor CSS.
+    """
+    linhas = list(linhas)
+    corpo = "".join(
+        _LINHA_ALOCACAO_HTML.format(escape(_valor(nome)), escape(cor), escape(_valor(pendentes)))
+        for nome, pendentes, cor in linhas
+    )
+    tabela_texto = "\n".join(
+        f"- {_valor(nome)}: {_valor(pendentes)} ({_NOMES_CORES.get(cor, cor)})" for nome, pendentes, cor in linhas
+    )
+    html = _HTML_ALOCACAO.substitute(tabela=f"{_CABECALHO_ALOCACAO_HTML}{corpo}</tbody></table>")
+    return html, _TEXTO_ALOCACAO.substitute(tabela=tabela_texto)
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: python -m eloApp.elo.services.templates_email
+    import random
+    import timeit
+    import pandas as pd
+
+    def _renderizar_com_pandas(nome_acolhedor, linhas):
+        df_visitantes = pd.DataFrame(linhas, columns=list(COLUNAS_VISITANTES))
+        return f"""
+        <html><body>
+            <p>Olá {nome_acolhedor},</p>
+            <p>Estes são os novos visitantes atribuídos a você para contato:</p>
+            {df_visitantes.to_html(index=False, justify='left')}
+            <p>Por favor, responda a este e-mail informando o resultado do contato.</p>
+        </body></html>
+        """
+
+    mensagens = [
+        (
+            f"Acolhedor {i}",
+            [
+                (f"Visitante {i}-{j}", random.randint(12, 60), f"2199999{j:04d}", "15/06/2025")
+                for j in range(random.randint(1, 8))
+            ],
+        )
+        for i in range(1000)
+    ]
+    antes = timeit.timeit(lambda: [_renderizar_com_pandas(n, l) for n, l in mensagens], number=3)
+    depois = timeit.timeit(lambda: [renderizar_notificacao(n, l) for n, l in mensagens], number=3)
+    print(f"DataFrame.to_html:       {antes * 1000 / 3:.1f} ms por 1.000 e-mails (só HTML)")
+    print(f"renderizar_notificacao:  {depois * 1000 / 3:.1f} ms por 1.000 e-mails (HTML + texto, {antes / depois:.0f}x)")
@@ -11,10 +11,11 @@ from googleapiclient.http import MediaFileUpload
 import os
 from dotenv import load_dotenv
 from .auth import autenticar
+from ..database.connection import checkpoint
 load_dotenv()
 
 # --- Configurações ---
-NOME_ARQUIVO_LOCAL = "igreja_dados.db"
+NOME_ARQUIVO_LOCAL = os.getenv("NOME_BANCO_DADOS", "igreja_dados.db")
 PASTA_BASE = os.getenv("PASTA_BASE")
 if not PASTA_BASE:
     print("Erro: Variável de ambiente PASTA_BASE não está configurada.")
@@ -30,6 +31,9 @@ def upload_arquivo_db():
         print(f"ERRO: Arquivo local '{CAMINHO_ARQUIVO_DB}' não encontrado.")
         return
 
+    # Com o banco em modo WAL, transações recentes podem estar apenas no arquivo -wal.
+    checkpoint()
+
     creds = autenticar()
 
     try:
@@ -0,0 +1,14 @@
+import pytest
+from eloApp.elo.database import connection
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Banco SQLite novo (com todas as migrações) em uma pasta temporária, usado como PASTA_BASE."""
+    monkeypatch.setenv("PASTA_BASE", str(tmp_path))
+    monkeypatch.setenv("NOME_BANCO_DADOS", "teste.db")
+    connection.fechar_conexoes()
+    connection.caminho_banco_dados.cache_clear()
+    yield connection.obter_conexao()
+    connection.fechar_conexoes()
+    connection.caminho_banco_dados.cache_clear()
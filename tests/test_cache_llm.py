@@ -0,0 +1,37 @@
+from eloApp.elo.services import cache_llm
+
+
+class ModeloFalso:
+    model_name = "modelo-falso"
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.chamadas = 0
+
+    def generate_content(self, prompt, **opcoes):
+        self.chamadas += 1
+        return type("Resposta", (), {"text": self.texto})()
+
+
+def test_configuracoes_diferentes_nao_compartilham_entrada(tmp_path):
+    cache = cache_llm.CacheLLM(str(tmp_path / "cache.db"))
+    texto_livre, json_esquema = ModeloFalso("texto"), ModeloFalso("[]")
+
+    assert cache_llm.gerar_com_cache(texto_livre, "prompt", "v1", cache=cache) == "texto"
+    assert cache_llm.gerar_com_cache(json_esquema, "prompt", "v1", cache=cache, configuracao='{"esquema": 1}') == "[]"
+    assert cache_llm.gerar_com_cache(json_esquema, "prompt", "v1", cache=cache, configuracao='{"esquema": 1}') == "[]"
+
+    assert (texto_livre.chamadas, json_esquema.chamadas) == (1, 1)
+
+
+def test_falha_do_cache_nao_impede_a_chamada(tmp_path, capsys):
+    # Um diretório no lugar do arquivo: o SQLite não consegue abrir o cache.
+    cache = cache_llm.CacheLLM(str(tmp_path))
+    modelo = ModeloFalso("resposta")
+
+    assert cache_llm.gerar_com_cache(modelo, "prompt", "v1", cache=cache) == "resposta"
+    assert cache_llm.gerar_com_cache(modelo, "prompt", "v1", cache=cache) == "resposta"
+
+    assert modelo.chamadas == 2
+    assert cache.faltas == 2
+    assert "AVISO: Resposta do Gemini não guardada no cache" in capsys.readouterr().out
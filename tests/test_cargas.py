@@ -0,0 +1,132 @@
+import json
+from eloApp.elo.database.load_acolhedores import carregar_acolhedores
+from eloApp.elo.database.load_database import carregar_base_de_dados
+from eloApp.elo.database.load_gps import carregar_gps
+
+
+def _gps(conn):
+    return [nome for (nome,) in conn.execute("SELECT nome_lider_gps FROM gps ORDER BY id_gps")]
+
+
+def _acolhedores(conn):
+    return conn.execute(
+        """
+        SELECT a.acolhedor_nome, a.acolhedor_apelido, a.acolhedor_email, g.nome_lider_gps
+        FROM acolhedores a LEFT JOIN gps g ON g.id_gps = a.id_gps
+        ORDER BY a.id_acolhedor
+        """
+    ).fetchall()
+
+
+def test_carga_de_gps(banco, tmp_path):
+    arquivo = tmp_path / "gps.csv"
+    arquivo.write_text('Outra,LÍDER_name\nx,Líder Um\nx,lider  um\nx,"  "\nx,!!!\nx,Líder Dois\n', encoding="utf-8")
+
+    logs = carregar_gps(str(arquivo))
+
+    assert logs == {"sucesso": 2, "falha": 0, "ja_existe": 1, "em_branco": 1, "nome_invalido": 1}
+    assert _gps(banco) == ["lider_um", "lider_dois"]
+
+    # Recarregar o mesmo arquivo não insere nada: os dois já existem e o repetido continua repetido.
+    logs = carregar_gps(str(arquivo))
+
+    assert logs == {"sucesso": 0, "falha": 0, "ja_existe": 3, "em_branco": 1, "nome_invalido": 1}
+    assert _gps(banco) == ["lider_um", "lider_dois"]
+
+
+def test_carga_de_acolhedores(banco, tmp_path, monkeypatch):
+    with banco:
+        banco.execute("INSERT INTO gps (nome_lider_gps) VALUES ('lider_um')")
+    arquivo = tmp_path / "acolhedores_carga.csv"
+    cabecalho = "Nome,Apelido,Email,GP\n"
+    arquivo.write_text(
+        cabecalho
+        + "Ana Souza,Aninha,ana@x.com,lider_um\n"
+        + "Pedro Lima,,pedro@x.com,Líder Um\n"
+        + "Rui Alves,,rui@x.com,lider_inexistente\n"
+        + ",,sem_nome@x.com,lider_um\n"
+        + "Ana Souza,Aninha,ana@x.com,lider_um\n",
+        encoding="utf-8",
+    )
+
+    logs = carregar_acolhedores(str(arquivo))
+
+    assert logs == {"sucesso": 2, "atualizado": 0, "ja_existe": 1, "erro_gps": 1, "erro_linha": 1, "ja_carregado": 0}
+    assert _acolhedores(banco) == [
+        ("ana_souza", "Aninha", "ana@x.com", "lider_um"),
+        ("pedro_lima", "", "pedro@x.com", "lider_um"),
+    ]
+
+    # O arquivo não mudou, mas a linha de GP desconhecido continua pendente: só ela é refeita.
+    logs = carregar_acolhedores(str(arquivo))
+
+    assert logs == {"sucesso": 0, "atualizado": 0, "ja_existe": 0, "erro_gps": 1, "erro_linha": 0, "ja_carregado": 4}
+
+    # Com --atualizar, só o acolhedor que mudou é contado como atualizado.
+    arquivo.write_text(
+        cabecalho + "Ana Souza,Aninha,ana@x.com,lider_um\n" + "Pedro Lima,Pedrinho,pedro@x.com,lider_um\n",
+        encoding="utf-8",
+    )
+    logs = carregar_acolhedores(str(arquivo), atualizar_existentes=True)
+
+    assert logs == {"sucesso": 0, "atualizado": 1, "ja_existe": 1, "erro_gps": 0, "erro_linha": 0, "ja_carregado": 0}
+    assert _acolhedores(banco)[1] == ("pedro_lima", "Pedrinho", "pedro@x.com", "lider_um")
+
+
+def test_carga_de_acolhimentos(banco, tmp_path, monkeypatch):
+    monkeypatch.setenv("PASTA_JSON", str(tmp_path))
+    with banco:
+        banco.execute(
+            "INSERT INTO acolhedores (acolhedor_nome, acolhedor_apelido, acolhedor_email) VALUES ('ana_souza', 'Aninha', 'ana@x.com')"
+        )
+        banco.execute("INSERT INTO acolhedores (acolhedor_nome, acolhedor_email) VALUES ('pedro_lima', 'pedro@x.com')")
+
+    def visitante(nome, acolhedor, celular="999", plano="Ligar"):
+        return {"nome": nome, "idade": "30", "celular": celular, "acolhedor": acolhedor, "HouM": "M",
+                "situacao": "Aceitou", "plano_de_acao": plano}
+
+    carga = {
+        "data": "14/06/2026",
+        "evento": "Culto",
+        "lista": [
+            visitante("Maria Alves", "Ana Souza"),
+            visitante("João Reis", "aninha"),
+            visitante("Carla Dias", "Pedro Lima", plano="Descartar"),
+            visitante("Bia Costa", "Pedro Limaa"),
+            visitante("Lia Melo", "Fulano de Tal"),
+            visitante("Maria Alves", "Ana Souza", celular="888"),
+        ],
+    }
+    (tmp_path / "EloCargaDados_140626.json").write_text(json.dumps(carga), encoding="utf-8")
+
+    logs = carregar_base_de_dados("140626")
+
+    assert logs == {"sucesso": 3, "descartado": 1, "erros_acolhedor": 1, "duplicado": 1, "resolvido_semelhanca": 1,
+                    "ja_carregado": 0}
+    linhas = banco.execute(
+        """
+        SELECT v.nome, v.nome_normalizado, v.numero, a.acolhedor_nome, v.status_contato
+        FROM acolhimento v JOIN acolhedores a ON a.id_acolhedor = v.id_acolhedor
+        ORDER BY v.id
+        """
+    ).fetchall()
+    assert linhas == [
+        ("Maria Alves", "maria_alves", "999", "ana_souza", "Pendente"),
+        ("João Reis", "joao_reis", "999", "ana_souza", "Pendente"),
+        ("Bia Costa", "bia_costa", "999", "pedro_lima", "Pendente"),
+    ]
+
+    # O registro de acolhedor desconhecido ficou pendente: só ele é refeito, e volta a falhar.
+    logs = carregar_base_de_dados("140626")
+
+    assert logs == {"sucesso": 0, "descartado": 0, "erros_acolhedor": 1, "duplicado": 0, "resolvido_semelhanca": 0,
+                    "ja_carregado": 5}
+
+    with banco:
+        banco.execute("INSERT INTO acolhedores (acolhedor_nome, acolhedor_email) VALUES ('fulano_de_tal', 'fulano@x.com')")
+    logs = carregar_base_de_dados("140626")
+
+    assert logs["sucesso"] == 1 and logs["ja_carregado"] == 5
+    assert banco.execute("SELECT COUNT(*) FROM acolhimento").fetchone() == (4,)
+    # Sem pendências, o arquivo inalterado é ignorado por inteiro.
+    assert carregar_base_de_dados("140626") is None
@@ -0,0 +1,54 @@
+import pytest
+from eloApp.elo.services.classificador_respostas import classificar_resposta
+
+
+@pytest.mark.parametrize(
+    "resposta",
+    [
+        "Ana disse que não está interessada",
+        "Ana nunca teve interesse",
+        "Pedro não ficou interessado",
+        "Ana não estava interessada",
+        "Pedro: sem interesse por enquanto",
+    ],
+)
+def test_interesse_negado_vai_para_o_gemini(resposta):
+    assert classificar_resposta(resposta, ["Ana Souza", "Pedro Lima"]) is None
+
+
+@pytest.mark.parametrize(
+    "resposta",
+    [
+        "Ana já tem igreja? não sei",
+        "Pedro: numero ta errado não",
+        "Pedro não tem número incorreto",
+        "Acho que a Ana já tem igreja",
+        "Pedro talvez não atendeu",
+        "Ana não atendeu?",
+        "Pedro quer voltar? vou confirmar",
+    ],
+)
+def test_status_negado_perguntado_ou_incerto_vai_para_o_gemini(resposta):
+    assert classificar_resposta(resposta, ["Ana Souza", "Pedro Lima"]) is None
+
+
+def test_status_sem_negacao_e_resolvido_localmente():
+    atualizacoes = classificar_resposta(
+        "Ana tem interesse\nPedro - não atendeu\nJoão: número não existe\nMaria já frequenta uma igreja",
+        ["Ana Souza", "Pedro Lima", "João Reis", "Maria Alves"],
+    )
+    assert {a["nome_visitante"]: a["status_resposta"] for a in atualizacoes} == {
+        "Ana Souza": "Atendeu e tem interesse",
+        "Pedro Lima": "Não atendeu",
+        "João Reis": "Número incorreto",
+        "Maria Alves": "Atendeu e já tem igreja",
+    }
+
+
+def test_unico_visitante_recebe_status_sem_nome():
+    atualizacoes = classificar_resposta("Ela ainda não atendeu\nAbraços\nCarla", ["Ana Souza"], ignorar=["Carla"])
+    assert [(a["nome_visitante"], a["status_resposta"]) for a in atualizacoes] == [("Ana Souza", "Não atendeu")]
+
+
+def test_unico_visitante_nao_recebe_status_de_outro_nome():
+    assert classificar_resposta("Joana não atendeu", ["Ana Souza"]) is None
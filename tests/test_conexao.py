@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from eloApp.elo.database import connection
+
+# Processo que se registra como trabalhador e espera uma linha na entrada para terminar.
+_TRABALHADOR = """
+import sys
+from eloApp.elo.database.connection import trabalhador_do_banco
+with trabalhador_do_banco("outbox"):
+    print("pronto", flush=True)
+    sys.stdin.readline()
+"""
+
+
+def test_trabalhadores_ativos_enxerga_outro_processo(banco):
+    raiz_src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    processo = subprocess.Popen(
+        [sys.executable, "-c", _TRABALHADOR],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        env={**os.environ, "PYTHONPATH": raiz_src},
+    )
+    try:
+        assert processo.stdout.readline().strip() == "pronto"
+        assert connection.trabalhadores_ativos() == [f"outbox (pid {processo.pid})"]
+    finally:
+        processo.communicate("\n", timeout=10)
+
+    assert connection.trabalhadores_ativos() == []
+
+
+def test_registro_abandonado_e_removido(banco):
+    # Arquivo deixado por um processo que morreu sem limpar (a trava já foi solta pelo sistema).
+    abandonado = f"{connection.caminho_banco_dados()}.outbox.999999.lock"
+    open(abandonado, "w").close()
+
+    assert connection.trabalhadores_ativos() == []
+    assert not os.path.exists(abandonado)
+
+
+def test_primeira_conexao_somente_leitura_aplica_migracoes(tmp_path, monkeypatch):
+    monkeypatch.setenv("PASTA_BASE", str(tmp_path))
+    monkeypatch.setenv("NOME_BANCO_DADOS", "novo.db")
+    connection.fechar_conexoes()
+    connection.caminho_banco_dados.cache_clear()
+    try:
+        leitura = connection.obter_conexao(somente_leitura=True)
+        # Coluna criada por uma migração, consultada pelo relatório de alocação.
+        assert leitura.execute("SELECT COUNT(*) FROM acolhimento WHERE data_decisao_iso >= '2026-01-01'").fetchone() == (0,)
+    finally:
+        connection.fechar_conexoes()
+        connection.caminho_banco_dados.cache_clear()
@@ -0,0 +1,88 @@
+import json
+import re
+import threading
+import time
+import pytest
+from eloApp.elo.services import cache_llm, extracao_respostas, llm
+
+
+class ModeloFalso:
+    """Imita o Gemini: ecoa o número do e-mail, com latência maior para os primeiros (ordem de término invertida)."""
+
+    model_name = "modelo-falso"
+
+    def __init__(self):
+        self.chamadas = 0
+        self.simultaneas = 0
+        self.maximo_simultaneas = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, request_options=None):
+        numero = int(re.search(r"E-mail (\d+)", prompt).group(1))
+        with self._lock:
+            self.chamadas += 1
+            self.simultaneas += 1
+            self.maximo_simultaneas = max(self.maximo_simultaneas, self.simultaneas)
+        try:
+            time.sleep(0.01 * (10 - numero % 10))
+            if "quebrado" in prompt:
+                texto = "isto não é JSON"
+            elif "fora do ar" in prompt:
+                raise RuntimeError("Falha inesperada")
+            else:
+                texto = json.dumps([{"nome_visitante": f"Visitante {numero}", "status_resposta": "Não atendeu"}])
+        finally:
+            with self._lock:
+                self.simultaneas -= 1
+        return type("Resposta", (), {"text": texto})()
+
+
+@pytest.fixture(autouse=True)
+def cache_temporario(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_llm, "_cache_padrao", cache_llm.CacheLLM(str(tmp_path / "cache.db")))
+    monkeypatch.setattr(llm, "LLM_ESPERA_SEGUNDOS", 0)
+
+
+def test_resultados_na_ordem_dos_emails():
+    modelo = ModeloFalso()
+    corpos = [f"E-mail {i}: Visitante {i} não atendeu" for i in range(20)]
+
+    resultados = extracao_respostas.extrair_em_paralelo(modelo, corpos, concorrencia=4)
+
+    assert [updates[0]["nome_visitante"] for updates, _ in resultados] == [f"Visitante {i}" for i in range(20)]
+    assert all(erro is None for _, erro in resultados)
+    assert 1 < modelo.maximo_simultaneas <= 4
+
+
+def test_falha_de_um_email_nao_afeta_os_outros():
+    modelo = ModeloFalso()
+    corpos = ["E-mail 1: ok", "E-mail 2: quebrado", "E-mail 3: fora do ar", "E-mail 4: ok"]
+
+    resultados = extracao_respostas.extrair_em_paralelo(modelo, corpos, concorrencia=4)
+
+    (ok1, erro1), (_, invalido), (_, inesperado), (ok4, erro4) = resultados
+    assert erro1 is None and ok1[0]["nome_visitante"] == "Visitante 1"
+    assert erro4 is None and ok4[0]["nome_visitante"] == "Visitante 4"
+    # JSON inválido é tentado de novo até o limite; um erro que não é transitório não.
+    assert isinstance(invalido, extracao_respostas.RespostaInvalida)
+    assert isinstance(inesperado, RuntimeError)
+    assert modelo.chamadas == 2 + llm.LLM_TENTATIVAS + 1
+
+
+def test_respostas_validas_vem_do_cache_na_segunda_vez():
+    modelo = ModeloFalso()
+    corpos = ["E-mail 1: ok", "E-mail 2: quebrado"]
+
+    extracao_respostas.extrair_em_paralelo(modelo, corpos)
+    chamadas = modelo.chamadas
+    resultados = extracao_respostas.extrair_em_paralelo(modelo, corpos)
+
+    # Só a resposta inválida (que não foi guardada) gera novas chamadas.
+    assert modelo.chamadas == chamadas + llm.LLM_TENTATIVAS
+    assert resultados[0][0][0]["nome_visitante"] == "Visitante 1"
+
+
+def test_prompt_com_visitantes_da_notificacao():
+    prompt = extracao_respostas.montar_prompt("Maria não atendeu", ["Maria Silva", "Maria Souza"])
+    assert "Maria Silva; Maria Souza" in prompt
+    assert "Maria não atendeu" in prompt
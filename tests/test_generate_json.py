@@ -0,0 +1,92 @@
+import json
+import re
+import pytest
+from eloApp.elo.services import cache_llm, generate_json, llm
+from eloApp.elo.services.leitura_lista import dividir_lista
+
+CABECALHO = "Data: 14/06/2026\nEvento: conectados"
+
+
+def _lista(meninos: int, meninas: int, bloco="Nome: {nome}\nIdade: 20\nNumero: 1199\nAcolhedor: Ana") -> str:
+    partes = [CABECALHO, "*Meninos*"] + [bloco.format(nome=f"H{i}") for i in range(meninos)]
+    partes += ["*Meninas*"] + [bloco.format(nome=f"M{i}") for i in range(meninas)]
+    return "\n\n".join(partes)
+
+
+class ModeloFalso:
+    """Devolve um registro por linha "Nome:" do trecho recebido, com o HouM da seção do trecho."""
+
+    model_name = "modelo-falso"
+
+    def __init__(self):
+        self.trechos = []
+
+    def generate_content(self, prompt, request_options=None):
+        trecho = prompt.split("---")[1].strip()
+        self.trechos.append(trecho)
+        houm = "H" if "*Meninos*" in trecho else "M"
+        lista = [{"nome": nome, "HouM": houm} for nome in re.findall(r"^Nome: (.*)$", trecho, re.M)]
+        texto = json.dumps({"data": "14/06/2026", "evento": "conectados", "lista": lista})
+        return type("Resposta", (), {"text": texto})()
+
+
+@pytest.fixture(autouse=True)
+def sem_cache(monkeypatch):
+    monkeypatch.setattr(cache_llm, "LLM_CACHE_ATIVO", False)
+    monkeypatch.setattr(llm, "LLM_ESPERA_SEGUNDOS", 0)
+
+
+def _nomes(trecho: str) -> list:
+    return re.findall(r"^Nome: (.*)$", trecho, re.M)
+
+
+def test_trechos_cortados_entre_blocos_sem_perder_nem_repetir():
+    texto = _lista(meninos=5, meninas=3)
+
+    trechos = generate_json.dividir_em_lotes(texto, blocos_por_lote=2)
+
+    # Cada seção é dividida separadamente: 5 meninos em 2+2+1, 3 meninas em 2+1.
+    assert [len(_nomes(trecho)) for trecho in trechos] == [2, 2, 1, 2, 1]
+    assert [nome for trecho in trechos for nome in _nomes(trecho)] == [f"H{i}" for i in range(5)] + [f"M{i}" for i in range(3)]
+    for trecho in trechos:
+        # Autocontido: cabeçalho, a linha da seção (para o HouM) e blocos completos a partir de um "Nome:".
+        assert trecho.startswith(CABECALHO + "\n\n*Meni")
+        assert trecho.split("\n\n")[2].startswith("Nome:")
+        assert trecho.count("Acolhedor: Ana") == len(_nomes(trecho))
+
+
+def test_montar_lotes_devolve_o_indice_do_primeiro_bloco():
+    cabecalho, blocos = dividir_lista(_lista(meninos=3, meninas=1))
+    indexados = [(i, secao, bloco) for i, (secao, bloco) in enumerate(blocos)]
+
+    lotes = generate_json.montar_lotes(cabecalho, indexados, blocos_por_lote=2)
+
+    assert [indice for indice, _ in lotes] == [0, 2, 3]
+
+
+def test_lista_fora_do_formato_e_juntada_na_ordem():
+    # Sem o cabeçalho "Evento:" reconhecido, a lista inteira vai para o Gemini em trechos paralelos.
+    texto = _lista(meninos=5, meninas=4).replace("Evento: conectados", "Evento: festa junina")
+    modelo = ModeloFalso()
+
+    dados = generate_json.estruturar_lotes(modelo, generate_json.dividir_em_lotes(texto, blocos_por_lote=2), concorrencia=4)
+
+    assert [r["nome"] for r in dados["lista"]] == [f"H{i}" for i in range(5)] + [f"M{i}" for i in range(4)]
+    assert [r["HouM"] for r in dados["lista"]] == ["H"] * 5 + ["M"] * 4
+    assert (dados["data"], dados["evento"]) == ("14/06/2026", "conectados")
+    assert len(modelo.trechos) == 5
+
+
+def test_so_os_blocos_mal_formados_vao_para_o_gemini():
+    texto = _lista(meninos=3, meninas=2).replace("Nome: H1\nIdade: 20", "Nome: H1\nIdade: vinte")
+    modelo = ModeloFalso()
+
+    dados = generate_json.estruturar_lista(modelo, texto)
+
+    assert [r["nome"] for r in dados["lista"]] == ["H0", "H1", "H2", "M0", "M1"]
+    assert [r["HouM"] for r in dados["lista"]] == ["H", "H", "H", "M", "M"]
+    # Um único trecho, só com o bloco que o leitor local não entendeu, na posição original.
+    assert len(modelo.trechos) == 1
+    assert _nomes(modelo.trechos[0]) == ["H1"]
+    assert "*Meninos*" in modelo.trechos[0]
+    assert dados["lista"][0]["plano_de_acao"] == "Carregar registro normalmente"
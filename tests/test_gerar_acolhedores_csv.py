@@ -0,0 +1,25 @@
+from eloApp.elo.database.indice_trigramas import IndiceTrigramas
+from eloApp.elo.services.gerar_acolhedores_csv import resolver_gp
+
+LIDERES = ["ana_de_souza", "rafael_ricardo", "joao_da_silva"]
+
+
+def _resolver(nome):
+    lideres_por_palavra = {}
+    for lider in LIDERES:
+        for palavra in lider.split("_"):
+            lideres_por_palavra.setdefault(palavra, set()).add(lider)
+    indice = IndiceTrigramas((lider, lider) for lider in LIDERES)
+    return resolver_gp(nome, set(LIDERES), lideres_por_palavra, indice)
+
+
+def test_nome_parcial_unico():
+    assert _resolver("Rafael") == "rafael_ricardo"
+    assert _resolver("João da Silva") == "joao_da_silva"
+    assert _resolver("Ana de Souza") == "ana_de_souza"
+
+
+def test_conectivos_e_palavras_curtas_nao_identificam_lider():
+    assert _resolver("de") is None
+    assert _resolver("da") is None
+    assert _resolver("Jo") is None
@@ -0,0 +1,68 @@
+import pytest
+from eloApp.elo.database.indice_trigramas import IndiceTrigramas, resolver_por_semelhanca, trigramas
+
+ACOLHEDORES = [
+    ("Ana Souza", 1),
+    ("Pedro Souza", 2),
+    ("Maria Oliveira", 3),
+    ("Mariana Oliveira", 4),
+    ("Daniela Costa", 5),
+    ("Dani", 5),  # apelido
+]
+
+
+@pytest.fixture
+def indice():
+    return IndiceTrigramas(ACOLHEDORES)
+
+
+def test_trigramas_com_bordas_do_texto_normalizado():
+    assert trigramas("Ána") == {"  a", " an", "ana", "na "}
+    assert trigramas("  ") == set()
+
+
+def test_similaridade_e_o_coeficiente_de_dice(indice):
+    # "ana" tem 4 trigramas, "ana_souza" 10, e 3 em comum: 2 * 3 / (4 + 10).
+    (valor, chave, similaridade), = indice.buscar("ana", limite=1)
+    assert (valor, chave) == (1, "ana_souza")
+    assert similaridade == pytest.approx(6 / 14)
+    assert indice.buscar("Ana Souza", limite=1)[0][2] == 1.0
+
+
+def test_valor_aparece_uma_vez_com_a_melhor_chave(indice):
+    assert indice.buscar("Dani") == [(5, "dani", 1.0)]
+
+
+def test_resolve_automaticamente_com_semelhanca_alta_e_sem_empate(indice):
+    id_acolhedor, candidatos = resolver_por_semelhanca(indice, "Ana Souzaa")
+    assert id_acolhedor == 1
+    assert candidatos[0][2] == pytest.approx(6 / 7)
+
+
+def test_semelhanca_abaixo_do_limite_so_sugere(indice):
+    # 0,7: parecido o bastante para sugerir, não para decidir sozinho.
+    id_acolhedor, candidatos = resolver_por_semelhanca(indice, "Ana Sousa")
+    assert id_acolhedor is None
+    assert [(valor, round(similaridade, 2)) for valor, _, similaridade in candidatos] == [(1, 0.7)]
+
+
+def test_mesmo_sobrenome_fica_ambiguo(indice):
+    # Só o sobrenome: os dois Souza são sugeridos, nenhum é escolhido.
+    id_acolhedor, candidatos = resolver_por_semelhanca(indice, "Souza")
+    assert id_acolhedor is None
+    assert [valor for valor, _, _ in candidatos] == [1, 2]
+
+
+def test_dois_candidatos_acima_do_limite_sem_margem_ficam_ambiguos(indice):
+    # 0,85 contra 0,84: os dois passam de 0,8, mas a diferença é menor que a margem de 0,15.
+    id_acolhedor, candidatos = resolver_por_semelhanca(indice, "Marina Oliveira")
+    assert id_acolhedor is None
+    assert [valor for valor, _, _ in candidatos[:2]] == [4, 3]
+    assert candidatos[0][2] >= 0.8 and candidatos[1][2] >= 0.8
+
+
+def test_abaixo_do_corte_de_sugestao_nao_ha_candidatos(indice):
+    # "Souz" chega a 0,27 de "Ana Souza": abaixo de 0,4 não é nem sugerido.
+    assert indice.buscar("Souz", similaridade_minima=0)[0][2] < 0.4
+    assert resolver_por_semelhanca(indice, "Souz") == (None, [])
+    assert resolver_por_semelhanca(indice, "Zé") == (None, [])
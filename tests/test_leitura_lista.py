@@ -0,0 +1,75 @@
+from eloApp.elo.services import leitura_lista
+
+LISTA = """Data: 14/6/2026
+Evento: Congresso Inove
+
+*Meninos*
+Nome: João Pedro
+Idade: 19 anos
+Numero: (11) 98888-0000
+Acolhedor: Ana Lúcia
+
+Nome: Carlos
+Apelido: Cacá
+Idade: dezenove
+Numero: (11) 97777-0000
+Acolhedor: Pedro
+
+*Meninas*
+Nome: Maria
+Idade: 22
+Acolhedor: Ana Lúcia
+Situação: Reconciliação
+
+Nome: Bia
+Numero: (11) 96666-0000
+"""
+
+
+def test_cabecalho_e_blocos_por_secao():
+    cabecalho, data, evento, blocos, registros = leitura_lista.ler_lista(LISTA)
+
+    assert (data, evento) == ("14/06/2026", "congresso_inove")
+    assert cabecalho == "Data: 14/6/2026\nEvento: Congresso Inove"
+    assert [secao for secao, _ in blocos] == ["*Meninos*", "*Meninos*", "*Meninas*", "*Meninas*"]
+    assert all(bloco.startswith("Nome:") for _, bloco in blocos)
+
+
+def test_bloco_bem_formado_e_lido_localmente_com_houm_da_secao():
+    registros = leitura_lista.ler_lista(LISTA)[4]
+
+    assert registros[0] == {
+        "nome": "João Pedro",
+        "idade": 19,
+        "celular": "(11) 98888-0000",
+        "acolhedor": "Ana Lúcia",
+        "plano_de_acao": leitura_lista.PLANO_NORMAL,
+        "HouM": "H",
+        "situacao": "visitante",
+    }
+    assert registros[2]["HouM"] == "M"
+    assert registros[2]["situacao"] == "reconciliacao"
+    # Sem celular: carrega e pede o dado; sem acolhedor: descarta, como no prompt do Gemini.
+    assert registros[2]["plano_de_acao"] == leitura_lista.PLANO_SOLICITAR_DADOS
+    assert registros[3]["plano_de_acao"] == leitura_lista.PLANO_DESCARTAR
+
+
+def test_bloco_mal_formado_fica_para_o_gemini():
+    registros = leitura_lista.ler_lista(LISTA)[4]
+
+    # Idade por extenso.
+    assert registros[1] is None
+    for bloco in (
+        "Nome: Ana\nIdade: 20\nIdade: 21\nAcolhedor: Rui",  # campo repetido
+        "Nome: Ana\nCidade: Santos\nAcolhedor: Rui",  # rótulo desconhecido
+        "Nome: Ana\nveio com a prima\nAcolhedor: Rui",  # linha sem rótulo
+    ):
+        assert leitura_lista.ler_bloco("*Meninas*", bloco) is None
+    # Fora de uma seção *Meninos*/*Meninas*, o HouM não é conhecido.
+    assert leitura_lista.ler_bloco("", "Nome: Ana\nIdade: 20\nAcolhedor: Rui") is None
+
+
+def test_fora_do_formato_nao_e_lido_localmente():
+    assert leitura_lista.ler_lista(LISTA.replace("Evento: Congresso Inove", "Evento: Festa")) is None
+    assert leitura_lista.ler_lista(LISTA.replace("Data: 14/6/2026", "Data: amanhã")) is None
+    assert leitura_lista.ler_lista("Data: 14/06/2026\n\nJoão, 19 anos, acolhedor Ana") is None
@@ -0,0 +1,27 @@
+from eloApp.elo.database import manifesto
+
+
+def test_tipos_de_carga_do_mesmo_arquivo_tem_registros_separados(banco, tmp_path):
+    arquivo = tmp_path / "acolhedores.csv"
+    arquivo.write_text("nome,email\nAna,ana@x.com\n")
+
+    for tipo in ("acolhedores", "acolhedores_atualizacao"):
+        hash_atual, chaves = manifesto.preparar_ingestao(banco, str(arquivo), tipo)
+        assert chaves == set()
+        manifesto.registrar_ingestao(banco, str(arquivo), tipo, hash_atual, {"a"}, pendentes=0)
+
+    # Alternar o tipo não apaga o registro do outro: os dois arquivos inalterados são ignorados.
+    assert manifesto.preparar_ingestao(banco, str(arquivo), "acolhedores")[1] is None
+    assert manifesto.preparar_ingestao(banco, str(arquivo), "acolhedores_atualizacao")[1] is None
+
+
+def test_arquivo_alterado_volta_com_as_chaves_ja_processadas(banco, tmp_path):
+    arquivo = tmp_path / "gps.csv"
+    arquivo.write_text("lider\nAna\n")
+    hash_atual, _ = manifesto.preparar_ingestao(banco, str(arquivo), "gps")
+    manifesto.registrar_ingestao(banco, str(arquivo), "gps", hash_atual, {"a", "b"}, pendentes=0)
+
+    arquivo.write_text("lider\nAna\nPedro\n")
+
+    assert manifesto.preparar_ingestao(banco, str(arquivo), "gps")[1] == {"a", "b"}
+    assert manifesto.preparar_ingestao(banco, str(arquivo), "gps", forcar=True)[1] == set()
@@ -0,0 +1,59 @@
+import socket
+import time
+import pytest
+from eloApp.elo.services import observar_respostas
+
+
+class ConexaoIMAP:
+    """Lado cliente de um socketpair com a mesma leitura bufferizada do imaplib (sock.makefile)."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.file = sock.makefile("rb")
+
+    def _new_tag(self):
+        return b"A1"
+
+    def send(self, dados):
+        self.sock.sendall(dados)
+
+    def readline(self):
+        return self.file.readline()
+
+
+@pytest.fixture
+def conexao():
+    cliente, servidor = socket.socketpair()
+    yield ConexaoIMAP(cliente), servidor
+    cliente.close()
+    servidor.close()
+
+
+def test_exists_lido_junto_com_a_confirmacao_do_idle(conexao):
+    mail, servidor = conexao
+    # O servidor manda a confirmação e a notificação numa única escrita: o imaplib lê as duas
+    # linhas para o buffer, e o socket fica sem nada para o select().
+    servidor.sendall(b"+ idling\r\n* 3 EXISTS\r\n")
+    tag = observar_respostas._entrar_idle(mail)
+
+    inicio = time.monotonic()
+    assert observar_respostas._aguardar_novidades(mail, timeout=5) is True
+    assert time.monotonic() - inicio < 1
+    assert tag == b"A1"
+
+
+def test_sem_novidades_espera_o_timeout(conexao):
+    mail, servidor = conexao
+    servidor.sendall(b"+ idling\r\n")
+    observar_respostas._entrar_idle(mail)
+
+    assert observar_respostas._aguardar_novidades(mail, timeout=0.2) is False
+
+
+def test_exists_que_chega_depois(conexao):
+    mail, servidor = conexao
+    servidor.sendall(b"+ idling\r\n")
+    observar_respostas._entrar_idle(mail)
+    servidor.sendall(b"* 1 RECENT\r\n")
+
+    assert observar_respostas._aguardar_novidades(mail, timeout=5) is True
@@ -0,0 +1,244 @@
+import functools
+import smtplib
+import socketserver
+import threading
+from email.message import EmailMessage
+import pytest
+from eloApp.elo.services import despacho_emails, outbox
+
+
+class SMTPFalso:
+    """Conexão SMTP falsa: o comportamento de cada envio depende do destinatário."""
+
+    abertas = 0
+
+    def __init__(self, enviados):
+        self.enviados = enviados
+        SMTPFalso.abertas += 1
+
+    def sendmail(self, remetente, destinatarios, texto):
+        destinatario = destinatarios[0]
+        if destinatario.startswith("temporario"):
+            raise smtplib.SMTPResponseException(451, b"Tente mais tarde")
+        if destinatario.startswith("permanente"):
+            raise smtplib.SMTPResponseException(550, b"Caixa inexistente")
+        if destinatario.startswith("queda") and "queda" not in self.enviados:
+            self.enviados.append("queda")
+            raise smtplib.SMTPServerDisconnected("Conexão perdida")
+        self.enviados.append(destinatario)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ServidorSMTPLocal(socketserver.StreamRequestHandler):
+    """
+    Servidor SMTP mínimo: recusa com 451 o primeiro RCPT de "temporario*", sempre com 550 os de
+    "permanente*", e guarda os destinatários de cada mensagem aceita.
+    """
+
+    def _responder(self, linha):
+        self.wfile.write(f"{linha}\r\n".encode())
+
+    def handle(self):
+        estado = self.server.estado
+        with estado["lock"]:
+            estado["conexoes"] += 1
+        destinatarios = []
+        self._responder("220 localhost ESMTP")
+        for linha in self.rfile:
+            comando, _, argumento = linha.decode().strip().partition(" ")
+            comando = comando.upper()
+            if comando == "RCPT":
+                destinatario = argumento.split("<")[1].split(">")[0]
+                with estado["lock"]:
+                    if destinatario.startswith("permanente"):
+                        self._responder("550 Caixa inexistente")
+                        continue
+                    if destinatario.startswith("temporario") and destinatario not in estado["adiados"]:
+                        estado["adiados"].add(destinatario)
+                        self._responder("451 Tente mais tarde")
+                        continue
+                destinatarios.append(destinatario)
+                self._responder("250 OK")
+            elif comando == "DATA":
+                self._responder("354 Termine com <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with estado["lock"]:
+                    estado["recebidas"] += destinatarios
+                destinatarios = []
+                self._responder("250 OK")
+            elif comando == "QUIT":
+                self._responder("221 Tchau")
+                return
+            else:
+                if comando in ("MAIL", "RSET"):
+                    destinatarios = []
+                self._responder("250 OK")
+
+
+@pytest.fixture
+def servidor_smtp():
+    servidor = socketserver.ThreadingTCPServer(("127.0.0.1", 0), ServidorSMTPLocal)
+    servidor.daemon_threads = True
+    servidor.estado = {"lock": threading.Lock(), "conexoes": 0, "adiados": set(), "recebidas": []}
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    fabrica = functools.partial(
+        despacho_emails.conectar_smtp,
+        usuario="",
+        senha="",
+        servidor="127.0.0.1",
+        porta=servidor.server_address[1],
+        seguranca="nenhuma",
+    )
+    yield fabrica, servidor.estado
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def enviados(monkeypatch):
+    lista = []
+    SMTPFalso.abertas = 0
+    monkeypatch.setattr(
+        outbox,
+        "despachar_mensagens",
+        functools.partial(
+            despacho_emails.despachar_mensagens,
+            fabrica=lambda: SMTPFalso(lista),
+            limite_por_minuto=0,
+            tentativas=1,
+            espera_inicial=0,
+        ),
+    )
+    return lista
+
+
+def _mensagem(destinatario):
+    mensagem = EmailMessage()
+    mensagem["To"] = destinatario
+    mensagem["Subject"] = "Visitantes"
+    mensagem.set_content("Corpo")
+    return mensagem
+
+
+def _visitante(conn, nome):
+    cursor = conn.execute(
+        "INSERT INTO acolhimento (nome, data_decisao, status_contato) VALUES (?, '2026-06-14', 'Notificado')", (nome,)
+    )
+    return cursor.lastrowid
+
+
+def _status(conn, id_outbox):
+    return conn.execute("SELECT status, tentativas FROM outbox WHERE id = ?", (id_outbox,)).fetchone()
+
+
+def test_drenagem_separa_falhas_temporarias_e_definitivas(banco, enviados):
+    ids = {}
+    with banco:
+        for destinatario in ("ok@x.com", "temporario@x.com", "permanente@x.com"):
+            id_visitante = _visitante(banco, destinatario)
+            ids[destinatario] = (
+                outbox.enfileirar(banco, "notificacao", destinatario, _mensagem(destinatario), "eu@x.com", [id_visitante]),
+                id_visitante,
+            )
+
+    totais = outbox.drenar_outbox()
+
+    assert totais == {"enviado": 1, "reagendado": 1, "falha": 1}
+    assert enviados == ["ok@x.com"]
+    assert _status(banco, ids["ok@x.com"][0]) == ("enviado", 1)
+    # A falha temporária volta para a fila com espera; a definitiva libera os visitantes.
+    assert _status(banco, ids["temporario@x.com"][0]) == ("pendente", 1)
+    assert _status(banco, ids["permanente@x.com"][0]) == ("falha", 1)
+    status_visitantes = dict(banco.execute("SELECT nome, status_contato FROM acolhimento"))
+    assert status_visitantes == {"ok@x.com": "Notificado", "temporario@x.com": "Notificado", "permanente@x.com": "Pendente"}
+
+
+def test_drenagem_desiste_depois_do_maximo_de_tentativas(banco, enviados):
+    with banco:
+        id_outbox = outbox.enfileirar(banco, "notificacao", "temporario@x.com", _mensagem("temporario@x.com"))
+        banco.execute("UPDATE outbox SET tentativas = 4 WHERE id = ?", (id_outbox,))
+
+    totais = outbox.drenar_outbox(max_tentativas=5)
+
+    assert totais["falha"] == 1
+    assert _status(banco, id_outbox) == ("falha", 5)
+
+
+def test_falha_de_autenticacao_mantem_mensagens_na_fila(banco, monkeypatch):
+    def recusar_login():
+        raise smtplib.SMTPAuthenticationError(535, b"Credenciais invalidas")
+
+    monkeypatch.setattr(
+        outbox,
+        "despachar_mensagens",
+        functools.partial(despacho_emails.despachar_mensagens, fabrica=recusar_login, limite_por_minuto=0, espera_inicial=0),
+    )
+    with banco:
+        ids = [outbox.enfileirar(banco, "notificacao", f"a{i}@x.com", _mensagem(f"a{i}@x.com")) for i in range(3)]
+
+    totais = outbox.drenar_outbox()
+
+    assert totais == {"enviado": 0, "reagendado": 3, "falha": 0}
+    # Sem gastar tentativas: o problema é a configuração, não as mensagens.
+    assert [_status(banco, id_outbox) for id_outbox in ids] == [("pendente", 0)] * 3
+
+
+def test_despacho_reusa_conexoes_e_refaz_envio_apos_queda():
+    enviados = []
+    SMTPFalso.abertas = 0
+    mensagens = [([f"ok{i}@x.com"], "texto") for i in range(10)] + [(["queda@x.com"], "texto")]
+
+    erros = despacho_emails.despachar_mensagens(
+        mensagens, "eu@x.com", conexoes=2, limite_por_minuto=0, tentativas=2, espera_inicial=0,
+        fabrica=lambda: SMTPFalso(enviados),
+    )
+
+    assert erros == [None] * len(mensagens)
+    assert "queda@x.com" in enviados
+    # Duas conexões do pool e mais uma para substituir a que caiu.
+    assert SMTPFalso.abertas <= 3
+
+
+def test_limitador_respeita_taxa_por_minuto(monkeypatch):
+    relogio = {"agora": 0.0}
+    esperas = []
+    monkeypatch.setattr(despacho_emails.time, "monotonic", lambda: relogio["agora"])
+
+    def dormir(segundos):
+        esperas.append(segundos)
+        relogio["agora"] += segundos
+
+    monkeypatch.setattr(despacho_emails.time, "sleep", dormir)
+    limitador = despacho_emails.LimitadorTaxa(por_minuto=60, rajada=1)
+
+    for _ in range(3):
+        limitador.aguardar()
+
+    assert relogio["agora"] == pytest.approx(2.0)
+    assert esperas == [pytest.approx(1.0), pytest.approx(1.0)]
+
+
+def test_despacho_contra_servidor_smtp_local(servidor_smtp, capsys):
+    fabrica, estado = servidor_smtp
+    mensagens = [([f"ok{i}@x.com"], "Subject: Visitantes\r\n\r\nCorpo\r\n") for i in range(40)]
+    mensagens += [(["temporario@x.com"], "Subject: Visitantes\r\n\r\nCorpo\r\n")]
+    mensagens += [(["permanente@x.com"], "Subject: Visitantes\r\n\r\nCorpo\r\n")]
+
+    erros = despacho_emails.despachar_mensagens(
+        mensagens, "eu@x.com", conexoes=4, limite_por_minuto=0, tentativas=2, espera_inicial=0, fabrica=fabrica
+    )
+
+    assert erros[:-1] == [None] * (len(mensagens) - 1)
+    # Recusa 550 no RCPT é definitiva; a 451 foi tentada de novo e entregue.
+    assert isinstance(erros[-1], smtplib.SMTPRecipientsRefused)
+    assert not despacho_emails.erro_transitorio(erros[-1])
+    assert sorted(estado["recebidas"]) == sorted(destinatarios[0] for destinatarios, _ in mensagens[:-1])
+    # As conexões do pool são reaproveitadas entre as mensagens.
+    assert estado["conexoes"] <= 4
+    assert "41/42 e-mail(s) enviado(s)" in capsys.readouterr().out
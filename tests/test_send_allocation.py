@@ -0,0 +1,100 @@
+import csv
+import email
+import io
+import os
+from datetime import date
+import pytest
+from eloApp.elo.services import send_allocation
+
+INICIO, FIM = "2026-06-01", "2026-06-30"
+
+
+@pytest.fixture
+def acolhimentos(banco, monkeypatch):
+    monkeypatch.setenv("EMAIL_USER", "eu@x.com")
+    monkeypatch.setenv("EMAIL_PASS", "senha")
+    monkeypatch.setenv("MAIL_LIST", "['lideres@x.com']")
+    with banco:
+        banco.executemany(
+            "INSERT INTO acolhedores (id_acolhedor, acolhedor_nome, acolhedor_email) VALUES (?, ?, ?)",
+            [(1, "ana", "ana@x.com"), (2, "pedro", "pedro@x.com"), (3, "rui", "rui@x.com")],
+        )
+        linhas = [
+            # Nas duas pontas do período (inclusive), nos dois formatos gravados pelas cargas.
+            ("v1", "01/06/2026", "Pendente", 1),
+            ("v2", "30/06/2026", "Pendente", 1),
+            ("v3", "2026-06-01", "Pendente", 2),
+            ("v4", "2026-06-30 21:00:00", "Pendente", 2),
+            ("v5", "15/06/2026", "Pendente", 1),
+            # Fora do período, por um dia, e já notificados.
+            ("v6", "31/05/2026", "Pendente", 3),
+            ("v7", "01/07/2026", "Pendente", 3),
+            ("v8", "2026-05-31", "Pendente", 3),
+            ("v9", "10/06/2026", "Notificado", 3),
+        ]
+        banco.executemany(
+            "INSERT INTO acolhimento (nome, nome_normalizado, data_decisao, status_contato, id_acolhedor) VALUES (?, ?, ?, ?, ?)",
+            [(nome, nome, data, status, id_acolhedor) for nome, data, status, id_acolhedor in linhas],
+        )
+    return banco
+
+
+def _contagem_esperada(conn):
+    """Filtro de referência em Python: data de decisão (dd/mm/aaaa ou ISO) dentro do período, inclusive."""
+    contagem = {}
+    for nome, data, status in conn.execute(
+        "SELECT a.acolhedor_nome, acc.data_decisao, acc.status_contato FROM acolhimento acc JOIN acolhedores a USING (id_acolhedor)"
+    ):
+        dia = date(int(data[6:10]), int(data[3:5]), int(data[:2])) if "/" in data else date.fromisoformat(data[:10])
+        if status == "Pendente" and date.fromisoformat(INICIO) <= dia <= date.fromisoformat(FIM):
+            contagem[nome] = contagem.get(nome, 0) + 1
+    return contagem
+
+
+def test_contagem_inclui_as_duas_pontas_do_periodo(acolhimentos):
+    df = send_allocation.getCountPendingAllocations(INICIO, FIM)
+
+    assert df.values.tolist() == [["ana", 3], ["pedro", 2]]
+    assert dict(df.values.tolist()) == _contagem_esperada(acolhimentos)
+
+
+def test_relatorio_html_tem_as_mesmas_contagens(acolhimentos):
+    send_allocation.send_allocation_email(INICIO, FIM, formato="html", anexar_csv=True)
+
+    (destinatarios, bruta), = acolhimentos.execute("SELECT destinatarios, mensagem FROM outbox WHERE tipo = 'alocacao'")
+    mensagem = email.message_from_bytes(bruta)
+    partes = {parte.get_content_type(): parte.get_payload(decode=True).decode() for parte in mensagem.walk()
+              if not parte.is_multipart()}
+    assert destinatarios == '["lideres@x.com"]'
+    assert "- ana: 3 (amarelo)" in partes["text/plain"] and "- pedro: 2 (verde)" in partes["text/plain"]
+    assert '<td>ana</td><td style="background-color: yellow;">3</td>' in partes["text/html"]
+    linhas_csv = list(csv.reader(io.StringIO(partes["text/csv"])))
+    assert linhas_csv == [["acolhedor_nome", "acolhimentos_pendentes"], ["ana", "3"], ["pedro", "2"]]
+    assert {nome: int(total) for nome, total in linhas_csv[1:]} == _contagem_esperada(acolhimentos)
+
+
+def test_chave_do_cache_de_relatorios(acolhimentos):
+    df = send_allocation.getCountPendingAllocations(INICIO, FIM)
+    caminho = send_allocation._caminho_relatorio_em_cache(INICIO, FIM, df, ".jpg")
+
+    assert os.path.dirname(caminho) == os.path.join(os.environ["PASTA_BASE"], send_allocation.PASTA_CACHE_RELATORIOS)
+    assert send_allocation._caminho_relatorio_em_cache(INICIO, FIM, df.copy(), ".jpg") == caminho
+    # Outro período ou outra contagem gera outro arquivo.
+    assert send_allocation._caminho_relatorio_em_cache(INICIO, "2026-07-01", df, ".jpg") != caminho
+    alterado = df.copy()
+    alterado.loc[0, "acolhimentos_pendentes"] += 1
+    assert send_allocation._caminho_relatorio_em_cache(INICIO, FIM, alterado, ".jpg") != caminho
+
+
+def test_limpeza_mantem_os_relatorios_usados_mais_recentemente(tmp_path, monkeypatch):
+    monkeypatch.setattr(send_allocation, "MAX_RELATORIOS_EM_CACHE", 3)
+    for i in range(5):
+        arquivo = tmp_path / f"alocacao_{i}.jpg"
+        arquivo.write_bytes(b"jpg")
+        os.utime(arquivo, (1000 + i, 1000 + i))
+    # Reaproveitado do cache (plot_pending_allocations_as_jpeg toca o arquivo): volta a ser recente.
+    os.utime(tmp_path / "alocacao_0.jpg", (2000, 2000))
+
+    send_allocation._limpar_cache_relatorios(str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path)) == ["alocacao_0.jpg", "alocacao_3.jpg", "alocacao_4.jpg"]
@@ -0,0 +1,169 @@
+import functools
+from email.message import EmailMessage
+import pytest
+from eloApp.elo.services import process_replies, processar_e_gerar_json_respostas
+from eloApp.elo.services.sincronizacao_imap import SessaoIMAP, conjunto_uids
+
+
+def _expandir(conjunto: str) -> list:
+    uids = []
+    for faixa in conjunto.split(","):
+        inicio, _, fim = faixa.partition(":")
+        uids += range(int(inicio), int(fim or inicio) + 1)
+    return uids
+
+
+class IMAPFalso:
+    """Pasta IMAP em memória com o subconjunto de comandos usado por SessaoIMAP."""
+
+    def __init__(self, caixa: dict, uidvalidity: int = 1, vistos=()):
+        self.caixa = caixa
+        self.uidvalidity = uidvalidity
+        self.vistos = set(vistos)
+
+    def select(self, pasta):
+        return "OK", [str(len(self.caixa)).encode()]
+
+    def response(self, codigo):
+        if codigo == "UIDVALIDITY":
+            return codigo, [str(self.uidvalidity).encode()]
+        if codigo == "UIDNEXT":
+            return codigo, [str(max(self.caixa, default=0) + 1).encode()]
+        return codigo, [None]
+
+    def uid(self, comando, *args):
+        if comando == "SEARCH":
+            if args[-1] == "UNSEEN":
+                uids = [uid for uid in self.caixa if uid not in self.vistos]
+            elif args[-1] == "ALL":
+                uids = list(self.caixa)
+            else:
+                inicio = int(args[-1].split(":")[0])
+                # Como num servidor real, "n:*" inclui a última mensagem mesmo abaixo de n.
+                uids = [uid for uid in self.caixa if uid >= inicio] or [max(self.caixa)]
+            return "OK", [" ".join(str(uid) for uid in sorted(uids)).encode()]
+        if comando == "FETCH":
+            dados = []
+            for numero, uid in enumerate(_expandir(args[0]), start=1):
+                if uid in self.caixa:
+                    dados += [(f"{numero} (UID {uid} BODY[] {{{len(self.caixa[uid])}}}".encode(), self.caixa[uid]), b")"]
+            return "OK", dados
+        if comando == "STORE":
+            self.vistos.update(_expandir(args[0]))
+            return "OK", [None]
+        raise AssertionError(f"Comando inesperado: {comando}")
+
+    def logout(self):
+        pass
+
+
+def _mensagem(remetente="acolhedor@x.com", corpo="Olá", charset="utf-8") -> bytes:
+    mensagem = EmailMessage()
+    mensagem["From"] = remetente
+    mensagem["Subject"] = "Re: Visitantes"
+    mensagem.set_content(corpo, charset=charset)
+    return mensagem.as_bytes()
+
+
+def _sincronizar(conn, imap, processar=lambda uid: True):
+    """Roda uma sessão; `processar(uid)` decide se a mensagem foi processada (True) ou falhou (False)."""
+    entregues = []
+    with SessaoIMAP("teste", fabrica=lambda: imap, conta="eu@x.com", conn=conn) as sessao:
+        for uid, _ in sessao.mensagens():
+            entregues.append(uid)
+            if processar(uid):
+                sessao.marcar_processada(uid)
+            else:
+                sessao.marcar_falha(uid, "erro")
+        sessao.confirmar()
+    return entregues
+
+
+def _estado(conn):
+    return conn.execute("SELECT uidvalidity, ultimo_uid FROM imap_estado WHERE consumidor = 'teste'").fetchone()
+
+
+def _falhas(conn):
+    return [uid for (uid,) in conn.execute("SELECT uid FROM imap_falhas WHERE consumidor = 'teste' ORDER BY uid")]
+
+
+def test_conjunto_uids_compacta_faixas():
+    assert conjunto_uids([7, 1, 2, 3, 9, 10]) == "1:3,7,9:10"
+
+
+def test_marca_dagua_avanca_e_falhas_sao_repetidas(banco):
+    imap = IMAPFalso({uid: _mensagem() for uid in (1, 2, 3)}, vistos={1})
+
+    # Primeira sincronização: parte das não lidas.
+    assert _sincronizar(banco, imap) == [2, 3]
+    assert _estado(banco) == (1, 3)
+    assert imap.vistos == {1, 2, 3}
+
+    # Só as novas são buscadas; a que falhou fica registrada e a marca d'água passa por ela.
+    imap.caixa.update({4: _mensagem(), 5: _mensagem()})
+    assert _sincronizar(banco, imap, processar=lambda uid: uid != 4) == [4, 5]
+    assert _estado(banco) == (1, 5)
+    assert _falhas(banco) == [4]
+    assert 4 not in imap.vistos
+
+    # A falha é entregue de novo na próxima sessão, junto com as novas.
+    imap.caixa[6] = _mensagem()
+    assert _sincronizar(banco, imap) == [4, 6]
+    assert _estado(banco) == (1, 6)
+    assert _falhas(banco) == []
+
+    # Sem novidades, nada é buscado.
+    assert _sincronizar(banco, imap) == []
+
+
+def test_mudanca_de_uidvalidity_recomeca_pelas_nao_lidas(banco):
+    imap = IMAPFalso({uid: _mensagem() for uid in (10, 11)})
+    assert _sincronizar(banco, imap, processar=lambda uid: uid != 11) == [10, 11]
+    assert _falhas(banco) == [11]
+
+    # A pasta foi recriada: UIDs antigos não valem mais, nem as falhas registradas com eles.
+    recriada = IMAPFalso({1: _mensagem(), 2: _mensagem(), 3: _mensagem()}, uidvalidity=2, vistos={1})
+    assert _sincronizar(banco, recriada) == [2, 3]
+    assert _estado(banco) == (2, 3)
+    assert _falhas(banco) == []
+
+
+def test_respostas_em_outros_charsets_nao_travam_a_sincronizacao(banco, monkeypatch):
+    with banco:
+        banco.execute("INSERT INTO acolhedores (acolhedor_nome, acolhedor_email) VALUES ('ana', 'ana@x.com')")
+        banco.execute(
+            """
+            INSERT INTO acolhimento (nome, nome_normalizado, data_decisao, status_contato, id_acolhedor)
+            VALUES ('Maria', 'maria', '2026-06-14', 'Notificado', 1), ('Pedro', 'pedro', '2026-06-14', 'Notificado', 1)
+            """
+        )
+    charset_invalido = _mensagem("ana@x.com", "Pedro: número incorreto").replace(
+        b'charset="utf-8"', b'charset="x-charset-inexistente"'
+    )
+    imap = IMAPFalso({1: _mensagem("ana@x.com", "Maria não atendeu", charset="iso-8859-1"), 2: charset_invalido})
+    monkeypatch.setattr(process_replies, "SessaoIMAP", functools.partial(SessaoIMAP, fabrica=lambda: imap))
+
+    process_replies.processar_respostas()
+
+    status = dict(banco.execute("SELECT nome, status_contato FROM acolhimento"))
+    assert status == {"Maria": "Não atendeu", "Pedro": "Número incorreto"}
+    assert banco.execute("SELECT ultimo_uid FROM imap_estado WHERE consumidor = ?", (process_replies.CONSUMIDOR_IMAP,)).fetchone() == (2,)
+
+
+@pytest.mark.parametrize("modulo", [process_replies, processar_e_gerar_json_respostas], ids=lambda m: m.__name__.rsplit(".", 1)[1])
+def test_corpo_vazio_fica_registrado_como_falha(banco, monkeypatch, modulo):
+    with banco:
+        banco.execute("INSERT INTO acolhedores (acolhedor_nome, acolhedor_email) VALUES ('ana', 'ana@x.com')")
+    somente_html = EmailMessage()
+    somente_html["From"] = "ana@x.com"
+    somente_html.add_alternative("<p>Maria não atendeu</p>", subtype="html")
+    imap = IMAPFalso({1: _mensagem("ana@x.com", ""), 2: somente_html.as_bytes()})
+    monkeypatch.setattr(modulo, "SessaoIMAP", functools.partial(SessaoIMAP, fabrica=lambda: imap))
+
+    if modulo is process_replies:
+        modulo.processar_respostas()
+    else:
+        modulo.gerar_json_respostas()
+
+    falhas = banco.execute("SELECT uid, ultimo_erro FROM imap_falhas WHERE consumidor = ?", (modulo.CONSUMIDOR_IMAP,))
+    assert falhas.fetchall() == [(1, "corpo vazio"), (2, "corpo vazio")]